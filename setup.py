@@ -30,7 +30,6 @@ setup(
        'PyQt5',
         'opencv-contrib-python',
         'paramiko',
-        'scp',
         'pynput',
         'numpy',
         'tqdm',
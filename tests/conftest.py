@@ -0,0 +1,92 @@
+import secrets
+import subprocess
+import threading
+import paramiko
+import pytest
+from ultimatelabeling.local_server import LocalServer
+
+
+@pytest.fixture
+def ssh_client(tmp_path):
+    """
+    paramiko client logged in to a local SSH server: (client, home directory of the server)
+    """
+    home = tmp_path / "home"
+    home.mkdir()
+    password = secrets.token_hex(16)
+
+    with LocalSSHServer(str(home), password) as server:
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect("127.0.0.1", port=server.port, username="user", password=password,
+                       look_for_keys=False, allow_agent=False)
+        yield client, home
+        client.close()
+
+
+class LocalSSHServer(LocalServer):
+    """
+    SSH server running the exec requests in a local shell, in root_dir (the "home"), for the clients logging in with
+    password. Test only: it listens on 127.0.0.1.
+    """
+    def __init__(self, root_dir, password):
+        super().__init__()
+        self.root_dir = root_dir
+        self.password = password
+        self.host_key = paramiko.ECDSAKey.generate()
+
+    def handle_connection(self, conn):
+        transport = paramiko.Transport(conn)
+        transport.add_server_key(self.host_key)
+        transport.start_server(server=_SSHServerInterface(self))
+
+    def run_command(self, channel, command):
+        process = subprocess.Popen(command, shell=True, cwd=self.root_dir, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        def pump_stdin():
+            while True:
+                data = channel.recv(1 << 16)
+                if not data:
+                    break
+                try:
+                    process.stdin.write(data)
+                except BrokenPipeError:
+                    break
+            process.stdin.close()
+
+        def pump_stderr():
+            for data in iter(lambda: process.stderr.read1(1 << 16), b""):
+                channel.sendall_stderr(data)
+
+        threads = [threading.Thread(target=pump_stdin, daemon=True), threading.Thread(target=pump_stderr, daemon=True)]
+        for thread in threads:
+            thread.start()
+        for data in iter(lambda: process.stdout.read1(1 << 16), b""):
+            channel.sendall(data)
+        threads[1].join()
+
+        channel.send_exit_status(process.wait())
+        channel.close()
+
+
+class _SSHServerInterface(paramiko.ServerInterface):
+    def __init__(self, server):
+        self.server = server
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        if password == self.server.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=self.server.run_command, args=(channel, command.decode()), daemon=True).start()
+        return True
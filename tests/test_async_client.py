@@ -0,0 +1,144 @@
+import asyncio
+import os
+import time
+import numpy as np
+import cv2
+import pytest
+from PyQt5.QtCore import QCoreApplication
+from ultimatelabeling.local_server import LocalTrackingServer, LocalDetectionServer
+from ultimatelabeling.models.async_client import AsyncTracker, AsyncDetector, AsyncJob, client_loop
+from ultimatelabeling.models.tracker import KCFTracker
+from ultimatelabeling.models.polygon import Bbox
+from tests.test_multi_tracker import moving_boxes
+
+
+@pytest.fixture
+def clip(tmp_path):
+    frames, gt = moving_boxes(nb_frames=10)
+    paths = []
+    for i, img in enumerate(frames):
+        path = os.path.join(str(tmp_path), "{}.png".format(i))
+        cv2.imwrite(path, img)
+        paths.append(path)
+    return paths, Bbox(*gt[0][1])
+
+
+async def track(tracker, paths, bbox):
+    await tracker.init(paths[0], bbox)
+    try:
+        return [res async for res in tracker.track_sequence(paths[1:])]
+    finally:
+        await tracker.close()
+
+
+class TestAsyncClients:
+
+    def test_concurrent_trackers_on_one_loop(self, clip):
+        paths, bbox = clip
+
+        local = KCFTracker(state=None)
+        local.init(paths[0], bbox)
+        expected = [local.track(path)[0].to_json() for path in paths[1:]]
+
+        async def track_all(port):
+            trackers = [AsyncTracker("127.0.0.1", port, max_in_flight=3) for _ in range(4)]
+            return await asyncio.gather(*[track(tracker, paths, bbox) for tracker in trackers])
+
+        with LocalTrackingServer() as server:
+            results = client_loop().submit(track_all(server.port)).result(timeout=30)
+
+        for res in results:
+            assert np.allclose([bbox.to_json() for bbox, _ in res], expected)
+
+    def test_detections_out_of_order(self, clip):
+        paths, _ = clip
+
+        async def detect_all(port):
+            detector = AsyncDetector("127.0.0.1", port, nb_connections=2, max_in_flight=2)
+            try:
+                results = [res async for res in detector.detect_frames(paths)]
+                connections = detector.connections
+
+                # The connections are reused by the next call
+                await detector.detect(paths[0])
+                assert detector.connections == connections
+                return results
+            finally:
+                await detector.close()
+
+        with LocalDetectionServer(jitter=0.01) as server:
+            results = asyncio.run(detect_all(server.port))
+
+        assert sorted(frame for frame, _ in results) == list(range(len(paths)))
+
+    def test_cancel_while_waiting_on_server(self, clip):
+        paths, bbox = clip
+
+        with LocalTrackingServer(delay=5.) as server:
+            future = client_loop().submit(track(AsyncTracker("127.0.0.1", server.port), paths, bbox))
+            time.sleep(0.1)
+
+            start_time = time.time()
+            future.cancel()
+            while not future.done():
+                time.sleep(0.01)
+            assert time.time() - start_time < 1
+
+    def test_timeout(self, clip):
+        paths, bbox = clip
+
+        with LocalTrackingServer(delay=1.) as server:
+            with pytest.raises(asyncio.TimeoutError):
+                asyncio.run(track(AsyncTracker("127.0.0.1", server.port, timeout=0.1), paths, bbox))
+
+
+class TestAsyncJob:
+
+    def test_results_are_delivered_in_qt_thread(self):
+        app = QCoreApplication.instance() or QCoreApplication([])
+
+        class CountJob(AsyncJob):
+            async def generate(self):
+                for i in range(5):
+                    await asyncio.sleep(0.001)
+                    yield i
+
+        job = CountJob()
+        results, finished = [], []
+        job.result_signal.connect(results.append)
+        job.finished.connect(lambda: finished.append(True))
+        job.start()
+
+        start_time = time.time()
+        while not finished and time.time() - start_time < 5:
+            app.processEvents()
+        assert results == list(range(5))
+
+    def test_generator_waits_for_the_gui_thread(self):
+        app = QCoreApplication.instance() or QCoreApplication([])
+
+        class CountJob(AsyncJob):
+            MAX_PENDING_RESULTS = 3
+
+            def __init__(self):
+                super().__init__()
+                self.nb_generated = 0
+
+            async def generate(self):
+                for i in range(10):
+                    self.nb_generated += 1
+                    yield i
+
+        job = CountJob()
+        results, finished = [], []
+        job.result_signal.connect(results.append)
+        job.finished.connect(lambda: finished.append(True))
+        job.start()
+
+        time.sleep(0.2)  # the GUI thread does not process the results meanwhile
+        assert job.nb_generated == CountJob.MAX_PENDING_RESULTS + 1
+
+        start_time = time.time()
+        while not finished and time.time() - start_time < 5:
+            app.processEvents()
+        assert results == list(range(10))
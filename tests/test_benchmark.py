@@ -0,0 +1,40 @@
+import os
+from ultimatelabeling.benchmark import make_synthetic_clip, get_file_names, load_gt, bbox_iou, run_tracker, benchmark_wire
+from ultimatelabeling.models.polygon import Bbox
+from ultimatelabeling.models.tracker import KCFTracker
+
+
+class TestTrackingBenchmark:
+
+    def test_load_gt(self, tmp_path):
+        gt_file = os.path.join(str(tmp_path), "gt.txt")
+        with open(gt_file, "w") as f:
+            f.write("10 20 30 40\n\nnan nan nan nan\n1,2,3,4\n0 0 0 0\n")
+
+        gt = load_gt(gt_file, 6)
+        assert [bbox.to_json() if bbox else None for bbox in gt] == [[10, 20, 30, 40], None, None, [1, 2, 3, 4],
+                                                                      None, None]
+
+    def test_bbox_iou(self):
+        assert bbox_iou(Bbox(0, 0, 10, 10), Bbox(5, 0, 10, 10)) == 1 / 3
+        assert bbox_iou(Bbox(0, 0, 10, 10), Bbox(20, 0, 10, 10)) == 0
+
+    def test_kcf_on_synthetic_clip(self, tmp_path):
+        folder = str(tmp_path)
+        make_synthetic_clip(folder, nb_frames=20)
+        file_names = get_file_names(folder)
+        gt = load_gt(os.path.join(folder, "gt.txt"), len(file_names))
+
+        res = run_tracker(KCFTracker(state=None), file_names, gt)
+
+        assert res["nb_tracked"] == 19
+        assert res["lost"] == 0
+        assert res["mean_iou"] > 0.8
+        assert res["fps"] > 0 and res["stages"]["track"]["count"] == 19
+
+
+class TestWireBenchmark:
+
+    def test_wire_is_smaller_than_json(self):
+        results = benchmark_wire(nb_detections=10, repeat=2)
+        assert results["wire"]["size"] < results["json"]["size"]
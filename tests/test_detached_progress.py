@@ -0,0 +1,85 @@
+import os
+import json
+import time
+import subprocess
+import pytest
+from ultimatelabeling.models.detached_progress import watch_command, parse_status, ProgressEstimator
+from ultimatelabeling.views.detached_progress import DetachedProgressThread
+
+
+def write_info(info_file, current_frame, total_frame=100):
+    with open(info_file + ".part", "w") as f:
+        json.dump({"video_name": "video", "current_frame": current_frame, "total_frame": total_frame}, f)
+    os.replace(info_file + ".part", info_file)
+
+
+def run(command):
+    """
+    Runs the command in a local shell, as over SSH.
+    """
+    return subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, universal_newlines=True)
+
+
+class TestDetachedProgress:
+
+    def test_status_is_pushed_on_update(self, tmp_path):
+        info_file = str(tmp_path / "running_info.json")
+        process = run(watch_command(info_file, interval=0.01))
+
+        for frame in (10, 20, 100):
+            time.sleep(0.05)  # distinct mtimes
+            write_info(info_file, frame)
+            status = parse_status(process.stdout.readline())
+            assert status["current_frame"] == frame and status["age"] >= 0
+
+        assert process.wait(timeout=5) == 0  # the detection is over
+
+    def test_stops_when_not_updated(self, tmp_path):
+        info_file = str(tmp_path / "running_info.json")
+        write_info(info_file, 10)  # the detection was killed after this update
+
+        process = run(watch_command(info_file, interval=0.01, stale_after=0.2))
+        assert parse_status(process.stdout.readline())["current_frame"] == 10
+        assert parse_status(process.stdout.readline())["stale"]
+        assert process.wait(timeout=5) == 0
+
+        # No detection started at all
+        os.remove(info_file)
+        process = run(watch_command(info_file, interval=0.01, stale_after=0.2))
+        assert parse_status(process.stdout.readline())["stale"]
+        assert process.wait(timeout=5) == 0
+
+    def test_once(self, tmp_path):
+        info_file = str(tmp_path / "running_info.json")
+        assert parse_status(run(watch_command(info_file, once=True)).stdout.readline()) is None
+
+        write_info(info_file, 10)
+        assert parse_status(run(watch_command(info_file, once=True)).stdout.readline())["current_frame"] == 10
+
+    def test_estimator(self):
+        estimator = ProgressEstimator(window_size=3)
+        assert estimator.eta(100) is None
+
+        for t, frame in enumerate([0, 5, 10, 20, 30]):
+            estimator.update({"mtime": t, "current_frame": frame})
+        assert estimator.fps == pytest.approx(10)
+        assert estimator.eta(100) == pytest.approx(7)
+
+        estimator.update({"mtime": 10, "current_frame": 0})  # restarted
+        assert estimator.fps is None
+
+    def test_thread_stops_while_waiting(self, ssh_client):
+        client, home = ssh_client
+
+        class Login:  # the part of SSHLogin used by the thread
+            def watch_detached_info(self):
+                return client.exec_command(watch_command(str(home / "running_info.json"), interval=0.01))[1]
+
+        thread = DetachedProgressThread(Login())
+        thread.start()
+        time.sleep(0.5)
+        assert thread.isRunning()
+
+        start_time = time.time()
+        thread.stop()
+        assert not thread.isRunning() and time.time() - start_time < 2
@@ -0,0 +1,55 @@
+import os
+import pytest
+from ultimatelabeling.models.detection_checkpoint import DetectionCheckpoint, to_ranges, from_ranges
+from ultimatelabeling.models.track_info import TrackInfo
+from ultimatelabeling.models.polygon import Bbox
+
+
+@pytest.fixture(autouse=True)
+def output_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join("output", "video"))
+
+
+class TestDetectionCheckpoint:
+
+    def test_ranges(self):
+        frames = [7, 0, 1, 2, 5, 6, 10]
+        assert to_ranges(frames) == [[0, 2], [5, 7], [10, 10]]
+        assert from_ranges(to_ranges(frames)) == set(frames)
+
+    def test_resume(self):
+        checkpoint = DetectionCheckpoint("video", "YOLO")
+        for frame in [4, 0, 2, 1]:  # out of order, as detect_frames yields them
+            checkpoint.add(frame)
+        checkpoint.flush()
+
+        # Restarted: same settings resume, other settings start over
+        checkpoint = DetectionCheckpoint("video", "YOLO")
+        assert [frame for frame in range(6) if frame not in checkpoint] == [3, 5]
+        assert 0 not in DetectionCheckpoint("video", "OpenPifPaf")
+        assert 0 not in DetectionCheckpoint("video", "YOLO", crop_area=Bbox(0, 0, 10, 10))
+
+        checkpoint.reset()
+        assert 0 not in DetectionCheckpoint("video", "YOLO")
+
+    def test_saves_are_throttled(self):
+        checkpoint = DetectionCheckpoint("video", "YOLO")
+        checkpoint.add(0)  # first frame saved right away
+        for frame in range(1, 100):
+            checkpoint.add(frame)
+        assert [frame for frame in range(100) if frame in DetectionCheckpoint("video", "YOLO")] == [0]
+
+        checkpoint.last_save -= DetectionCheckpoint.SAVE_INTERVAL
+        checkpoint.add(100)
+        assert 100 in DetectionCheckpoint("video", "YOLO")
+
+    def test_has_detections(self):
+        track_info = TrackInfo("video")
+        track_info.write_detections("00000", [])
+        assert not track_info.has_detections("00000")
+        assert not track_info.has_detections("00001")
+
+        with open(os.path.join("output", "video", "00002.txt"), "w") as f:
+            f.write("1 0 0 0 10 10  \n")
+        assert track_info.has_detections("00002")
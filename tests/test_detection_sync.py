@@ -0,0 +1,52 @@
+import os
+import json
+import subprocess
+from ultimatelabeling.models.detection_sync import sync_command, load_manifest, unpack_changes, MANIFEST_FILE
+
+
+def write(folder, name, content):
+    with open(os.path.join(folder, name), "w") as f:
+        f.write(content)
+
+
+def sync(server_folder, local_folder):
+    """
+    Runs the sync command in a local shell, as over SSH.
+    """
+    process = subprocess.Popen(sync_command(server_folder), shell=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    process.stdin.write(json.dumps(load_manifest(local_folder)).encode())
+    process.stdin.close()
+    updated = unpack_changes(process.stdout, local_folder)
+    assert process.wait() == 0
+    return sorted(updated)
+
+
+class TestDetectionSync:
+
+    def test_only_changed_files_are_fetched(self, tmp_path):
+        server_folder, local_folder = str(tmp_path / "server"), str(tmp_path / "local")
+        os.makedirs(server_folder)
+        for i in range(5):
+            write(server_folder, "{:05d}.txt".format(i), "1 0 {} 0 10 10  \n".format(i))
+
+        assert sync(server_folder, local_folder) == ["{:05d}.txt".format(i) for i in range(5)]
+        assert sorted(load_manifest(local_folder)) == ["{:05d}.txt".format(i) for i in range(5)]
+
+        # Rewritten with the same content, modified, and new frames
+        write(server_folder, "00001.txt", "1 0 1 0 10 10  \n")
+        write(server_folder, "00002.txt", "1 0 42 0 10 10  \n")
+        write(server_folder, "00005.txt", "2 0 5 0 10 10  \n")
+        os.utime(os.path.join(server_folder, "00001.txt"), (0, 0))
+
+        assert sync(server_folder, local_folder) == ["00002.txt", "00005.txt"]
+        with open(os.path.join(local_folder, "00002.txt")) as f:
+            assert f.read() == "1 0 42 0 10 10  \n"
+
+        assert sync(server_folder, local_folder) == []
+        assert MANIFEST_FILE not in load_manifest(local_folder)
+
+    def test_missing_server_folder(self, tmp_path):
+        local_folder = str(tmp_path / "local")
+
+        assert sync(str(tmp_path / "missing"), local_folder) == []
+        assert load_manifest(local_folder) == {}
@@ -0,0 +1,63 @@
+import os
+import numpy as np
+import cv2
+import pytest
+from ultimatelabeling.local_server import LocalDetectionServer
+from ultimatelabeling.models.detector import SocketDetector
+from ultimatelabeling.models.polygon import Bbox
+
+
+@pytest.fixture
+def frames(tmp_path):
+    """
+    Frames of different widths, so that the mock detections identify the frame they come from.
+    """
+    paths = []
+    for i in range(20):
+        path = os.path.join(str(tmp_path), "{}.png".format(i))
+        cv2.imwrite(path, np.zeros((10, 10 + i, 3), np.uint8))
+        paths.append(path)
+    return paths
+
+
+@pytest.fixture
+def server():
+    with LocalDetectionServer(jitter=0.01, nb_detections=2) as server:
+        yield server
+
+
+class TestSocketDetector:
+
+    def test_results_are_tagged_with_their_frame(self, server, frames):
+        detector = SocketDetector(host=server.host, port=server.port, nb_connections=2, max_in_flight=3)
+        image_paths = {frame: frames[frame] for frame in range(0, len(frames), 2)}
+
+        results = list(detector.detect_frames(image_paths))
+        detector.terminate()
+
+        assert sorted(frame for frame, _ in results) == sorted(image_paths)
+        for frame, detections in results:
+            assert len(detections) == 2
+            assert detections[0].bbox.xywh[2] == 10 + frame
+
+    def test_connections_are_reused(self, server, frames):
+        detector = SocketDetector(host=server.host, port=server.port)
+
+        detections = detector.detect(frames[3])
+        connections = list(detector.connections)
+        detections_crop = detector.detect(frames[4], crop_area=Bbox(1, 2, 3, 4))
+
+        assert detector.connections == connections
+        assert detections[0].bbox.xywh[2] == 13
+        assert detections_crop[0].bbox.to_json() == [1, 2, 3, 4]
+        detector.terminate()
+
+    def test_server_errors_are_raised(self, server, frames, tmp_path):
+        detector = SocketDetector(host=server.host, port=server.port)
+
+        with pytest.raises(Exception, match="Cannot read image"):
+            list(detector.detect_frames([frames[0], os.path.join(str(tmp_path), "missing.png"), frames[1]]))
+        assert detector.connections == []
+
+        assert detector.detect(frames[5])[0].bbox.xywh[2] == 15
+        detector.terminate()
@@ -0,0 +1,33 @@
+import os
+import numpy as np
+import cv2
+import pytest
+from ultimatelabeling.models import frame_manifest
+from ultimatelabeling.models.frame_manifest import load_frame_manifest, MANIFEST_FILE
+
+
+@pytest.fixture
+def folder(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the manifest is saved in output/
+    folder = os.path.join("data", "video")
+    os.makedirs(folder)
+    for i in [0, 1, 2, 10]:
+        cv2.imwrite(os.path.join(folder, "{}.jpg".format(i)), np.zeros((20, 30, 3), np.uint8))
+    return folder
+
+
+class TestFrameManifest:
+
+    def test_cached_until_the_folder_changes(self, folder, monkeypatch):
+        manifest = load_frame_manifest(folder)
+        assert [os.path.basename(f) for f in manifest["file_names"]] == ["0.jpg", "1.jpg", "2.jpg", "10.jpg"]
+        assert manifest["nb_frames"] == 4 and tuple(manifest["image_size"]) == (20, 30)
+        assert os.path.exists(os.path.join("output", "video", MANIFEST_FILE))
+
+        listed = []
+        monkeypatch.setattr(frame_manifest, "find_frames", lambda folder: listed.append(folder) or [])
+        assert load_frame_manifest(folder)["file_names"] == manifest["file_names"]
+        assert listed == []
+
+        os.remove(os.path.join(folder, "1.jpg"))
+        assert load_frame_manifest(folder)["file_names"] == [] and listed == [folder]
@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+import numpy as np
+import cv2
+import pytest
+from ultimatelabeling.models.frame_source import FrameSource, FramePrefetcher
+
+
+@pytest.fixture
+def frames(tmp_path):
+    paths = []
+    for i in range(5):
+        path = os.path.join(str(tmp_path), "{}.jpg".format(i))
+        cv2.imwrite(path, np.full((20, 30, 3), 10 * i, np.uint8))
+        paths.append(path)
+    return paths
+
+
+class TestFrameSource:
+
+    def test_decodes_each_frame_once(self, frames):
+        source = FrameSource(cache_size=2)
+
+        with source.frame(frames[0]) as img:
+            assert source.read(frames[0]) is img
+            assert not img.flags.writeable
+        assert source.read(frames[0]) is img
+        assert source.nb_decodes == 1 and source.nb_hits == 2
+
+    def test_held_frames_are_not_evicted(self, frames):
+        source = FrameSource(cache_size=1)
+
+        img = source.acquire(frames[0])
+        for path in frames[1:]:
+            source.read(path)
+        assert source.read(frames[0]) is img
+        source.release(frames[0])
+
+        source.read(frames[1])
+        source.read(frames[0])
+        assert source.nb_decodes == 7
+
+    def test_concurrent_consumers(self, frames):
+        source = FrameSource()
+        results = []
+
+        def consume():
+            results.append([source.read(path) for path in frames])
+
+        threads = [threading.Thread(target=consume) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert source.nb_decodes == len(frames)
+        assert all(res[i] is results[0][i] for res in results for i in range(len(frames)))
+
+    def test_missing_frame(self, tmp_path):
+        with pytest.raises(IOError):
+            FrameSource().acquire(os.path.join(str(tmp_path), "missing.jpg"))
+
+
+class TestFramePrefetcher:
+
+    def test_latest_request_wins(self, frames):
+        class SlowFrameSource(FrameSource):
+            def decode(self, path):
+                time.sleep(0.05)
+                return super().decode(path)
+
+        source = SlowFrameSource()
+        prefetcher = FramePrefetcher(source)
+        for path in frames:  # faster than the decodes
+            prefetcher.request(path)
+        prefetcher.wait()
+        prefetcher.stop()
+
+        assert prefetcher.nb_loaded < len(frames) and prefetcher.nb_loaded + prefetcher.nb_skipped == len(frames)
+        assert frames[-1] in source.released  # decoded, shared with the next consumer
+        source.read(frames[-1])
+        assert source.nb_hits == 1
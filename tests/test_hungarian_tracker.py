@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+from ultimatelabeling.models.hungarian_tracker import track, track_parallel, split_chunks, assign_track_ids, iou_cost
+
+
+def synthetic_detections(nb_frames=200, nb_objects=6, seed=0):
+    rng = np.random.RandomState(seed)
+    rows = []
+    for i in range(nb_objects):
+        start = rng.randint(0, nb_frames // 2)
+        end = rng.randint(start + 20, nb_frames)
+        x0, y0 = rng.uniform(0, 3000), rng.uniform(0, 2000)
+        vx, vy = rng.uniform(-5, 5, size=2)
+        for frame in range(start, end):
+            rows.append({"frame": frame, "class_id": i % 3, "track_id": 0, "xc": x0 + vx * (frame - start) + 400 * i,
+                         "yc": y0 + vy * (frame - start), "w": 50., "h": 40., "infer": 0})
+    return pd.DataFrame(rows).sort_values("frame", kind="stable").reset_index(drop=True)
+
+
+class TestTrackParallel:
+
+    def test_split_chunks(self):
+        assert split_chunks(25, 10, 3) == [(0, 10, 13), (10, 20, 23), (20, 25, 25)]
+
+    def test_same_as_single_process(self):
+        df = synthetic_detections()
+        expected = track(df.copy())
+        result = track_parallel(df.copy(), nb_workers=2, chunk_size=40, overlap=25)
+
+        assert result.sort_index().values.tolist() == expected.sort_index().values.tolist()
+
+
+class TestCostFunctions:
+
+    def test_iou_cost(self):
+        boxes1 = np.array([[0., 0., 10., 10.]])
+        boxes2 = np.array([[5., 0., 10., 10.], [100., 100., 10., 10.]])
+        assert np.allclose(iou_cost(boxes1, boxes2), [[1 - 50 / 150, 1.]])
+
+    def test_kalman_recovers_occluded_track(self):
+        rows = [{"frame": frame, "class_id": 0, "track_id": 0, "xc": 100. + 60 * frame, "yc": 500., "w": 80., "h": 60.,
+                 "infer": 0} for frame in range(20) if not 5 <= frame <= 7]
+        df = pd.DataFrame(rows)
+
+        assert assign_track_ids(df.copy()).track_id.nunique() == 2
+        assert assign_track_ids(df.copy(), kalman=True).track_id.nunique() == 1
+        assert assign_track_ids(df.copy(), cost="iou", kalman=True).track_id.nunique() == 1
@@ -0,0 +1,45 @@
+import numpy as np
+import cv2
+from ultimatelabeling.models.multi_tracker import MultiKCFTracker
+from ultimatelabeling.models.polygon import Bbox
+
+
+def moving_boxes(nb_frames=15, size=(320, 240), seed=0):
+    """
+    Frames with two textured boxes moving in opposite directions, and their ground truth {track_id: (x, y, w, h)}.
+    """
+    rng = np.random.RandomState(seed)
+    background = cv2.GaussianBlur(rng.randint(0, 255, (size[1], size[0], 3)).astype(np.uint8), (0, 0), 5)
+    textures = {1: rng.randint(0, 255, (40, 50, 3)).astype(np.uint8),
+                7: rng.randint(0, 255, (30, 30, 3)).astype(np.uint8)}
+    starts, speeds = {1: (40, 40), 7: (220, 150)}, {1: (3, 2), 7: (-2, -1)}
+
+    frames, gt = [], []
+    for i in range(nb_frames):
+        img = background.copy()
+        boxes = {}
+        for track_id, texture in textures.items():
+            x, y = starts[track_id][0] + i * speeds[track_id][0], starts[track_id][1] + i * speeds[track_id][1]
+            img[y:y + texture.shape[0], x:x + texture.shape[1]] = texture
+            boxes[track_id] = (x, y, texture.shape[1], texture.shape[0])
+        frames.append(img)
+        gt.append(boxes)
+    return frames, gt
+
+
+class TestMultiKCFTracker:
+
+    def test_tracks_all_objects(self):
+        frames, gt = moving_boxes()
+        tracker = MultiKCFTracker(nb_workers=2)
+        try:
+            tracker.init(frames[0], {track_id: Bbox(*bbox) for track_id, bbox in gt[0].items()})
+            for img, boxes in zip(frames[1:], gt[1:]):
+                bboxes = tracker.track(img)
+                assert set(bboxes) == set(boxes)
+                for track_id, bbox in bboxes.items():
+                    assert np.abs(bbox.xywh - np.array(boxes[track_id])).max() <= 2
+        finally:
+            tracker.terminate()
+
+        assert tracker.workers == [] and tracker.shm is None
@@ -0,0 +1,88 @@
+import copy
+import json
+import os
+import numpy as np
+import torch
+import pytest
+from ultimatelabeling.models import tracker as tracker_module
+from ultimatelabeling.models.tracker import SiamMaskTracker
+from ultimatelabeling.siamMask.models.custom import Custom, TracedResDown
+from ultimatelabeling.models.polygon import Bbox
+from ultimatelabeling.config import RESOURCES_DIR
+from tests.test_multi_tracker import moving_boxes
+
+
+@pytest.fixture
+def random_weights(monkeypatch):
+    # Random weights are enough to compare two inference paths of the same model
+    monkeypatch.setattr(tracker_module, "load_pretrain", lambda model, path, use_cuda: model)
+    torch.manual_seed(0)
+
+
+def assert_close(actual, expected, tolerance=1e-3):
+    scale = expected.abs().max().item() + 1e-6
+    assert (actual - expected).abs().max().item() <= tolerance * scale
+
+
+class TestTracedResDown:
+
+    def test_traced_outputs_match_eager(self):
+        cfg = json.load(open(os.path.join(RESOURCES_DIR, "config_vot.json")))
+        torch.manual_seed(0)
+        eager = Custom(anchors=cfg['anchors']).eval()
+        traced = copy.deepcopy(eager).to(memory_format=torch.channels_last)
+        traced.features = TracedResDown(traced.features, 127, 255, memory_format=torch.channels_last)
+
+        template = torch.rand(1, 3, 127, 127) * 255
+        search = torch.rand(1, 3, 255, 255) * 255
+
+        with torch.no_grad():
+            outputs = []
+            for model in (eager, traced):
+                model.template(template)
+                score, delta, mask = model.track_mask(search)
+                refined = model.track_refine((12, 12))
+                outputs.append((model.zf, score, delta, mask, refined))
+
+        for actual, expected in zip(outputs[1], outputs[0]):
+            assert actual.shape == expected.shape
+            assert_close(actual, expected)
+
+
+class TestSiamMaskCPU:
+
+    def test_warmup(self, random_weights, monkeypatch):
+        calls = []
+        track = SiamMaskTracker.track
+        monkeypatch.setattr(SiamMaskTracker, "track", lambda self, img: calls.append(img.shape) or track(self, img))
+
+        tracker = SiamMaskTracker(cpu_optimize=True, warmup=2)
+
+        assert isinstance(tracker.tracker.features, TracedResDown)
+        assert calls == [(480, 640, 3)] * 2
+        assert tracker.state is None  # the dummy state is not kept
+
+
+class TestSiamMaskInt8:
+
+    def test_calibrate_save_load(self, random_weights, tmp_path):
+        checkpoint = str(tmp_path / "SiamMask_VOT_int8.pth")
+        frames, gt = moving_boxes(nb_frames=4)
+        bbox = Bbox(*gt[0][1])
+
+        with pytest.raises(ValueError):
+            SiamMaskTracker(precision="int8", int8_checkpoint=checkpoint, cpu_optimize=False)
+
+        calibrated = SiamMaskTracker(precision="int8", calibration=(frames[:3], bbox), int8_checkpoint=checkpoint,
+                                     cpu_optimize=False)
+        assert os.path.exists(checkpoint)
+
+        loaded = SiamMaskTracker(precision="int8", int8_checkpoint=checkpoint, cpu_optimize=False)  # no calibration
+
+        for tracker in (calibrated, loaded):
+            tracker.init(frames[0], bbox)
+        for img in frames[1:]:
+            calibrated_bbox, _ = calibrated.track(img)
+            loaded_bbox, _ = loaded.track(img)
+            assert np.array_equal(calibrated_bbox.xywh, loaded_bbox.xywh)
+            assert np.array_equal(calibrated.state['score'], loaded.state['score'])
@@ -0,0 +1,139 @@
+import numpy as np
+import cv2
+import torch
+from ultimatelabeling.siamMask.test import crop_back_roi, get_subwindow_tracking, CropBuffer
+from ultimatelabeling.siamMask.utils.tracker_config import TrackerConfig
+
+
+def crop_back(image, bbox, out_sz, padding=-1):
+    """
+    Full image projection used before crop_back_roi (reference).
+    """
+    a = (out_sz[0] - 1) / bbox[2]
+    b = (out_sz[1] - 1) / bbox[3]
+    c = -a * bbox[0]
+    d = -b * bbox[1]
+    mapping = np.array([[a, 0, c],
+                        [0, b, d]]).astype(float)
+    return cv2.warpAffine(image, mapping, (out_sz[0], out_sz[1]),
+                          flags=cv2.INTER_LINEAR,
+                          borderMode=cv2.BORDER_CONSTANT,
+                          borderValue=padding)
+
+
+def padded_subwindow(im, pos, model_sz, original_sz, avg_chans):
+    """
+    Crop of the whole padded image used before CropBuffer (reference).
+    """
+    sz = original_sz
+    im_sz = im.shape
+    c = (original_sz + 1) / 2
+    context_xmin = round(pos[0] - c)
+    context_xmax = context_xmin + sz - 1
+    context_ymin = round(pos[1] - c)
+    context_ymax = context_ymin + sz - 1
+    left_pad = int(max(0., -context_xmin))
+    top_pad = int(max(0., -context_ymin))
+    right_pad = int(max(0., context_xmax - im_sz[1] + 1))
+    bottom_pad = int(max(0., context_ymax - im_sz[0] + 1))
+
+    context_xmin = context_xmin + left_pad
+    context_xmax = context_xmax + left_pad
+    context_ymin = context_ymin + top_pad
+    context_ymax = context_ymax + top_pad
+
+    r, c, k = im.shape
+    te_im = np.zeros((r + top_pad + bottom_pad, c + left_pad + right_pad, k), np.uint8)
+    te_im[top_pad:top_pad + r, left_pad:left_pad + c, :] = im
+    if top_pad:
+        te_im[0:top_pad, left_pad:left_pad + c, :] = avg_chans
+    if bottom_pad:
+        te_im[r + top_pad:, left_pad:left_pad + c, :] = avg_chans
+    if left_pad:
+        te_im[:, 0:left_pad, :] = avg_chans
+    if right_pad:
+        te_im[:, c + left_pad:, :] = avg_chans
+    im_patch_original = te_im[int(context_ymin):int(context_ymax + 1), int(context_xmin):int(context_xmax + 1), :]
+
+    if not np.array_equal(model_sz, original_sz):
+        return cv2.resize(im_patch_original, (model_sz, model_sz))
+    return im_patch_original
+
+
+def random_masks(nb_masks, im_w, im_h, seed=0):
+    rng = np.random.RandomState(seed)
+    for _ in range(nb_masks):
+        logits = cv2.GaussianBlur(rng.randn(127, 127).astype(np.float32), (0, 0), 8) * 40
+        mask = 1 / (1 + np.exp(-logits))
+        size = rng.uniform(20, 800)
+        sub_box = [rng.uniform(-size / 2, im_w - size / 2), rng.uniform(-size / 2, im_h - size / 2), size, size]
+        yield mask, sub_box
+
+
+def polygon(mask, offset=(0, 0)):
+    target_mask = (mask > TrackerConfig.seg_thr).astype(np.uint8)
+    contours = cv2.findContours(target_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE, offset=offset)[-2]
+    if len(contours) == 0:
+        return None
+    contour = max(contours, key=cv2.contourArea)
+    return cv2.boxPoints(cv2.minAreaRect(contour.reshape(-1, 2)))
+
+
+class TestCropBackRoi:
+
+    def test_same_values_as_full_image_projection(self):
+        im_w, im_h = 1920, 1080
+        for mask, sub_box in random_masks(300, im_w, im_h):
+            s = mask.shape[1] / sub_box[2]
+            back_box = [-sub_box[0] * s, -sub_box[1] * s, im_w * s, im_h * s]
+            full = crop_back(mask, back_box, (im_w, im_h))
+
+            mask_in_roi, roi = crop_back_roi(mask, sub_box, im_w, im_h)
+            x, y, w, h = roi
+
+            assert np.array_equal(mask_in_roi, full[y:y + h, x:x + w])
+            outside = np.ones(full.shape, dtype=bool)
+            outside[y:y + h, x:x + w] = False
+            assert np.all(full[outside] == -1)
+
+            expected = polygon(full)
+            actual = polygon(mask_in_roi, offset=(x, y))
+            assert (actual is None) == (expected is None)
+            if expected is not None:
+                assert np.array_equal(actual, expected)
+
+    def test_box_outside_of_the_image(self):
+        mask = np.ones((127, 127), dtype=np.float32)
+        mask_in_roi, roi = crop_back_roi(mask, [2000, 50, 100, 100], 1920, 1080)
+        assert roi[2] == 0 and mask_in_roi.size == 0
+
+
+class TestSubwindow:
+
+    def windows(self, im, nb_windows, seed=0):
+        rng = np.random.RandomState(seed)
+        im_h, im_w = im.shape[:2]
+        yield np.array([5., 5.]), 255.  # mostly padding
+        yield np.array([im_w / 2, im_h / 2]), float(2 * im_w)  # larger than the image
+        for _ in range(nb_windows):
+            pos = np.array([rng.uniform(0, im_w), rng.uniform(0, im_h)])
+            yield pos, float(round(rng.uniform(20, 700)))
+
+    def test_same_crop_as_padded_image(self):
+        rng = np.random.RandomState(0)
+        im = cv2.GaussianBlur(rng.randint(0, 255, (480, 640, 3)).astype(np.uint8), (0, 0), 2)
+        avg_chans = np.mean(im, axis=(0, 1))
+        buffers = {sz: CropBuffer(sz, pin_memory=False) for sz in (127, 255)}
+
+        for pos, original_sz in self.windows(im, 100):
+            for model_sz in (127, 255, int(original_sz)):  # resized and not resized
+                expected = padded_subwindow(im, pos, model_sz, original_sz, avg_chans)
+
+                patch = get_subwindow_tracking(im, pos, model_sz, original_sz, avg_chans, out_mode="cv2")
+                assert np.array_equal(patch, expected)
+
+                if model_sz in buffers:
+                    tensor = get_subwindow_tracking(im, pos, model_sz, original_sz, avg_chans,
+                                                    out=buffers[model_sz])
+                    assert tensor.shape == (3, model_sz, model_sz)
+                    assert torch.equal(tensor, torch.from_numpy(expected).permute(2, 0, 1).float())
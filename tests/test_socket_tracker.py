@@ -0,0 +1,74 @@
+import os
+import numpy as np
+import cv2
+import pytest
+from ultimatelabeling.local_server import LocalTrackingServer
+from ultimatelabeling.models.tracker import SocketTracker, KCFTracker
+from ultimatelabeling.models.polygon import Bbox
+from tests.test_multi_tracker import moving_boxes
+
+
+@pytest.fixture
+def clip(tmp_path):
+    frames, gt = moving_boxes(nb_frames=12)
+    paths = []
+    for i, img in enumerate(frames):
+        path = os.path.join(str(tmp_path), "{}.png".format(i))
+        cv2.imwrite(path, img)
+        paths.append(path)
+    return paths, Bbox(*gt[0][1])
+
+
+@pytest.fixture
+def server():
+    with LocalTrackingServer() as server:
+        yield server
+
+
+class TestSocketTracker:
+
+    def test_pipelined_tracking_matches_local(self, server, clip):
+        paths, bbox = clip
+
+        local = KCFTracker(state=None)
+        local.init(paths[0], bbox)
+        expected = [local.track(path) for path in paths[1:]]
+
+        for max_in_flight in [1, 4]:
+            tracker = SocketTracker(port=server.port, host=server.host, max_in_flight=max_in_flight)
+            tracker.init(paths[0], bbox)
+            results = list(tracker.track_sequence(paths[1:]))
+            tracker.terminate()
+
+            assert len(results) == len(expected)
+            for (res_bbox, res_polygon), (exp_bbox, exp_polygon) in zip(results, expected):
+                assert np.allclose(res_bbox.xywh, exp_bbox.xywh)
+                assert np.allclose(res_polygon.coords, exp_polygon.coords)
+
+    def test_single_requests(self, server, clip):
+        paths, bbox = clip
+
+        tracker = SocketTracker(port=server.port, host=server.host)
+        tracker.init(paths[0], bbox)
+        res_bbox, _ = tracker.track(paths[1])
+        tracker.terminate()
+
+        assert np.abs(res_bbox.xywh - np.array(bbox.xywh)).max() <= 6
+
+    def test_keyed_init(self, server, clip):
+        paths, bbox = clip
+
+        tracker = SocketTracker(port=server.port, host=server.host)
+        tracker.init(paths[0], bbox, key=("video", 3))
+        res_bbox, _ = tracker.track(paths[1])
+        tracker.terminate()
+
+        assert np.abs(res_bbox.xywh - np.array(bbox.xywh)).max() <= 6
+
+    def test_server_errors_are_raised(self, server, clip, tmp_path):
+        paths, bbox = clip
+
+        tracker = SocketTracker(port=server.port, host=server.host)
+        with pytest.raises(Exception):
+            tracker.init(os.path.join(str(tmp_path), "missing.png"), bbox)
+        tracker.terminate()
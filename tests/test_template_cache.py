@@ -0,0 +1,89 @@
+import numpy as np
+import torch
+import pytest
+from ultimatelabeling.models import tracker as tracker_module
+from ultimatelabeling.models.tracker import TemplateCache, SiamMaskTracker
+from ultimatelabeling.models.polygon import Bbox
+from tests.test_multi_tracker import moving_boxes
+
+
+def crop(value):
+    return torch.full((3, 4, 4), float(value))
+
+
+@pytest.fixture
+def siammask(monkeypatch):
+    # The pretrained weights are not needed to check which template the tracker uses
+    monkeypatch.setattr(tracker_module, "load_pretrain", lambda model, path, use_cuda: model)
+    torch.manual_seed(0)
+    return SiamMaskTracker(cpu_optimize=False)
+
+
+class TestTemplateCache:
+
+    def test_hits_and_misses(self):
+        cache = TemplateCache()
+
+        assert cache.get("a", crop(0)) is None
+        cache.put("a", crop(0), "zf a")
+
+        assert cache.get("a", crop(0)) == "zf a"
+        assert cache.get("a", crop(1)) is None  # same object, other box
+        assert cache.get("b", crop(0)) is None
+
+        assert (cache.hits, cache.misses) == (1, 3)
+        assert cache.hit_rate == 0.25
+        assert TemplateCache().hit_rate == 0.
+
+    def test_least_recently_used_are_evicted(self):
+        cache = TemplateCache(size=2)
+        cache.put("a", crop(0), "zf a")
+        cache.put("b", crop(1), "zf b")
+        cache.get("a", crop(0))
+        cache.put("c", crop(2), "zf c")
+
+        assert "a" in cache and "c" in cache and "b" not in cache
+        assert len(cache) == 2
+
+    def test_invalidate(self):
+        cache = TemplateCache()
+        cache.put("a", crop(0), "zf a")
+        cache.put("b", crop(1), "zf b")
+
+        cache.invalidate("a")
+        assert "a" not in cache and "b" in cache
+
+        cache.invalidate()
+        assert len(cache) == 0
+
+
+class TestSiamMaskTemplateCache:
+
+    def test_reinit_from_same_box_reuses_template(self, siammask):
+        frames, gt = moving_boxes(nb_frames=2)
+        bbox = Bbox(*gt[0][1])
+
+        siammask.init(frames[0], bbox, key=("video", 1))
+        zf = siammask.tracker.zf
+        siammask.track(frames[1])
+
+        siammask.init(frames[0], bbox, key=("video", 1))
+        assert siammask.tracker.zf is zf
+        assert siammask.cache_hit_rate == 0.5
+
+    def test_corrected_box_refreshes_template(self, siammask):
+        frames, gt = moving_boxes(nb_frames=1)
+        bbox = Bbox(*gt[0][1])
+        x, y, w, h = bbox.xywh
+        corrected = Bbox(x + 10, y + 5, w, h)
+
+        siammask.init(frames[0], bbox, key=("video", 1))
+        siammask.init(frames[0], corrected, key=("video", 1))
+        zf = siammask.tracker.zf
+
+        siammask.init(frames[0], corrected)  # without the cache
+        assert torch.equal(zf, siammask.tracker.zf)
+        assert siammask.template_cache.hits == 0
+
+        siammask.invalidate_template(("video", 1))
+        assert ("video", 1) not in siammask.template_cache
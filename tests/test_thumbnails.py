@@ -0,0 +1,52 @@
+import os
+import numpy as np
+import cv2
+from ultimatelabeling.models.thumbnails import ThumbnailAtlas, build_thumbnails, coarse_to_fine
+from tests.test_video_reader import video_file
+
+
+def write_frames(folder, nb_frames):
+    paths = []
+    for i in range(nb_frames):
+        path = os.path.join(folder, "{:05d}.jpg".format(i))
+        cv2.imwrite(path, np.full((96, 128, 3), (i, 2 * i, 3 * i), np.uint8))
+        paths.append(path)
+    return paths
+
+
+class TestThumbnails:
+
+    def test_coarse_to_fine(self):
+        order = coarse_to_fine(10, coarsest_step=4)
+        assert order == [0, 4, 8, 2, 6, 1, 3, 5, 7, 9]
+
+    def test_build_and_reopen(self, tmp_path):
+        paths = write_frames(str(tmp_path), 20)
+        atlas = ThumbnailAtlas.for_video(str(tmp_path / "output"), 20, (96, 128), height=24)
+        assert (atlas.height, atlas.width) == (24, 32)
+        assert atlas.get(3) is None and atlas.nearest(3) == (None, None)
+
+        class StopEvent:
+            def is_set(self):
+                return atlas.nb_ready == 5
+
+        assert not build_thumbnails(atlas, paths, (96, 128), stop_event=StopEvent())
+        assert sorted(np.flatnonzero(atlas.ready)) == [0, 4, 8, 12, 16]  # coarse to fine
+        assert atlas.nearest(11)[0] == 12 and atlas.nearest(19)[0] == 16
+
+        assert build_thumbnails(atlas, paths, (96, 128))
+        assert np.allclose(atlas.get(10)[0, 0], (30, 20, 10), atol=3)  # RGB
+        atlas.close()
+
+        # Reopened with the same frames, then with frames added: the thumbnails are kept
+        assert ThumbnailAtlas.for_video(str(tmp_path / "output"), 20, (96, 128), height=24).nb_ready == 20
+        atlas = ThumbnailAtlas.for_video(str(tmp_path / "output"), 25, (96, 128), height=24)
+        assert atlas.nb_ready == 20 and atlas.get(10) is not None and atlas.get(22) is None
+
+    def test_video_frames(self, video_file):
+        from ultimatelabeling.models.video_reader import VideoReader
+
+        paths = VideoReader(video_file).frame_paths()
+        atlas = ThumbnailAtlas.for_video("output/clip", len(paths), (48, 64), height=12)
+        assert build_thumbnails(atlas, paths, (48, 64))
+        assert atlas.nb_ready == len(paths)
@@ -0,0 +1,100 @@
+import asyncio
+import subprocess
+import sys
+import time
+import pytest
+from ultimatelabeling.models.tracker_pool import TrackerPool
+from ultimatelabeling.models.async_client import AsyncTracker, AsyncJob, client_loop
+from tests.test_async_client import clip, track  # noqa: F401 (fixture)
+
+
+@pytest.fixture
+def servers():
+    """
+    Three local tracking server processes: [(process, port)]
+    """
+    processes = [subprocess.Popen([sys.executable, "-u", "-m", "ultimatelabeling.local_server", "tracker", "-p", "0"],
+                                  stdout=subprocess.PIPE, universal_newlines=True) for _ in range(3)]
+    servers = []
+    for process in processes:
+        line = process.stdout.readline()
+        assert line.startswith("Listening on port"), line
+        servers.append((process, int(line.split()[-1])))
+
+    yield servers
+
+    for process in processes:
+        process.kill()
+        process.wait()
+
+
+class TestTrackerPool:
+
+    def test_least_loaded_dispatch(self):
+        pool = TrackerPool([("127.0.0.1", port) for port in [8787, 8788, 8789]])
+
+        endpoints = [pool.acquire() for _ in range(5)]
+        assert [endpoint.load for endpoint in pool.endpoints] == [2, 2, 1]
+
+        pool.release(endpoints[1])
+        assert pool.acquire() is endpoints[1]
+
+    def test_health_checks(self, servers):
+        pool = TrackerPool([("127.0.0.1", port) for _, port in servers], health_timeout=1.)
+        assert client_loop().submit(pool.check_health()).result(timeout=10) == [True, True, True]
+
+        servers[0][0].kill()
+        servers[0][0].wait()
+        assert client_loop().submit(pool.check_health()).result(timeout=10) == [False, True, True]
+
+        assert {pool.acquire().port for _ in range(4)} == {servers[1][1], servers[2][1]}
+
+        pool.release(pool.endpoints[1], failed=True)
+        pool.release(pool.endpoints[2], failed=True)
+        with pytest.raises(Exception, match="No tracking server"):
+            pool.acquire()
+
+    def test_concurrent_jobs(self, servers, clip):
+        paths, bbox = clip
+        pool = TrackerPool([("127.0.0.1", port) for _, port in servers])
+
+        async def job():
+            endpoint = pool.acquire()
+            try:
+                return await track(AsyncTracker(endpoint.host, endpoint.port), paths, bbox)
+            finally:
+                pool.release(endpoint)
+
+        async def run_jobs():
+            return await asyncio.gather(*[job() for _ in range(7)])
+
+        results = client_loop().submit(run_jobs()).result(timeout=60)
+
+        assert all(len(res) == len(paths) - 1 for res in results)
+        assert [endpoint.load for endpoint in pool.endpoints] == [0, 0, 0]
+
+    def test_stopped_jobs_release_their_server(self):
+        pool = TrackerPool([("127.0.0.1", port) for port in [8787, 8788]])
+
+        class PoolJob(AsyncJob):
+            MAX_PENDING_RESULTS = 1
+
+            async def generate(self):
+                endpoint = pool.acquire()
+                try:
+                    while True:
+                        await asyncio.sleep(0)
+                        yield endpoint.port
+                finally:
+                    pool.release(endpoint)
+
+        for delay in [0, 0.1]:  # stopped before running, or while paused on the results not handled by the GUI
+            job = PoolJob()
+            job.start()
+            time.sleep(delay)
+            job.stop()
+
+            start_time = time.time()  # the job is cancelled right away, its cleanup runs on the client loop
+            while any(endpoint.load for endpoint in pool.endpoints) and time.time() - start_time < 2:
+                time.sleep(0.01)
+            assert [endpoint.load for endpoint in pool.endpoints] == [0, 0]
@@ -0,0 +1,28 @@
+import os
+from ultimatelabeling.models.transfer import upload
+
+
+def make_folder(root):
+    files = {"a.txt": b"a" * 1000, "sub/b.bin": os.urandom(300 * 1000), "sub/deeper/c.txt": b""}
+    for name, data in files.items():
+        path = os.path.join(str(root), name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+    return files
+
+
+class TestTransfer:
+
+    def test_upload(self, ssh_client, tmp_path):
+        client, home = ssh_client
+        files = make_folder(tmp_path / "local" / "server_files")
+
+        progress = []
+        upload(client, [str(tmp_path / "local" / "server_files")], "remote/dir",
+               progress=lambda sent, total, name: progress.append((sent, total, name)))
+
+        for name, data in files.items():
+            assert (home / "remote" / "dir" / "server_files" / name).read_bytes() == data
+        assert progress[-1][:2] == (301000, 301000)
+
@@ -0,0 +1,49 @@
+import os
+import socket
+import threading
+import time
+import pytest
+from ultimatelabeling import utils
+
+
+@pytest.fixture
+def sockets():
+    a, b = socket.socketpair()
+    yield a, b
+    a.close()
+    b.close()
+
+
+class TestRecvAll:
+
+    def test_partial_reads(self, sockets):
+        a, b = sockets
+        payload = os.urandom(3 * 1000 * 1000)
+
+        def send_in_chunks():
+            message = len(payload).to_bytes(4, "big") + payload
+            for i in range(0, len(message), 77777):
+                a.sendall(message[i:i + 77777])
+                time.sleep(0.001)
+
+        sender = threading.Thread(target=send_in_chunks)
+        sender.start()
+        data = utils.recv_data(b)
+        sender.join()
+
+        assert isinstance(data, bytearray) and data == payload
+
+    def test_connection_closed(self, sockets):
+        a, b = sockets
+        a.sendall(len(b"message").to_bytes(4, "big") + b"mess")
+        a.close()
+
+        assert utils.recv_data(b) is None
+
+    def test_timeout(self, sockets):
+        a, b = sockets
+        a.sendall(b"\0\0\0\x10partial")
+
+        with pytest.raises(socket.timeout, match="7 of 16 bytes"):
+            utils.recv_data(b, timeout=0.05)
+        assert b.gettimeout() is None
@@ -0,0 +1,73 @@
+import os
+import time
+import numpy as np
+import cv2
+import pytest
+from PyQt5.QtCore import QCoreApplication
+from ultimatelabeling.models.video_ingestion import ExtractionOptions, VideoIngestion, extract_frames, find_frames, \
+    pending_videos, EXTRACTING_FILE
+
+
+def write_video(path, nb_frames=23, size=(64, 48)):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 25, size)
+    for i in range(nb_frames):
+        writer.write(np.full((size[1], size[0], 3), 10 * i, np.uint8))
+    writer.release()
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    for name in ["a", "b", "c"]:
+        write_video(os.path.join(str(tmp_path), name + ".mp4"))
+    return str(tmp_path)
+
+
+class TestVideoIngestion:
+
+    def test_stride_format_resize(self, data_dir):
+        folder = os.path.join(data_dir, "a")
+        options = ExtractionOptions(stride=5, format="png", max_size=32)
+
+        assert extract_frames(os.path.join(data_dir, "a.mp4"), folder, options) == 5
+        frames = find_frames(folder)
+        assert [os.path.basename(f) for f in frames] == ["{:05d}.png".format(i) for i in range(5)]
+        assert cv2.imread(frames[0]).shape == (24, 32, 3)
+        assert abs(int(cv2.imread(frames[2])[0, 0, 0]) - 100) < 10  # frame 10 of the video
+
+    def test_interrupted_extraction_is_resumed(self, data_dir):
+        folder = os.path.join(data_dir, "a")
+        video_file = os.path.join(data_dir, "a.mp4")
+
+        class StopEvent:
+            def __init__(self, nb_checks):
+                self.nb_checks = nb_checks
+
+            def is_set(self):
+                self.nb_checks -= 1
+                return self.nb_checks < 0
+
+        assert extract_frames(video_file, folder, stop_event=StopEvent(7)) is None  # stopped at frame 7
+        assert len(find_frames(folder)) == 2
+        assert video_file in pending_videos(data_dir)
+
+        first_frame_time = os.path.getmtime(find_frames(folder)[0])
+        assert extract_frames(video_file, folder) == 5
+        assert os.path.getmtime(find_frames(folder)[0]) == first_frame_time
+        assert not os.path.exists(os.path.join(folder, EXTRACTING_FILE))
+        assert video_file not in pending_videos(data_dir)
+
+    def test_parallel_extraction(self, data_dir):
+        app = QCoreApplication.instance() or QCoreApplication([])
+
+        ingestion = VideoIngestion(ExtractionOptions(stride=2), nb_workers=2)
+        finished = []
+        ingestion.finished_signal.connect(finished.append)
+        extractions = [ingestion.submit(video_file) for video_file in pending_videos(data_dir)]
+        assert [extraction.result(timeout=30) for extraction in extractions] == [12, 12, 12]
+
+        start_time = time.time()
+        while len(finished) < 3 and time.time() - start_time < 5:
+            app.processEvents()
+        assert sorted(finished) == ["a", "b", "c"]
+        assert pending_videos(data_dir) == []
+        ingestion.stop()
@@ -0,0 +1,75 @@
+import os
+import numpy as np
+import cv2
+import pytest
+from ultimatelabeling.models.video_reader import VideoIndex, VideoReader, split_frame_path, INDEX_FILE
+from ultimatelabeling.models.frame_source import FrameSource
+
+
+@pytest.fixture
+def video_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the index is saved in output/
+    os.makedirs("data")
+
+    rng = np.random.RandomState(0)
+    writer = cv2.VideoWriter(os.path.join("data", "clip.mp4"), cv2.VideoWriter_fourcc(*"mp4v"), 25, (64, 48))
+    for i in range(60):
+        img = np.full((48, 64, 3), 4 * i, np.uint8)
+        img[:, i % 64] = rng.randint(0, 255, (48, 3))
+        writer.write(img)
+    writer.release()
+    return os.path.join("data", "clip.mp4")
+
+
+def decode_all(video_file):
+    capture = cv2.VideoCapture(video_file)
+    frames = []
+    while True:
+        success, img = capture.read()
+        if not success:
+            return frames
+        frames.append(img)
+
+
+class TestVideoReader:
+
+    def test_random_access(self, video_file):
+        expected = decode_all(video_file)
+        reader = VideoReader(video_file, stride=2, window_size=4)
+        assert reader.nb_frames == 30
+
+        for frame in [20, 3, 29, 0, 21, 5, 5]:
+            assert np.array_equal(reader.read(frame), expected[2 * frame])
+
+        with pytest.raises(IOError):
+            reader.read(30)
+
+    def test_sequential_reads_do_not_seek(self, video_file):
+        reader = VideoReader(video_file, stride=1)
+
+        for frame in range(10, 20):
+            reader.read(frame)
+        assert reader.nb_seeks <= 1 and reader.nb_decodes == 10
+
+        reader.read(15)  # in the decoded window
+        assert reader.nb_decodes == 10
+
+    def test_index_is_persisted(self, video_file, monkeypatch):
+        index = VideoIndex.open(video_file)
+        assert index.nb_frames == 60 and index.keyframes[0] == 0 and len(index.pts) == 60
+        assert os.path.exists(os.path.join("output", "clip", INDEX_FILE))
+
+        def build(video_file):
+            raise AssertionError("The index should be loaded")
+
+        monkeypatch.setattr(VideoIndex, "build", build)
+        assert VideoIndex.open(video_file).keyframes == index.keyframes
+
+    def test_frame_source(self, video_file):
+        source = FrameSource()
+        paths = source.video_reader(video_file).frame_paths()
+        assert split_frame_path(paths[3]) == (video_file, 3) and split_frame_path("data/clip/00003.jpg") is None
+
+        img = source.read(paths[3])
+        assert np.array_equal(img, decode_all(video_file)[3 * VideoReader(video_file).stride])
+        assert not img.flags.writeable
@@ -0,0 +1,65 @@
+import struct
+import numpy as np
+import pytest
+from ultimatelabeling.models import wire
+from ultimatelabeling.models.polygon import Bbox, Polygon, Keypoints
+from ultimatelabeling.models.track_info import Detection
+
+
+def make_detections():
+    return [Detection(1, 4, Polygon([1, 2, 3, 4.5, 5, 6]), Bbox(1, 2, 4, 4.5), Keypoints([10, 11, 2, 12, 13, 0])),
+            Detection(0, 7, Polygon(), Bbox(0.25, 0, 100, 50), Keypoints()),
+            Detection(2, -1, Polygon([0, 0, 1, 0, 1, 1]), Bbox(), Keypoints([1, 2, 1]))]
+
+
+class TestWire:
+
+    def test_detections_round_trip(self):
+        detections = make_detections()
+        message = wire.decode(wire.encode({"type": "detections", "id": 3, "detections": detections}))
+
+        assert message["type"] == "detections" and message["id"] == 3
+        assert [d.to_json() for d in message["detections"]] == [d.to_json() for d in detections]
+
+    def test_decoded_arrays_are_views(self):
+        data = bytearray(wire.encode({"type": "detections", "id": 0, "detections": make_detections()}))
+        detection = wire.decode(data)["detections"][0]
+
+        assert np.shares_memory(detection.bbox.pos, np.frombuffer(data, np.uint8))
+        detection.bbox.resize(2)
+        detection.polygon.resize(2)
+        assert detection.bbox.to_json() == [2, 4, 8, 9]
+        assert detection.polygon.to_json() == [2, 4, 6, 9, 10, 12]
+
+    def test_optional_fields(self):
+        for crop_area in [None, Bbox(1, 2, 3, 4)]:
+            message = {"type": "detect", "id": 1, "image_path": "data/vidéo/00001.jpg", "detector": "YOLO",
+                       "crop_area": crop_area}
+            res = wire.decode(wire.encode(message))
+            assert res["image_path"] == message["image_path"]
+            assert (res["crop_area"] is None) == (crop_area is None)
+
+        res = wire.decode(wire.encode({"type": "tracked", "id": 2, "bbox": None, "polygon": None}))
+        assert res["bbox"] is None and res["polygon"] is None
+
+    def test_schema_is_checked(self):
+        with pytest.raises(wire.WireError):
+            wire.encode({"type": "track", "id": 1})
+        with pytest.raises(wire.WireError):
+            wire.encode({"type": "track", "id": 1, "image_path": "a", "bbox": Bbox()})
+        with pytest.raises(wire.WireError):
+            wire.encode({"type": "init", "id": 1, "image_path": "a", "bbox": [1, 2, 3, 4]})
+        with pytest.raises(wire.WireError):
+            wire.encode({"type": "unknown", "id": 1})
+
+    def test_invalid_messages(self):
+        data = wire.encode({"type": "error", "id": 1, "error": "message"})
+
+        with pytest.raises(wire.WireError, match="version"):
+            wire.decode(data[:4] + struct.pack("<H", wire.VERSION + 1) + data[6:])
+        with pytest.raises(wire.WireError, match="Truncated"):
+            wire.decode(data[:-1])
+        with pytest.raises(wire.WireError, match="trailing"):
+            wire.decode(data + b"\0")
+        with pytest.raises(wire.WireError):
+            wire.decode(b"\x80\x04pickle")
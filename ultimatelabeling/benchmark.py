@@ -0,0 +1,431 @@
+import os
+import glob
+import json
+import time
+import argparse
+import struct
+import socket
+import threading
+from collections import defaultdict
+import cv2
+import numpy as np
+from ultimatelabeling.models.polygon import Bbox, Polygon, Keypoints
+from ultimatelabeling.config import DATA_DIR, OUTPUT_DIR
+from ultimatelabeling import utils
+
+
+#
+# Tracking benchmarks on a local clip (folder of .jpg frames), and RPC encoding benchmarks.
+# - track: runs any Tracker over the clip against ground-truth boxes, reports FPS, per-stage timing, IoU and lost
+#   counts as JSON
+# - synthetic: writes a synthetic clip (moving textured box) with its ground truth, for regression runs
+# - cpu: SiamMask tracking speed (frames per second) in eager mode and with the CPU fast path
+# - precision: speed and mask IoU (w.r.t. fp32) of the bf16 / int8 SiamMask variants
+# - wire: encoding / decoding throughput of a detections response, binary wire format vs JSON
+# - recv: loopback receive throughput of utils.recv_data for 1 MB - 50 MB messages, vs the former bytes concatenation
+# Usage: python -m ultimatelabeling.benchmark track -v road_sample -g road_sample_gt.txt -k kcf siammask -o res.json
+#        python -m ultimatelabeling.benchmark cpu -v road_sample -b 100 200 80 60
+#        python -m ultimatelabeling.benchmark wire --detections 100 --keypoints 17
+#        python -m ultimatelabeling.benchmark recv --sizes 1 10 50
+#
+
+def get_file_names(video, nb_frames=None):
+    folder = video if os.path.isdir(video) else os.path.join(DATA_DIR, video)
+    return sorted(glob.glob(os.path.join(folder, "*.jpg")), key=utils.natural_sort_key)[:nb_frames]
+
+
+def load_frames(video, nb_frames):
+    return [cv2.imread(file_name) for file_name in get_file_names(video, nb_frames)]
+
+
+def load_gt(gt_file, nb_frames):
+    """
+    Ground truth text file: one line per frame, "x y w h" (spaces or commas). Empty, "nan" or zero-size lines mark
+    frames where the object is not visible.
+    Output:
+        list of Bbox or None, one per frame
+    """
+    gt = []
+    with open(gt_file, "r") as f:
+        for line in f:
+            values = [float(v) for v in line.replace(",", " ").split()]
+            visible = len(values) == 4 and np.all(np.isfinite(values)) and values[2] > 0 and values[3] > 0
+            gt.append(Bbox(*values) if visible else None)
+
+    gt += [None] * (nb_frames - len(gt))
+    return gt[:nb_frames]
+
+
+def load_gt_from_output(video, file_names, track_id):
+    """
+    Uses the boxes of track_id labeled in the app (output/<video>/<frame>.txt) as ground truth.
+    """
+    from ultimatelabeling.models.track_info import TrackInfo
+
+    gt = []
+    for file_name in file_names:
+        base = os.path.splitext(os.path.basename(file_name))[0]
+        df = TrackInfo.df_from_csv(os.path.join(OUTPUT_DIR, os.path.basename(os.path.normpath(video)),
+                                                "{}.txt".format(base)))
+        df = df[df.track_id == track_id]
+        gt.append(Bbox(*df[["x", "y", "w", "h"]].values[0].astype(float)) if len(df) > 0 else None)
+    return gt
+
+
+def make_synthetic_clip(folder, nb_frames=100, size=(640, 480), bbox=(100, 100, 80, 60), speed=(3, 1), seed=0):
+    """
+    Writes nb_frames frames of a textured box moving at constant speed (bouncing on the image borders) over a noisy
+    background, and their ground truth in <folder>/gt.txt.
+    """
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+
+    rng = np.random.RandomState(seed)
+    w, h = size
+    background = cv2.GaussianBlur(rng.randint(0, 255, (h, w, 3)).astype(np.uint8), (0, 0), 5)
+    texture = rng.randint(0, 255, (int(bbox[3]), int(bbox[2]), 3)).astype(np.uint8)
+    x, y = bbox[0], bbox[1]
+    vx, vy = speed
+
+    lines = []
+    for i in range(nb_frames):
+        img = background.copy()
+        img[int(y):int(y) + texture.shape[0], int(x):int(x) + texture.shape[1]] = texture
+        cv2.imwrite(os.path.join(folder, "{:06d}.jpg".format(i)), img)
+        lines.append("{} {} {} {}".format(int(x), int(y), texture.shape[1], texture.shape[0]))
+
+        if not 0 <= x + vx <= w - texture.shape[1]:
+            vx = -vx
+        if not 0 <= y + vy <= h - texture.shape[0]:
+            vy = -vy
+        x, y = x + vx, y + vy
+
+    with open(os.path.join(folder, "gt.txt"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def bbox_iou(bbox1, bbox2):
+    x1, y1, x2, y2 = bbox1.x1y1x2y2
+    u1, v1, u2, v2 = bbox2.x1y1x2y2
+
+    intersection = max(0., min(x2, u2) - max(x1, u1)) * max(0., min(y2, v2) - max(y1, v1))
+    union = np.prod(bbox1.size) + np.prod(bbox2.size) - intersection
+    return float(intersection / union) if union > 0 else 0.
+
+
+class StageTimer:
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+
+    def add(self, stage, seconds):
+        self.totals[stage] += seconds
+        self.counts[stage] += 1
+
+    def measure(self, stage, func, *args):
+        start_time = time.perf_counter()
+        res = func(*args)
+        self.add(stage, time.perf_counter() - start_time)
+        return res
+
+    def to_json(self):
+        """
+        Output:
+            {stage: {"total_s", "mean_ms", "count"}}
+        """
+        return {stage: {"total_s": total, "mean_ms": 1000 * total / self.counts[stage], "count": self.counts[stage]}
+                for stage, total in self.totals.items()}
+
+
+def run_tracker(tracker, file_names, gt, skip=5):
+    """
+    Tracks the object from its first ground-truth box. As in the VOT protocol, the object is lost when the tracker
+    fails or does not overlap the ground truth anymore, and the tracker is re-initialized skip frames later.
+    Arguments:
+        tracker (Tracker)
+        file_names (list of str)
+        gt (list of Bbox or None): ground truth of each frame
+    Output:
+        dict: fps, per-stage timing, mean IoU and number of losses
+    """
+    timer = StageTimer()
+    ious = []
+    lost = 0
+    nb_tracked = 0
+    init_frame = next((i for i, bbox in enumerate(gt) if bbox), None)
+
+    for i, file_name in enumerate(file_names):
+        if init_frame is None or i < init_frame:
+            continue
+
+        if i == init_frame and not gt[i]:
+            init_frame += 1
+            continue
+
+        img = file_name if tracker.IMAGE_PATH_INPUT else timer.measure("decode", cv2.imread, file_name)
+
+        if i == init_frame:
+            timer.measure("init", tracker.init, img, gt[i])
+            continue
+
+        bbox, _ = timer.measure("track", tracker.track, img)
+        nb_tracked += 1
+        for stage, seconds in tracker.timings.items():
+            timer.add("track/" + stage, seconds)
+
+        if not gt[i]:
+            continue
+
+        iou = bbox_iou(bbox, gt[i]) if bbox else 0.
+        if iou > 0:
+            ious.append(iou)
+        else:
+            lost += 1
+            init_frame = i + skip
+
+    track_time, decode_time = timer.totals.get("track", 0.), timer.totals.get("decode", 0.)
+    return {
+        "nb_frames": len(file_names),
+        "nb_tracked": nb_tracked,
+        "fps": nb_tracked / track_time if track_time > 0 else 0.,
+        "fps_with_decode": nb_tracked / (track_time + decode_time) if track_time > 0 else 0.,
+        "mean_iou": float(np.mean(ious)) if ious else 0.,
+        "lost": lost,
+        "stages": timer.to_json()
+    }
+
+
+def make_tracker(name, **kwargs):
+    from ultimatelabeling.models.tracker import KCFTracker, SiamMaskTracker
+
+    if name == "kcf":
+        return KCFTracker(state=None)
+    elif name == "siammask":
+        return SiamMaskTracker(**kwargs)
+    raise ValueError("Unknown tracker: {}".format(name))
+
+
+def benchmark_trackers(file_names, gt, trackers=("kcf", "siammask"), skip=5, **kwargs):
+    results = {}
+    for name in trackers:
+        results[name] = run_tracker(make_tracker(name, **kwargs), file_names, gt, skip=skip)
+        print("{}: {:.2f} fps, mean IoU: {:.4f}, lost: {}".format(name, results[name]["fps"],
+                                                                  results[name]["mean_iou"], results[name]["lost"]))
+    return results
+
+
+def measure_fps(tracker, frames, bbox):
+    tracker.init(frames[0], bbox)
+
+    start_time = time.time()
+    for img in frames[1:]:
+        tracker.track(img)
+
+    return (len(frames) - 1) / (time.time() - start_time)
+
+
+def benchmark_siammask_cpu(frames, bbox, num_threads=None, warmup=3):
+    from ultimatelabeling.models.tracker import SiamMaskTracker
+
+    results = {}
+    for name, cpu_optimize in [("eager", False), ("cpu_fast_path", True)]:
+        tracker = SiamMaskTracker(cpu_optimize=cpu_optimize, num_threads=num_threads, warmup=warmup)
+        results[name] = measure_fps(tracker, frames, bbox)
+        print("{}: {:.2f} fps".format(name, results[name]))
+
+    return results
+
+
+def track_masks(tracker, frames, bbox):
+    from ultimatelabeling.siamMask.test import get_full_mask
+
+    tracker.init(frames[0], bbox)
+
+    masks = []
+    start_time = time.time()
+    for img in frames[1:]:
+        tracker.track(img)
+        masks.append(get_full_mask(tracker.state))
+
+    return np.array(masks), (len(frames) - 1) / (time.time() - start_time)
+
+
+def benchmark_siammask_precisions(frames, bbox, precisions=("fp32", "bf16", "int8"), num_threads=None, warmup=3,
+                                  calibration_frames=20, int8_checkpoint=None):
+    """
+    Compares the speed and masks of the reduced precision models to the fp32 one.
+    The int8 model is calibrated on the first calibration_frames frames if its checkpoint does not exist yet.
+    """
+    from ultimatelabeling.models.tracker import SiamMaskTracker
+    from ultimatelabeling.siamMask.test import MultiBatchIouMeter, thrs
+
+    calibration = (frames[:calibration_frames], bbox)
+
+    results = {}
+    reference = None
+    for precision in precisions:
+        tracker = SiamMaskTracker(precision=precision, calibration=calibration, int8_checkpoint=int8_checkpoint,
+                                  num_threads=num_threads, warmup=warmup)
+        masks, fps = track_masks(tracker, frames, bbox)
+
+        if reference is None:
+            reference = (masks > tracker.state['p'].seg_thr).astype(np.uint8)
+
+        iou = MultiBatchIouMeter(thrs, masks[None], reference)
+        results[precision] = {"fps": fps, "iou": dict(zip([round(float(t), 2) for t in thrs], iou[0].tolist()))}
+        print("{}: {:.2f} fps, mean IoU w.r.t. {}: {:.4f}".format(precision, fps, precisions[0], iou.mean()))
+
+    return results
+
+
+def make_detections(nb_detections, nb_keypoints=17, polygon_size=40, seed=0):
+    from ultimatelabeling.models.track_info import Detection
+
+    rng = np.random.RandomState(seed)
+    return [Detection(class_id=int(rng.randint(80)), track_id=i, polygon=Polygon(rng.rand(2 * polygon_size) * 1000),
+                      bbox=Bbox(*(rng.rand(4) * 1000)), keypoints=Keypoints(rng.rand(3 * nb_keypoints) * 1000))
+            for i in range(nb_detections)]
+
+
+def benchmark_wire(nb_detections=100, nb_keypoints=17, polygon_size=40, repeat=20):
+    """
+    Encoding and decoding speed of a detections response with the binary wire format and with JSON (former format).
+    Decoding includes building the Detection objects.
+    """
+    from ultimatelabeling.models import wire
+    from ultimatelabeling.models.track_info import Detection
+
+    detections = make_detections(nb_detections, nb_keypoints, polygon_size)
+    codecs = {
+        "json": (lambda: json.dumps({"id": 0, "detections": [d.to_json() for d in detections]}).encode(),
+                 lambda data: [Detection.from_json(d) for d in json.loads(data.decode())["detections"]]),
+        "wire": (lambda: wire.encode({"type": "detections", "id": 0, "detections": detections}),
+                 lambda data: wire.decode(data)["detections"]),
+    }
+
+    results = {}
+    for name, (encode, decode) in codecs.items():
+        start_time = time.perf_counter()
+        for _ in range(repeat):
+            data = encode()
+        encode_time = (time.perf_counter() - start_time) / repeat
+
+        data = bytearray(data)  # as received by utils.recv_data
+        start_time = time.perf_counter()
+        for _ in range(repeat):
+            decode(data)
+        decode_time = (time.perf_counter() - start_time) / repeat
+
+        results[name] = {"size": len(data), "encode_ms": 1000 * encode_time, "decode_ms": 1000 * decode_time,
+                         "encode_mb_s": len(data) / encode_time / 1e6, "decode_mb_s": len(data) / decode_time / 1e6}
+        print("{}: {} bytes, encode: {:.3f} ms, decode: {:.3f} ms".format(name, len(data), 1000 * encode_time,
+                                                                         1000 * decode_time))
+
+    return results
+
+
+def recv_data_concat(sock):
+    """
+    Former utils.recv_data, growing immutable bytes (quadratic), kept as the reference of the recv benchmark.
+    """
+    def recvall(n):
+        data = b''
+        while len(data) < n:
+            packet = sock.recv(n - len(data))
+            if not packet:
+                return None
+            data += packet
+        return data
+
+    msglen = struct.unpack('>I', recvall(4))[0]
+    return recvall(msglen)
+
+
+def benchmark_recv(sizes_mb=(1, 5, 10, 20, 50), repeat=3):
+    """
+    Receives messages of the given sizes over a loopback TCP connection with utils.recv_data and with the former
+    implementation, and reports the throughput in MB/s.
+    """
+    server_socket = socket.create_server(("127.0.0.1", 0))
+    client_socket = socket.create_connection(server_socket.getsockname())
+    conn, _ = server_socket.accept()
+
+    implementations = {"concat": recv_data_concat, "recv_into": utils.recv_data}
+    results = defaultdict(dict)
+    try:
+        for size_mb in sizes_mb:
+            payload = os.urandom(int(size_mb * 1e6))
+            for name, recv_data in implementations.items():
+                sender = threading.Thread(target=lambda: [utils.send_data(conn, payload) for _ in range(repeat)])
+                sender.start()
+
+                start_time = time.perf_counter()
+                for _ in range(repeat):
+                    assert len(recv_data(client_socket)) == len(payload)
+                seconds = (time.perf_counter() - start_time) / repeat
+                sender.join()
+
+                results[name][size_mb] = len(payload) / seconds / 1e6
+                print("{} MB, {}: {:.0f} MB/s".format(size_mb, name, results[name][size_mb]))
+    finally:
+        for sock in [conn, client_socket, server_socket]:
+            sock.close()
+
+    return dict(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tracking benchmarks")
+    parser.add_argument("benchmark", choices=["track", "synthetic", "cpu", "precision", "wire", "recv"])
+    parser.add_argument("-v", "--video", help="video folder (name inside data/ or path)")
+    parser.add_argument("-b", "--bbox", nargs=4, type=float, help="initial box: x y w h")
+    parser.add_argument("-n", "--nb_frames", type=int, default=100)
+    parser.add_argument("-t", "--threads", type=int, default=None, help="intra-op threads")
+    parser.add_argument("-w", "--warmup", type=int, default=3)
+    parser.add_argument("-p", "--precisions", nargs="+", default=["fp32", "bf16", "int8"])
+    parser.add_argument("--int8_checkpoint", help="quantized checkpoint, defaults to res/SiamMask_VOT_int8.pth")
+    parser.add_argument("-k", "--trackers", nargs="+", default=["kcf", "siammask"], choices=["kcf", "siammask"])
+    parser.add_argument("-g", "--gt", help="ground truth file (x y w h per frame), defaults to <video>/gt.txt")
+    parser.add_argument("--track_id", type=int, help="use the labels of this track (output/<video>) as ground truth")
+    parser.add_argument("-s", "--skip", type=int, default=5, help="frames skipped before re-initializing a lost object")
+    parser.add_argument("--detections", type=int, default=100, help="detections per response (wire benchmark)")
+    parser.add_argument("--keypoints", type=int, default=17, help="keypoints per detection (wire benchmark)")
+    parser.add_argument("--sizes", nargs="+", type=float, default=[1, 5, 10, 20, 50], help="message sizes in MB (recv benchmark)")
+    parser.add_argument("-o", "--output", help="JSON file to write the results to")
+    args = parser.parse_args()
+
+    if args.video is None and args.benchmark not in ["wire", "recv"]:
+        parser.error("the {} benchmark requires --video".format(args.benchmark))
+
+    if args.benchmark == "synthetic":
+        make_synthetic_clip(args.video, args.nb_frames)
+        exit()
+
+    if args.benchmark == "wire":
+        results = benchmark_wire(args.detections, args.keypoints)
+    elif args.benchmark == "recv":
+        results = benchmark_recv(args.sizes)
+    elif args.benchmark == "track":
+        file_names = get_file_names(args.video, args.nb_frames)
+        if args.track_id is not None:
+            gt = load_gt_from_output(args.video, file_names, args.track_id)
+        else:
+            gt = load_gt(args.gt or os.path.join(os.path.dirname(file_names[0]), "gt.txt"), len(file_names))
+
+        results = benchmark_trackers(file_names, gt, args.trackers, skip=args.skip, num_threads=args.threads,
+                                     warmup=args.warmup)
+    else:
+        if args.bbox is None:
+            parser.error("the {} benchmark requires --bbox".format(args.benchmark))
+
+        frames = load_frames(args.video, args.nb_frames)
+        if args.benchmark == "cpu":
+            results = benchmark_siammask_cpu(frames, Bbox(*args.bbox), num_threads=args.threads, warmup=args.warmup)
+        else:
+            results = benchmark_siammask_precisions(frames, Bbox(*args.bbox), precisions=args.precisions,
+                                                    num_threads=args.threads, warmup=args.warmup,
+                                                    int8_checkpoint=args.int8_checkpoint)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
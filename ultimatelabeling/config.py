@@ -6,3 +6,13 @@ DATA_DIR = os.path.join(ROOT_DIR, "data")
 OUTPUT_DIR = os.path.join(ROOT_DIR, "output")
 RESOURCES_DIR = os.path.join(ROOT_DIR, "res")
 SERVER_DIR = "UltimateLabeling_server/"
+TRACKING_SERVER_PORTS = [8787, 8788]  # one tracking server is started per port
+NB_SIAMMASK_SLOTS = 2  # SiamMask tracking jobs that can run at the same time, dispatched over the tracking servers
+
+# Extraction of the frames of the videos placed in DATA_DIR
+FRAME_STRIDE = 5  # keeps one frame every FRAME_STRIDE frames
+FRAME_FORMAT = "jpg"  # jpg, png or webp
+FRAME_QUALITY = 95  # jpg and webp quality (0-100)
+FRAME_MAX_SIZE = None  # maximum width/height of the frames in pixels, None to keep the size of the video
+NB_EXTRACTION_WORKERS = 2  # videos extracted in parallel
+VIDEO_BACKED_FRAMES = False  # reads the frames directly from the video files instead (only for local tracking)
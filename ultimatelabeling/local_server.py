@@ -0,0 +1,235 @@
+import socket
+import threading
+import time
+import random
+import argparse
+import cv2
+from ultimatelabeling.models.polygon import Bbox, Polygon
+from ultimatelabeling.models.track_info import Detection
+from ultimatelabeling.models import wire
+
+
+#
+# Local stand-ins for the remote servers, speaking the same protocols as SocketTracker and SocketDetector (see their
+# docstrings). They run on CPU and are used by the tests, and to try the client side without the GPU server.
+# Usage: python -m ultimatelabeling.local_server tracker -p 8787 (KCF, or siammask)
+#
+
+class LocalServer:
+    CONCURRENT = False  # whether the requests of a connection are processed in parallel (answered out of order)
+
+    def __init__(self, host="127.0.0.1", port=0, delay=0., jitter=0.):
+        """
+        Arguments:
+            port (int): 0 to pick a free port (see self.port)
+            delay (float): seconds added to the processing of every request, to simulate a slower server
+            jitter (float): maximum random delay added on top of it
+        """
+        self.delay = delay
+        self.jitter = jitter
+        self.server_socket = socket.create_server((host, port))
+        self.host, self.port = self.server_socket.getsockname()[:2]
+        self.thread = None
+        self.runs = False
+
+    def start(self):
+        self.runs = True
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+        return self
+
+    def serve(self):
+        while self.runs:
+            try:
+                conn, _ = self.server_socket.accept()
+            except OSError:  # server socket closed
+                break
+            threading.Thread(target=self.handle_connection, args=(conn,), daemon=True).start()
+
+    def handle_connection(self, conn):
+        session = {}
+        send_lock = threading.Lock()
+        with conn:
+            while True:
+                try:
+                    message = wire.recv_message(conn)
+                except OSError:
+                    break
+                if message is None or message["type"] == "terminate":
+                    break
+
+                if self.CONCURRENT:
+                    threading.Thread(target=self.respond, args=(conn, send_lock, message, session), daemon=True).start()
+                else:
+                    self.respond(conn, send_lock, message, session)
+
+        self.close_session(session)
+
+    def respond(self, conn, send_lock, message, session):
+        if message["type"] == "ping":
+            response = {"type": "ok"}
+        else:
+            delay = self.delay + random.uniform(0, self.jitter)
+            if delay:
+                time.sleep(delay)
+
+            try:
+                response = self.handle_message(message, session)
+            except Exception as e:
+                response = {"type": "error", "error": str(e)}
+
+        with send_lock:
+            try:
+                wire.send_message(conn, {"id": message["id"], **response})
+            except OSError:  # the client left
+                pass
+
+    def handle_message(self, message, session):
+        """
+        Arguments:
+            session (dict): state of the connection
+        Output:
+            response (dict)
+        """
+        raise NotImplementedError
+
+    def close_session(self, session):
+        """
+        Called when the connection of the session is closed.
+        """
+        pass
+
+    def stop(self):
+        self.runs = False
+        self.server_socket.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+class LocalTrackingServer(LocalServer):
+    """
+    Tracks with a local tracker taking image paths (KCF by default), one per connection.
+    """
+    def __init__(self, tracker_factory=None, **kwargs):
+        super().__init__(**kwargs)
+
+        if tracker_factory is None:
+            from ultimatelabeling.models.tracker import KCFTracker
+            tracker_factory = lambda: KCFTracker(state=None)
+        self.tracker_factory = tracker_factory
+
+    def handle_message(self, message, session):
+        if message["type"] in ["init", "init_keyed"]:
+            if "tracker" not in session:
+                session["tracker"] = self.tracker_factory()
+            session["tracker"].init(message["image_path"], message["bbox"], key=message.get("key"))
+            return {"type": "ok"}
+
+        elif message["type"] == "track":
+            bbox, polygon = session["tracker"].track(message["image_path"])
+            return {"type": "tracked", "bbox": bbox, "polygon": polygon}
+
+        raise ValueError("Unknown request type: {}".format(message["type"]))
+
+
+class LocalSiamMaskServer(LocalTrackingServer):
+    """
+    Tracks with SiamMask. Loading the model is slow, so the trackers are kept from one connection to the next, and they
+    share a template cache: restarting the tracking of an object from the same box (init_keyed) skips its template pass.
+    """
+    def __init__(self, **kwargs):
+        from ultimatelabeling.models.tracker import TemplateCache
+
+        super().__init__(tracker_factory=self.acquire_tracker, **kwargs)
+        self.template_cache = TemplateCache()
+        self.idle_trackers = []
+        self.lock = threading.Lock()
+
+    def acquire_tracker(self):
+        with self.lock:
+            if self.idle_trackers:
+                return self.idle_trackers.pop()
+
+        from ultimatelabeling.models.tracker import SiamMaskTracker
+        return _ImagePathTracker(SiamMaskTracker(template_cache=self.template_cache))
+
+    def close_session(self, session):
+        if "tracker" in session:
+            with self.lock:
+                self.idle_trackers.append(session["tracker"])
+
+
+class _ImagePathTracker:
+    """
+    Tracker taking OpenCV images, fed with the image paths of the requests.
+    """
+    def __init__(self, tracker):
+        self.tracker = tracker
+
+    def init(self, image_path, bbox, key=None):
+        self.tracker.init(self.read(image_path), bbox, key=key)
+
+    def track(self, image_path):
+        return self.tracker.track(self.read(image_path))
+
+    @staticmethod
+    def read(image_path):
+        img = cv2.imread(image_path)
+        if img is None:
+            raise IOError("Cannot read image {}".format(image_path))
+        return img
+
+
+class LocalDetectionServer(LocalServer):
+    """
+    Mock detector returning nb_detections boxes covering the cropping area (or the whole image). Requests are processed
+    in parallel, so that with some jitter the responses come back out of order.
+    """
+    CONCURRENT = True
+
+    def __init__(self, nb_detections=1, **kwargs):
+        super().__init__(**kwargs)
+        self.nb_detections = nb_detections
+
+    def handle_message(self, message, session):
+        if message["type"] != "detect":
+            raise ValueError("Unknown request type: {}".format(message["type"]))
+
+        img = cv2.imread(message["image_path"])
+        if img is None:
+            raise IOError("Cannot read image {}".format(message["image_path"]))
+
+        if message["crop_area"]:
+            bbox = message["crop_area"]
+        else:
+            bbox = Bbox(0, 0, img.shape[1], img.shape[0])
+
+        detections = [Detection(track_id=i, polygon=Polygon.from_bbox(bbox), bbox=bbox) for i in range(self.nb_detections)]
+        return {"type": "detections", "detections": detections}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local stand-in servers")
+    parser.add_argument("server", choices=["tracker", "siammask", "detector"])
+    parser.add_argument("-p", "--port", type=int, help="defaults to 8787 for the trackers, 8786 for the detector (0: any)")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to listen on (0.0.0.0: all, reachable from "
+                                                            "other machines)")
+    parser.add_argument("-d", "--delay", type=float, default=0., help="simulated processing time per request (s)")
+    parser.add_argument("-j", "--jitter", type=float, default=0., help="maximum random extra time per request (s)")
+    args = parser.parse_args()
+
+    if args.server in ["tracker", "siammask"]:
+        port = 8787 if args.port is None else args.port
+        server_class = LocalTrackingServer if args.server == "tracker" else LocalSiamMaskServer
+        server = server_class(host=args.host, port=port, delay=args.delay, jitter=args.jitter)
+    else:
+        port = 8786 if args.port is None else args.port
+        server = LocalDetectionServer(host=args.host, port=port, delay=args.delay, jitter=args.jitter)
+
+    server.start()
+    print("Listening on port {}".format(server.port))
+    server.thread.join()
@@ -3,7 +3,9 @@ from PyQt5.QtCore import Qt
 from PyQt5 import QtCore, QtGui
 from .views import *
 from .models import State, StateListener, KeyboardNotifier
+from .models.video_ingestion import VideoIngestion, pending_videos
 from .styles import Theme
+from .config import VIDEO_BACKED_FRAMES, DATA_DIR
 
 
 class MainWindow(QMainWindow):
@@ -12,13 +14,47 @@ class MainWindow(QMainWindow):
 
         self.setWindowTitle("UltimateLabeler")
 
-        self.central_widget = CentralWidget()
+        self.statusBar()
+
+        # New video files are extracted in the background, and listed as soon as their first frame is ready
+        self.video_ingestion = VideoIngestion()
+        video_files = [] if VIDEO_BACKED_FRAMES else pending_videos()
+        for video_file in video_files:
+            self.video_ingestion.submit(video_file)
+
+        self.state = State()
+        self.central_widget = None
+
+        if self.state.find_videos():
+            self.make_central_widget()
+        else:  # first start: the labeling widgets are created once a first frame can be displayed
+            self.waiting_label = QLabel("Extracting the frames of {} video(s)...".format(len(video_files)) if video_files
+                                        else "No video found in {}".format(DATA_DIR))
+            self.waiting_label.setAlignment(Qt.AlignCenter)
+            self.setCentralWidget(self.waiting_label)
+
+            self.video_ingestion.progress_signal.connect(self.on_first_frame)
+            self.video_ingestion.finished_signal.connect(self.on_first_frame)
+            self.video_ingestion.err_signal.connect(self.waiting_label.setText)
+
+        self.show()
+        self.center()
+
+    def on_first_frame(self, *args):
+        if self.central_widget is not None or not self.state.find_videos():
+            return
+
+        self.video_ingestion.progress_signal.disconnect(self.on_first_frame)
+        self.video_ingestion.finished_signal.disconnect(self.on_first_frame)
+        self.video_ingestion.err_signal.disconnect(self.waiting_label.setText)
+        self.make_central_widget()
+
+    def make_central_widget(self):
+        self.central_widget = CentralWidget(self.state, self.video_ingestion)
         self.central_widget.setFocusPolicy(Qt.StrongFocus)
         self.setFocusProxy(self.central_widget)
         self.central_widget.setFocus(True)
 
-        self.statusBar()
-
         mainMenu = self.menuBar()
 
         fileMenu = mainMenu.addMenu('&File')
@@ -50,9 +86,6 @@ class MainWindow(QMainWindow):
 
         self.setCentralWidget(self.central_widget)
 
-        self.show()
-        self.center()
-
     def open_url(self):
         url = QtCore.QUrl('https://github.com/alexandre01/UltimateLabeling')
         if not QtGui.QDesktopServices.openUrl(url):
@@ -66,22 +99,33 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         print("exiting")
+        self.video_ingestion.stop()
+        if self.central_widget is None:
+            return
+
+        self.central_widget.detection_manager.detached_progress.stop()
         self.central_widget.ssh_login.closeServers()
+        self.central_widget.slider.stop_workers()
         self.central_widget.state.track_info.save_to_disk()
         self.central_widget.state.save_state()
 
 
 class CentralWidget(QWidget, StateListener):
-    def __init__(self):
+    def __init__(self, state, video_ingestion):
         super().__init__()
 
-        self.state = State()
+        self.video_ingestion = video_ingestion
+
+        self.state = state
         self.state.load_state()
         self.state.add_listener(self)
 
         self.keyboard_notifier = KeyboardNotifier()
 
         self.video_list_widget = VideoListWidget(self.state)
+        self.video_ingestion.progress_signal.connect(self.video_list_widget.on_extraction_progress)
+        self.video_ingestion.finished_signal.connect(self.video_list_widget.on_extraction_finished)
+        self.video_ingestion.err_signal.connect(self.video_list_widget.on_extraction_error)
         self.img_widget = ImageWidget(self.state)
         self.slider = VideoSlider(self.state, self.keyboard_notifier)
         self.player = PlayerWidget(self.state)
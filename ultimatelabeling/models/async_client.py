@@ -0,0 +1,309 @@
+import asyncio
+import struct
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal
+from .polygon import Polygon
+from . import wire
+
+
+#
+# asyncio clients of the tracking and detection servers (same protocols as SocketTracker and SocketDetector).
+# All the connections are multiplexed on a single event loop running in a background thread (client_loop()), instead
+# of one blocking QThread per tracker. AsyncJob bridges a client coroutine to the Qt event loop: its results are
+# delivered as Qt signals in the GUI thread, and cancel() interrupts it immediately, even while waiting on the server.
+#
+
+class ClientLoop:
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def submit(self, coroutine):
+        """
+        Output:
+            concurrent.futures.Future of the coroutine result (its cancel() cancels the coroutine)
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+_client_loop = None
+_client_loop_lock = threading.Lock()
+
+
+def client_loop():
+    """
+    Event loop shared by all the server connections, started on first use.
+    """
+    global _client_loop
+    with _client_loop_lock:
+        if _client_loop is None:
+            _client_loop = ClientLoop()
+        return _client_loop
+
+
+class AsyncConnection:
+    """
+    Length-prefixed wire.py messages (as utils.send_data / recv_data) over an asyncio stream.
+    """
+    def __init__(self, reader, writer, timeout=None):
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+
+    @staticmethod
+    async def open(host, port, timeout=None):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        return AsyncConnection(reader, writer, timeout)
+
+    async def send(self, message):
+        data = wire.encode(message)
+        self.writer.write(struct.pack('>I', len(data)) + data)
+        await self.writer.drain()  # waits while the send buffer is full (backpressure)
+
+    async def recv(self):
+        """
+        Output:
+            dict, or None if the connection was closed. Raises asyncio.TimeoutError after self.timeout seconds.
+        """
+        try:
+            raw_msglen = await asyncio.wait_for(self.reader.readexactly(4), self.timeout)
+            data = await asyncio.wait_for(self.reader.readexactly(struct.unpack('>I', raw_msglen)[0]), self.timeout)
+        except asyncio.IncompleteReadError:
+            return None
+        return wire.decode(data)
+
+    async def close(self, request_id=0):
+        try:
+            await self.send({"id": request_id, "type": "terminate"})
+        except (OSError, RuntimeError):
+            pass
+        self.writer.close()
+
+
+def _check_response(response, server):
+    if response is None:
+        raise Exception("Connection closed by the {} server".format(server))
+    if response["type"] == "error":
+        raise Exception(response["error"])
+    return response
+
+
+class AsyncTracker:
+    """
+    asyncio counterpart of SocketTracker.
+    """
+    def __init__(self, host, port, max_in_flight=4, timeout=30.):
+        self.host = host
+        self.port = port
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+
+        self.connection = None
+        self.next_id = 0
+
+    async def init(self, image_path, bbox, key=None):
+        await self.close()
+
+        request_type, fields = wire.init_request(image_path, bbox, key)
+        self.connection = await AsyncConnection.open(self.host, self.port, self.timeout)
+        await self.connection.send({"id": self.new_id(), "type": request_type, **fields})
+        _check_response(await self.connection.recv(), "tracking")
+
+    async def track_sequence(self, image_paths):
+        """
+        Async generator of (bbox, polygon) for each image, keeping up to max_in_flight requests queued on the server.
+        """
+        image_paths = iter(image_paths)
+        nb_pending = 0
+
+        for image_path in image_paths:
+            await self.connection.send({"id": self.new_id(), "type": "track", "image_path": image_path})
+            nb_pending += 1
+            if nb_pending == self.max_in_flight:
+                break
+
+        while nb_pending:
+            response = _check_response(await self.connection.recv(), "tracking")
+            nb_pending -= 1
+
+            image_path = next(image_paths, None)
+            if image_path is not None:
+                await self.connection.send({"id": self.new_id(), "type": "track", "image_path": image_path})
+                nb_pending += 1
+
+            if response["bbox"] is None:
+                yield None, None
+            else:
+                yield response["bbox"], response["polygon"] or Polygon.from_bbox(response["bbox"])
+
+    def new_id(self):
+        self.next_id += 1
+        return self.next_id
+
+    async def close(self):
+        if self.connection is not None:
+            await self.connection.close(self.new_id())
+            self.connection = None
+
+
+class AsyncDetector:
+    """
+    asyncio counterpart of SocketDetector: requests are spread over nb_connections persistent connections (reused by the
+    following calls until close()) and the results are yielded in the order they arrive.
+    """
+    def __init__(self, host, port, nb_connections=2, max_in_flight=4, timeout=60.):
+        self.host = host
+        self.port = port
+        self.nb_connections = nb_connections
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+
+        self.connections = []
+        self.next_id = 0
+
+    async def connect(self):
+        if not self.connections:
+            self.connections = list(await asyncio.gather(*[AsyncConnection.open(self.host, self.port, self.timeout)
+                                                           for _ in range(self.nb_connections)]))
+
+    async def detect(self, image_path, crop_area=None, detector="YOLO"):
+        [(_, detections)] = [res async for res in self.detect_frames([image_path], crop_area, detector)]
+        return detections
+
+    async def detect_frames(self, image_paths, crop_area=None, detector="YOLO"):
+        """
+        Async generator of (frame, detections).
+        Arguments:
+            image_paths (dict or list): frame -> image path
+        """
+        if not isinstance(image_paths, dict):
+            image_paths = dict(enumerate(image_paths))
+
+        queue = iter(image_paths.items())
+        results = asyncio.Queue(maxsize=self.max_in_flight)  # full when the consumer lags: the workers stop reading
+
+        async def worker(connection):
+            pending = {}  # request id -> frame
+
+            async def send_next():
+                item = next(queue, None)
+                if item is not None:
+                    self.next_id += 1
+                    pending[self.next_id] = item[0]
+                    await connection.send({"id": self.next_id, "type": "detect", "image_path": item[1],
+                                           "detector": detector, "crop_area": crop_area if crop_area else None})
+
+            for _ in range(self.max_in_flight):
+                await send_next()
+
+            while pending:
+                response = _check_response(await connection.recv(), "detection")
+                if response["id"] not in pending:
+                    raise Exception("Unexpected response {}".format(response["id"]))
+                frame = pending.pop(response["id"])
+                await send_next()
+                await results.put((frame, response["detections"]))
+
+        await self.connect()
+        workers = [asyncio.ensure_future(worker(connection)) for connection in self.connections]
+        done = asyncio.ensure_future(asyncio.gather(*workers))
+        completed = False
+        try:
+            while True:
+                if not results.empty():
+                    yield results.get_nowait()
+                elif done.done():
+                    done.result()  # raises the error of a worker
+                    break
+                else:
+                    getter = asyncio.ensure_future(results.get())
+                    await asyncio.wait([getter, done], return_when=asyncio.FIRST_COMPLETED)
+                    if getter.done():
+                        yield getter.result()
+                    else:
+                        getter.cancel()
+            completed = True
+        finally:
+            done.cancel()
+            for task in workers:
+                task.cancel()
+            if not completed:
+                # Failed or interrupted: drops the connections rather than receiving stale responses in the next call
+                await self.close()
+
+    async def close(self):
+        connections, self.connections = self.connections, []
+        for connection in connections:
+            self.next_id += 1
+            await connection.close(self.next_id)
+
+
+class AsyncJob(QObject):
+    """
+    Runs an async generator on the client loop and emits each of its items with result_signal, in the GUI thread.
+    At most MAX_PENDING_RESULTS items wait to be handled by the GUI thread: the generator is paused beyond (backpressure).
+    Has the interface of the QThreads it replaces (start, stop, isRunning, err_signal, finished).
+    """
+    MAX_PENDING_RESULTS = 8
+
+    result_signal = pyqtSignal(object)
+    err_signal = pyqtSignal(str)
+    finished = pyqtSignal()
+    delivery_signal = pyqtSignal(object, object)  # slots of the run, item
+
+    def __init__(self):
+        super().__init__()
+        self.future = None
+        self.stopped = False  # results still queued for the GUI thread after stop() are ignored
+        self.delivery_signal.connect(self.deliver)
+
+    def start(self):
+        self.stopped = False
+        self.future = client_loop().submit(self.run())
+
+    def generate(self):
+        """
+        Output:
+            async generator of the results
+        """
+        raise NotImplementedError
+
+    async def run(self):
+        slots = asyncio.Semaphore(self.MAX_PENDING_RESULTS)
+        generator = self.generate()
+        try:
+            async for item in generator:
+                await slots.acquire()  # waits while the GUI thread lags behind
+                self.delivery_signal.emit(slots, item)
+        except asyncio.CancelledError:
+            pass
+        except asyncio.TimeoutError:
+            self.err_signal.emit("The server did not answer in time.")
+        except Exception as e:
+            self.err_signal.emit(str(e))
+        finally:
+            await generator.aclose()  # runs its cleanup even if cancelled while it was paused at a yield
+            self.finished.emit()
+
+    def deliver(self, slots, item):
+        try:
+            if not self.stopped:
+                self.result_signal.emit(item)
+        finally:
+            client_loop().loop.call_soon_threadsafe(slots.release)
+
+    def isRunning(self):
+        return self.future is not None and not self.future.done()
+
+    def stop(self):
+        self.stopped = True
+        if self.future is not None:
+            self.future.cancel()
+
+    def terminate(self):
+        self.stop()
@@ -0,0 +1,109 @@
+import json
+import shlex
+import inspect
+from collections import deque
+
+
+STALE_AFTER = 60  # seconds without update after which the detached detection is considered dead
+
+
+def watch_status(info_file, interval, once, out, stale_after):
+    """
+    Server side of the progress channel (standard library only, sent over SSH by watch_command).
+    Writes to out one JSON line per update of info_file (the running_info.json of the detached detection), with the
+    server time of the update ("mtime") and its age in seconds ("age"), or null if the file does not exist. Stops after
+    the first line if once, when the detection is over or failed, or with {"stale": true, "age"} when info_file was not
+    updated for stale_after seconds (the detection was killed).
+    """
+    import os
+    import time
+    import json
+
+    start_time = time.time()
+    last_mtime = None
+    while True:
+        try:
+            mtime = os.stat(info_file).st_mtime
+        except OSError:
+            mtime = None
+
+        if mtime is None and once:
+            out.write("null\n")
+            out.flush()
+            return
+
+        if mtime is not None and mtime != last_mtime:
+            try:
+                with open(info_file, "r") as f:
+                    info = json.load(f)
+            except ValueError:  # being written, read again on the next poll
+                info = None
+
+            if info is not None:
+                last_mtime = mtime
+                info["mtime"] = mtime
+                info["age"] = time.time() - mtime
+                out.write(json.dumps(info) + "\n")
+                out.flush()
+
+                if once or "error" in info or info.get("current_frame", 0) >= info.get("total_frame", float("inf")):
+                    return
+
+        # A detection started after the watcher has stale_after seconds to write its first update
+        age = time.time() - (start_time if mtime is None else max(mtime, start_time))
+        if age > stale_after:
+            out.write(json.dumps({"stale": True, "age": age}) + "\n")
+            out.flush()
+            return
+
+        time.sleep(interval)
+
+
+def watch_command(info_file, interval=0.5, once=False, stale_after=STALE_AFTER):
+    """
+    Shell command running watch_status on the server, the status lines are read on its standard output.
+    """
+    script = inspect.getsource(watch_status) + \
+        "\nimport sys\nwatch_status({!r}, {!r}, {!r}, sys.stdout, {!r})\n".format(info_file, interval, once, stale_after)
+    return "python3 -c {}".format(shlex.quote(script))
+
+
+def parse_status(line):
+    """
+    Output:
+        status dict, or None if the info file does not exist on the server
+    """
+    return json.loads(line)
+
+
+class ProgressEstimator:
+    """
+    Throughput (frames/s) and remaining time of a detection, over the last window_size status updates.
+    """
+    def __init__(self, window_size=10):
+        self.updates = deque(maxlen=window_size)  # (server time, frame)
+
+    def update(self, status):
+        if self.updates and status["current_frame"] < self.updates[-1][1]:  # a new detection was started
+            self.updates.clear()
+        self.updates.append((status["mtime"], status["current_frame"]))
+
+    @property
+    def fps(self):
+        if len(self.updates) < 2:
+            return None
+
+        (start_time, start_frame), (end_time, end_frame) = self.updates[0], self.updates[-1]
+        if end_time <= start_time:
+            return None
+        return (end_frame - start_frame) / (end_time - start_time)
+
+    def eta(self, total_frames):
+        """
+        Output:
+            remaining time in seconds, None if unknown
+        """
+        fps = self.fps
+        if not fps:
+            return None
+        return max(total_frames - self.updates[-1][1], 0) / fps
@@ -0,0 +1,75 @@
+import os
+import json
+import time
+from ultimatelabeling.config import OUTPUT_DIR
+
+CHECKPOINT_FILE = ".detection_checkpoint.json"
+
+
+def to_ranges(frames):
+    """
+    Output:
+        sorted list of [start, end] (inclusive) covering the frames
+    """
+    ranges = []
+    for frame in sorted(set(frames)):
+        if ranges and frame == ranges[-1][1] + 1:
+            ranges[-1][1] = frame
+        else:
+            ranges.append([frame, frame])
+    return ranges
+
+
+def from_ranges(ranges):
+    return {frame for start, end in ranges for frame in range(start, end + 1)}
+
+
+class DetectionCheckpoint:
+    """
+    Frames of a video already processed by a detection run, per detector and cropping area (a run with other settings
+    starts over). Saved in output/<video>/.detection_checkpoint.json, as frame ranges, every SAVE_INTERVAL seconds while
+    frames are added and by flush() when the run ends, so that an interrupted detection only requests the missing frames
+    when it is restarted.
+    """
+    SAVE_INTERVAL = 2.  # seconds
+
+    def __init__(self, video_name, detector, crop_area=None):
+        self.file = os.path.join(OUTPUT_DIR, video_name, CHECKPOINT_FILE)
+        self.key = "{} {}".format(detector, " ".join(str(int(x)) for x in crop_area.to_json()) if crop_area is not None else "full")
+
+        self.runs = {}
+        if os.path.exists(self.file):
+            with open(self.file, "r") as f:
+                self.runs = json.load(f)
+        self.done = from_ranges(self.runs.get(self.key, []))
+        self.last_save = 0
+        self.modified = False
+
+    def __contains__(self, frame):
+        return frame in self.done
+
+    def add(self, frame):
+        self.done.add(frame)
+        self.modified = True
+        if time.time() - self.last_save > self.SAVE_INTERVAL:
+            self.save()
+
+    def flush(self):
+        if self.modified:
+            self.save()
+
+    def reset(self):
+        self.done = set()
+        self.save()
+
+    def save(self):
+        self.runs[self.key] = to_ranges(self.done)
+        self.last_save = time.time()
+        self.modified = False
+
+        if not os.path.exists(os.path.dirname(self.file)):
+            os.makedirs(os.path.dirname(self.file))
+
+        with open(self.file + ".part", "w") as f:
+            json.dump(self.runs, f)
+        os.replace(self.file + ".part", self.file)  # never left half-written if the application is killed
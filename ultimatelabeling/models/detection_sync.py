@@ -0,0 +1,107 @@
+import os
+import json
+import shlex
+import inspect
+import tarfile
+
+MANIFEST_FILE = ".detached_manifest.json"  # local copy of the server manifest as of the last sync
+
+
+def pack_changes(folder, manifest, out):
+    """
+    Server side of the sync (standard library only, sent over SSH by sync_command).
+    Writes to out a streamed tar.gz holding the new manifest, {file name: [mtime, size, sha1]} of the files of folder,
+    followed by the files that changed w.r.t. manifest (the previous one, as known by the client). Only the files whose
+    mtime or size changed are hashed.
+    """
+    import io
+    import os
+    import json
+    import hashlib
+    import tarfile
+
+    new_manifest, changed = {}, []
+    for name in sorted(os.listdir(folder)) if os.path.isdir(folder) else []:
+        path = os.path.join(folder, name)
+        if name.startswith(".") or not os.path.isfile(path):
+            continue
+
+        stat = os.stat(path)
+        previous = manifest.get(name)
+        if previous is not None and previous[:2] == [stat.st_mtime, stat.st_size]:
+            new_manifest[name] = previous
+            continue
+
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        new_manifest[name] = [stat.st_mtime, stat.st_size, digest]
+
+        if previous is None or previous[2] != digest:
+            changed.append(name)
+
+    with tarfile.open(fileobj=out, mode="w|gz") as tar:
+        data = json.dumps(new_manifest).encode()
+        info = tarfile.TarInfo(".detached_manifest.json")
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+
+        for name in changed:
+            tar.add(os.path.join(folder, name), arcname=name)
+
+
+def sync_command(server_folder):
+    """
+    Shell command running pack_changes on server_folder, reading the previous manifest (JSON) on its standard input and
+    writing the archive on its standard output.
+    """
+    script = inspect.getsource(pack_changes) + \
+        "\nimport sys, json\npack_changes({!r}, json.load(sys.stdin), sys.stdout.buffer)\n".format(server_folder)
+    return "python3 -c {}".format(shlex.quote(script))
+
+
+def load_manifest(folder):
+    manifest_file = os.path.join(folder, MANIFEST_FILE)
+    if not os.path.exists(manifest_file):
+        return {}
+
+    with open(manifest_file, "r") as f:
+        return json.load(f)
+
+
+def unpack_changes(stream, folder):
+    """
+    Client side of the sync: extracts the archive written by pack_changes while it is received, and saves its manifest
+    once all the files are written (an interrupted sync is fetched again next time).
+    Output:
+        names of the files written to folder
+    """
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+
+    manifest = None
+    written = []
+
+    with tarfile.open(fileobj=stream, mode="r|gz") as tar:
+        for member in tar:
+            if not member.isfile() or os.path.basename(member.name) != member.name or member.name in ("", ".", ".."):
+                raise ValueError("Unexpected file in the sync archive: {}".format(member.name))
+
+            data = tar.extractfile(member).read()
+            if member.name == MANIFEST_FILE:
+                manifest = json.loads(data.decode())
+                continue
+
+            # Written then renamed: a frame file is never seen half-written
+            path = os.path.join(folder, member.name)
+            with open(path + ".part", "wb") as f:
+                f.write(data)
+            os.replace(path + ".part", path)
+            written.append(member.name)
+
+    if manifest is None:
+        raise ValueError("The sync archive has no manifest")
+
+    with open(os.path.join(folder, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+
+    return written
@@ -1,9 +1,8 @@
 import torch
 from .track_info import Detection
-import json
 import socket
-import pickle
-from ultimatelabeling import utils
+import selectors
+from . import wire
 
 
 class Detector:
@@ -22,80 +21,121 @@ class Detector:
         """
         raise NotImplementedError
 
+    def detect_frames(self, image_paths, crop_area=None, detector="YOLO"):
+        """
+        Arguments:
+            image_paths (dict or list): frame -> image path
+        Output:
+            generator of (frame, detections), in the order they are ready
+        """
+        if not isinstance(image_paths, dict):
+            image_paths = dict(enumerate(image_paths))
+
+        for frame, image_path in image_paths.items():
+            yield frame, self.detect(image_path, crop_area=crop_area, detector=detector)
+
     def terminate(self):
         pass
 
 
 class SocketDetector(Detector):
+    """
+    Client of the detection server. init() opens a pool of persistent connections, reused by the following calls
+    until terminate(). Messages use the same framing as SocketTracker:
+        -> {"id", "type": "detect", "image_path", "detector", "crop_area"}  <- {"id", "type": "detections", "detections"}
+        -> {"id", "type": "terminate"}
+    Any response can instead be {"id", "type": "error", "error"}. The server may answer in any order: detect_frames keeps up to
+    max_in_flight requests queued on each connection and yields the results tagged with their frame as they arrive.
+    """
     HOST = "128.178.17.112"
     PORT = 8786
-    OK_SIGNAL, TERMINATE_SIGNAL = b"ok", b"terminate"
-
-    def init(self):
-        self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.client_socket.connect((self.HOST, self.PORT))
-        self.receive_ok_signal()
-
-    def detect(self, image_path, crop_area=None, detector="YOLO"):
-        options = {
-            "filename": image_path,
-            "seq_path": None,
-            "detector": detector,
-            "crop_area": crop_area.to_json() if crop_area else None
-        }
-        self.send_options(options)
-        detections = self.receive_detections()
-
-        return detections
+    NB_CONNECTIONS = 2
+    MAX_IN_FLIGHT = 4
 
-    def detect_sequence(self, seq_path, nb_frames, crop_area=None, detector="YOLO"):
+    def __init__(self, host=HOST, port=PORT, nb_connections=NB_CONNECTIONS, max_in_flight=MAX_IN_FLIGHT):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.nb_connections = nb_connections
+        self.max_in_flight = max_in_flight
 
-        options = {
-            "filename": None,
-            "seq_path": seq_path,
-            "detector": detector,
-            "crop_area": crop_area.to_json() if crop_area else None
-        }
-        self.send_options(options)
+        self.connections = []
+        self.next_id = 0
 
-        for i in range(nb_frames):
-            detections = self.receive_detections()
-            yield detections
-
-    def send_image_path(self, image_path):
-        data = image_path.encode()
-        self.client_socket.sendall(data)
-
-    def send_options(self, options):
-        print(options)
-
-        data = pickle.dumps(options)
-        self.client_socket.sendall(data)
-
-    def send_crop_area(self, crop_area):
-        """
-        crop_area (Bbox)
-        """
-        data = pickle.dumps(crop_area.to_json())
-        self.client_socket.send(data)
-
-    def receive_detections(self):
-        json_response = utils.recv_data(self.client_socket)
-        response = json.loads(json_response.decode())
+    def init(self):
+        if self.connections:
+            return
 
-        if "error" in response:
-            raise Exception(response["error"])
+        try:
+            for _ in range(self.nb_connections):
+                self.connections.append(socket.create_connection((self.host, self.port)))
+        except OSError:
+            self.terminate()
+            raise
 
-        detections = [Detection.from_json(d) for d in response]
+    def detect(self, image_path, crop_area=None, detector="YOLO"):
+        [(_, detections)] = list(self.detect_frames([image_path], crop_area=crop_area, detector=detector))
         return detections
 
-    def receive_ok_signal(self):
-        data = self.client_socket.recv(1024)
-        return data
-
-    def send_terminate_signal(self):
-        self.client_socket.sendall(self.TERMINATE_SIGNAL)
+    def detect_frames(self, image_paths, crop_area=None, detector="YOLO"):
+        if not isinstance(image_paths, dict):
+            image_paths = dict(enumerate(image_paths))
+
+        self.init()
+
+        options = {"detector": detector, "crop_area": crop_area if crop_area else None}
+        queue = iter(image_paths.items())
+        pending = {}  # request id -> frame
+
+        def send_next(conn):
+            item = next(queue, None)
+            if item is None:
+                return
+
+            frame, image_path = item
+            request_id = self.next_id
+            self.next_id += 1
+
+            wire.send_message(conn, {"id": request_id, "type": "detect", "image_path": image_path, **options})
+            pending[request_id] = frame
+
+        selector = selectors.DefaultSelector()
+        try:
+            for conn in self.connections:
+                selector.register(conn, selectors.EVENT_READ)
+            for _ in range(self.max_in_flight):
+                for conn in self.connections:
+                    send_next(conn)
+
+            while pending:
+                for key, _ in selector.select():
+                    conn = key.fileobj
+                    response = wire.recv_message(conn)
+                    if response is None:
+                        raise Exception("Connection closed by the detection server")
+
+                    if response.get("id") not in pending:
+                        raise Exception("Unexpected response {}".format(response.get("id")))
+                    frame = pending.pop(response["id"])
+
+                    if response["type"] == "error":
+                        raise Exception(response["error"])
+
+                    send_next(conn)
+                    yield frame, response["detections"]
+        except BaseException:
+            # Failed or interrupted: drop the connections rather than receiving stale responses in the next call
+            self.terminate()
+            raise
+        finally:
+            selector.close()
 
     def terminate(self):
-        self.send_terminate_signal()
-        self.client_socket.close()
+        for conn in self.connections:
+            try:
+                wire.send_message(conn, {"id": self.next_id, "type": "terminate"})
+            except OSError:
+                pass
+            conn.close()
+
+        self.connections = []
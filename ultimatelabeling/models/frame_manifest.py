@@ -0,0 +1,48 @@
+import os
+import json
+import cv2
+from ultimatelabeling.config import OUTPUT_DIR
+from .video_ingestion import find_frames, EXTRACTING_FILE
+
+MANIFEST_FILE = ".frames_manifest.json"
+
+
+def load_frame_manifest(folder):
+    """
+    Frames of a video folder, cached in output/<video>/.frames_manifest.json. The cache is valid as long as the
+    modification time of the folder is unchanged (adding, removing or renaming a frame updates it), so opening a
+    video does not list and sort its frames again.
+    Output:
+        {"mtime", "file_names" (paths), "nb_frames", "image_size" ((h, w), None if no frame)}
+    """
+    video_name = os.path.basename(os.path.normpath(folder))
+    manifest_file = os.path.join(OUTPUT_DIR, video_name, MANIFEST_FILE)
+    mtime = os.stat(folder).st_mtime_ns
+
+    if os.path.exists(manifest_file):
+        with open(manifest_file, "r") as f:
+            manifest = json.load(f)
+
+        if manifest["mtime"] == mtime:
+            manifest["file_names"] = [os.path.join(folder, name) for name in manifest["file_names"]]
+            return manifest
+
+    file_names = find_frames(folder)
+
+    image_size = None
+    if file_names:
+        img = cv2.imread(file_names[0])
+        if img is not None:
+            image_size = img.shape[:2]
+
+    manifest = {"mtime": mtime, "file_names": file_names, "nb_frames": len(file_names), "image_size": image_size}
+    if os.path.exists(os.path.join(folder, EXTRACTING_FILE)):  # still changing
+        return manifest
+
+    if not os.path.exists(os.path.dirname(manifest_file)):
+        os.makedirs(os.path.dirname(manifest_file))
+    with open(manifest_file + ".part", "w") as f:
+        json.dump(dict(manifest, file_names=[os.path.basename(f) for f in file_names]), f)
+    os.replace(manifest_file + ".part", manifest_file)
+
+    return manifest
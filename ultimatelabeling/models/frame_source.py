@@ -0,0 +1,178 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import cv2
+from .video_reader import VideoReader, split_frame_path
+
+
+class FrameSource:
+    """
+    Decodes each frame once and shares it between its consumers (trackers, image viewer).
+
+    Frames are reference counted: acquire() returns the decoded frame (BGR, as cv2.imread) and release() gives it back.
+    Frames nobody holds anymore are kept in a small LRU cache, so that consumers reading the same frame one after the
+    other (e.g. a tracker followed by the viewer) share a single decode. The returned arrays are read-only.
+    Paths can also be frames of a video file (see video_reader), decoded from the video.
+    """
+    def __init__(self, cache_size=8):
+        self.cache_size = cache_size
+
+        self.lock = threading.Lock()
+        self.frames = {}  # path -> [img, ref_count], frames currently held by a consumer
+        self.released = OrderedDict()  # path -> img, LRU cache of frames nobody holds
+        self.loading = {}  # path -> threading.Event, frames being decoded by another thread
+        self.videos = {}  # video file -> VideoReader
+
+        self.nb_decodes = 0
+        self.nb_hits = 0
+
+    def acquire(self, path):
+        while True:
+            with self.lock:
+                if path in self.frames:
+                    self.frames[path][1] += 1
+                    self.nb_hits += 1
+                    return self.frames[path][0]
+
+                if path in self.released:
+                    img = self.released.pop(path)
+                    self.frames[path] = [img, 1]
+                    self.nb_hits += 1
+                    return img
+
+                loading = self.loading.get(path)
+                if loading is None:
+                    loading = self.loading[path] = threading.Event()
+                    break
+
+            # Another consumer is decoding this frame
+            loading.wait()
+
+        img = None
+        try:
+            img = self.decode(path)
+        finally:
+            with self.lock:
+                del self.loading[path]
+                if img is not None:
+                    self.frames[path] = [img, 1]
+                    self.nb_decodes += 1
+                loading.set()
+
+        if img is None:
+            raise IOError("Cannot read frame {}".format(path))
+        return img
+
+    def decode(self, path):
+        video_frame = split_frame_path(path)
+        if video_frame is None:
+            img = cv2.imread(path)
+            if img is not None:
+                img.flags.writeable = False
+            return img
+
+        return self.video_reader(video_frame[0]).read(video_frame[1])
+
+    def video_reader(self, video_file):
+        reader = self.videos.get(video_file)
+        if reader is None:
+            reader = VideoReader(video_file)  # may index the video: outside of the lock
+            with self.lock:
+                reader = self.videos.setdefault(video_file, reader)
+        return reader
+
+    def release(self, path):
+        with self.lock:
+            if path not in self.frames:
+                return
+
+            self.frames[path][1] -= 1
+            if self.frames[path][1] == 0:
+                self.released[path] = self.frames.pop(path)[0]
+                while len(self.released) > self.cache_size:
+                    self.released.popitem(last=False)
+
+    @contextmanager
+    def frame(self, path):
+        img = self.acquire(path)
+        try:
+            yield img
+        finally:
+            self.release(path)
+
+    def read(self, path):
+        """
+        Acquires and immediately releases the frame (it stays in the cache for the next consumers).
+        """
+        with self.frame(path) as img:
+            return img
+
+    def clear(self):
+        with self.lock:
+            self.released.clear()
+            videos, self.videos = self.videos, {}
+
+        for reader in videos.values():
+            reader.close()
+
+
+
+class FramePrefetcher:
+    """
+    Decodes frames into a FrameSource from a background thread, latest request wins: requests made while a frame is
+    being decoded replace each other, only the most recent one is decoded next. Used while scrubbing, so that the frame
+    is already decoded when the display catches up.
+    """
+    def __init__(self, frame_source):
+        self.frame_source = frame_source
+
+        self.condition = threading.Condition()
+        self.latest = None  # path to decode next
+        self.loading = None  # path being decoded
+        self.stopped = False
+
+        self.nb_loaded = 0
+        self.nb_skipped = 0
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def request(self, path):
+        with self.condition:
+            if self.latest is not None:
+                self.nb_skipped += 1
+            self.latest = path
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.latest is None and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                self.loading, self.latest = self.latest, None
+
+            try:
+                self.frame_source.read(self.loading)
+                self.nb_loaded += 1
+            except IOError:
+                pass
+
+            with self.condition:
+                self.loading = None
+                self.condition.notify_all()
+
+    def wait(self):
+        """
+        Waits until all the requests are decoded.
+        """
+        with self.condition:
+            while self.latest is not None or self.loading is not None:
+                self.condition.wait()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.thread.join()
@@ -5,6 +5,7 @@ import sys
 import os
 import math
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from scipy.spatial import distance
 from scipy.optimize import linear_sum_assignment
 import pdb
@@ -124,27 +125,130 @@ def linear_interpolation(df):
     return df.sort_values(by=['frame'])
 
 
-def track(df, max_distance = 100, max_frame=20, joint_distance=20, class_infer=True, linear_infer=True):
+def center_distance_cost(boxes1, boxes2):
+    """
+    Euclidean distance between the box centers.
+    Boxes are given as arrays of (xc, yc, w, h).
+    """
+    return distance.cdist(boxes1[:, :2], boxes2[:, :2], 'euclidean')
+
+
+def iou_cost(boxes1, boxes2):
+    """
+    1 - IoU between all pairs of boxes.
+    Boxes are given as arrays of (xc, yc, w, h).
+    """
+    tl1, br1 = boxes1[:, None, :2] - boxes1[:, None, 2:] / 2, boxes1[:, None, :2] + boxes1[:, None, 2:] / 2
+    tl2, br2 = boxes2[None, :, :2] - boxes2[None, :, 2:] / 2, boxes2[None, :, :2] + boxes2[None, :, 2:] / 2
+
+    inter = np.prod(np.clip(np.minimum(br1, br2) - np.maximum(tl1, tl2), 0, None), axis=2)
+    union = np.prod(boxes1[:, None, 2:], axis=2) + np.prod(boxes2[None, :, 2:], axis=2) - inter
+
+    return 1 - inter / np.maximum(union, 1e-9)
+
+
+COST_FUNCTIONS = {
+    "distance": center_distance_cost,
+    "iou": iou_cost,
+}
+
+
+class KalmanFilter:
+    """
+    Constant-velocity Kalman filter on the box centers, vectorized over all the track ids.
+    The state of a track is (xc, yc, vx, vy), its measurement is (xc, yc).
+    """
+    def __init__(self, process_noise=1., measurement_noise=10., velocity_noise=100.):
+        self.F = np.array([[1., 0., 1., 0.],
+                           [0., 1., 0., 1.],
+                           [0., 0., 1., 0.],
+                           [0., 0., 0., 1.]])
+        self.H = np.eye(2, 4)
+        self.Q = np.eye(4) * process_noise
+        self.R = np.eye(2) * measurement_noise
+        self.P0 = np.diag([measurement_noise, measurement_noise, velocity_noise, velocity_noise])
+
+        self.means = np.zeros((0, 4))
+        self.covariances = np.zeros((0, 4, 4))
+
+    def initiate(self, ids, centers):
+        ids = np.asarray(ids, dtype=int)
+        if len(ids) == 0:
+            return
+
+        nb_missing = ids.max() + 1 - len(self.means)
+        if nb_missing > 0:
+            self.means = np.concatenate([self.means, np.zeros((nb_missing, 4))])
+            self.covariances = np.concatenate([self.covariances, np.zeros((nb_missing, 4, 4))])
+
+        self.means[ids] = 0
+        self.means[ids, :2] = centers
+        self.covariances[ids] = self.P0
+
+    def predict(self, ids):
+        ids = np.unique(np.asarray(ids, dtype=int))
+        if len(ids) == 0:
+            return
+
+        self.means[ids] = self.means[ids] @ self.F.T
+        self.covariances[ids] = self.F @ self.covariances[ids] @ self.F.T + self.Q
+
+    def update(self, ids, centers):
+        ids = np.asarray(ids, dtype=int)
+        if len(ids) == 0:
+            return
+
+        P = self.covariances[ids]
+        S = self.H @ P @ self.H.T + self.R
+        K = P @ self.H.T @ np.linalg.inv(S)
+        innovation = centers - self.means[ids] @ self.H.T
+
+        self.means[ids] += np.einsum("nij,nj->ni", K, innovation)
+        self.covariances[ids] = (np.eye(4) - K @ self.H) @ P
+
+    def centers(self, ids):
+        return self.means[np.asarray(ids, dtype=int), :2]
+
+
+def track(df, max_distance = 100, max_frame=20, joint_distance=20, class_infer=True, linear_infer=True, cost="distance",
+          min_iou=0.1, kalman=False):
     """
     Args:
         df
         max_distance: Max distance between consecutive bounding boxes
         max_frame:  Max frame to track bounding box
         joint_distance:  Merge path if two distinct path are close enough
+        cost: Association cost, one of COST_FUNCTIONS ("distance" or "iou")
+        min_iou: Min IoU between consecutive bounding boxes (only used with the "iou" cost)
+        kalman: Associate the detections with the constant-velocity Kalman prediction of the tracks
     """
+    df = assign_track_ids(df, max_distance=max_distance, max_frame=max_frame, cost=cost, min_iou=min_iou, kalman=kalman)
+    return refine_tracks(df, joint_distance=joint_distance, class_infer=class_infer, linear_infer=linear_infer)
+
+
+def assign_track_ids(df, max_distance=100, max_frame=20, cost="distance", min_iou=0.1, kalman=False):
+    """
+    Frame-to-frame Hungarian assignment, without any post-processing.
+    Frames are expected to start at 0.
+    """
+    cost_function = COST_FUNCTIONS[cost]
+    max_cost = 1 - min_iou if cost == "iou" else max_distance
 
     # initialize label for time t=0
     Y = [[i for i in range(len(df[df["frame"] == 0]))]]
+    next_id = len(Y[0])
+
+    if kalman:
+        kalman_filter = KalmanFilter()
+        kalman_filter.initiate(Y[0], df[df["frame"] == 0][["xc", "yc"]].values.astype(float))
 
     buf = []
     for t in range(0, int(df["frame"].max())):
 
         # get the bounding boxes at time t and t+1
         # x1 is t, x2 is t+1
-        x1 = df[df["frame"] == t][["xc", "yc"]].values
-        x2 = df[df["frame"] == t + 1][["xc", "yc"]].values
-        x1 = np.array([(bbox[0], bbox[1]) for bbox in x1])
-        x2 = np.array([(bbox[0], bbox[1]) for bbox in x2])
+        x1 = df[df["frame"] == t][["xc", "yc", "w", "h"]].values.astype(float)
+        x2 = df[df["frame"] == t + 1][["xc", "yc", "w", "h"]].values.astype(float)
 
         # append Y for time t+1
         Y.append([-1 for i in range(np.shape(x2)[0])])
@@ -154,6 +258,12 @@ def track(df, max_distance = 100, max_frame=20, joint_distance=20, class_infer=T
             x1_buf.append(b[2])
         x1_buf = np.array(x1_buf)
 
+        # move the tracks (and the buffered ones) to their predicted position at time t+1
+        if kalman and np.shape(x1_buf)[0] != 0:
+            labels = Y[-2] + [Y[b[0]][b[1]] for b in buf]
+            kalman_filter.predict(labels)
+            x1_buf[:, :2] = kalman_filter.centers(labels)
+
         # - compute the distances between all vehicles at time t (and in the buffer) to time t+1
         # - then compute the optimal assignment
         # *** only compute assignments if x2 is not empty
@@ -165,11 +275,11 @@ def track(df, max_distance = 100, max_frame=20, joint_distance=20, class_infer=T
             row_assigned, col_assigned = [], []
 
             if np.shape(x1)[0] != 0:
-                distances_priority = distance.cdist(x1, x2, 'euclidean')
+                distances_priority = cost_function(x1_buf[:np.shape(x1)[0]], x2)
                 row_index_priority, col_index_priority = linear_sum_assignment(distances_priority)
                 for r, c in zip(row_index_priority, col_index_priority):
                     # assign labels from time t to t+1
-                    if distances_priority[r][c] < max_distance:
+                    if distances_priority[r][c] < max_cost:
                         Y[-1][c] = Y[-2][r]
                         row_assigned.append(r)
                         col_assigned.append(c)
@@ -177,7 +287,7 @@ def track(df, max_distance = 100, max_frame=20, joint_distance=20, class_infer=T
             # now compute the optimal assignments between x1_buf and x2 without double assignments
             # set the distances between the previously matched objects to a very small number to force them to match again
             if np.shape(x1_buf)[0] != 0:
-                distances = distance.cdist(x1_buf, x2, 'euclidean')
+                distances = cost_function(x1_buf, x2)
                 for r, c in zip(row_assigned, col_assigned):
                     distances[r][c] = -999999
 
@@ -191,7 +301,7 @@ def track(df, max_distance = 100, max_frame=20, joint_distance=20, class_infer=T
                     # assign labels from buffer to t+1
                     # then remove them
                     if r >= np.shape(x1)[0]:
-                        if distances[r][c] < max_distance:
+                        if distances[r][c] < max_cost:
                             buf_ind = r - np.shape(x1)[0]
                             rm.append(buf_ind)
                             Y[-1][c] = Y[buf[buf_ind][0]][buf[buf_ind][1]]
@@ -212,11 +322,21 @@ def track(df, max_distance = 100, max_frame=20, joint_distance=20, class_infer=T
                 tup = (-2, i, x1[i])  # (timestamp, index of object in x1, coordinates)
                 buf.append(tup)
 
+        if kalman:
+            matched = [i for i, y in enumerate(Y[-1]) if y != -1]
+            kalman_filter.update([Y[-1][i] for i in matched], x2[matched, :2])
+
         # give new label to unassigned objects in x2
         # these are (most probably) newly found objects
+        new = []
         for i in range(len(Y[-1])):
             if Y[-1][i] == -1:
-                Y[-1][i] = np.amax([y for yy in Y for y in yy]) + 1
+                Y[-1][i] = next_id
+                next_id += 1
+                new.append(i)
+
+        if kalman:
+            kalman_filter.initiate([Y[-1][i] for i in new], x2[new, :2])
 
         # increment timestamps
         for i in range(len(buf)):
@@ -238,6 +358,10 @@ def track(df, max_distance = 100, max_frame=20, joint_distance=20, class_infer=T
     for t, y in enumerate(Y):
         df.loc[df["frame"] == t, "track_id"] = y
 
+    return df
+
+
+def refine_tracks(df, joint_distance=20, class_infer=True, linear_infer=True):
     print("Merge wrongly separeted trajectories....")
     df = merge_trajectories(df, joint_distance)
 
@@ -255,3 +379,96 @@ def track(df, max_distance = 100, max_frame=20, joint_distance=20, class_infer=T
         df = linear_interpolation(df)
 
     return df
+
+
+
+def split_chunks(nb_frames, chunk_size, overlap):
+    """
+    Splits [0, nb_frames) into consecutive chunks of chunk_size frames, each extended by overlap frames.
+    Output:
+        list of (start, core_end, end)
+    """
+    return [(start, min(start + chunk_size, nb_frames), min(start + chunk_size + overlap, nb_frames))
+            for start in range(0, nb_frames, chunk_size)]
+
+
+def _assign_chunk(args):
+    chunk_df, start, assign_kwargs = args
+
+    if len(chunk_df) == 0:
+        return pd.Series(dtype=int)
+
+    chunk_df = chunk_df.copy()
+    chunk_df["frame"] -= start
+    chunk_df = assign_track_ids(chunk_df, **assign_kwargs)
+    return chunk_df["track_id"].astype(int)
+
+
+def stitch_chunks(chunk_ids, chunk_ranges, frames):
+    """
+    Merges the track ids of overlapping chunks into globally consistent ids.
+    Tracks of two consecutive chunks are matched (Hungarian algorithm) on the number of detections they share in
+    the overlap window. Each detection then keeps the id given by the chunk whose core range contains it.
+
+    Args:
+        chunk_ids: list of pd.Series (detection index -> chunk track_id)
+        chunk_ranges: list of (start, core_end, end), as returned by split_chunks
+        frames: pd.Series (detection index -> frame)
+    Output:
+        pd.Series (detection index -> global track_id)
+    """
+    next_id = 0
+    prev_ids = None
+    stitched = []
+
+    for ids, (start, core_end, _) in zip(chunk_ids, chunk_ranges):
+        mapping = {}
+
+        if prev_ids is not None:
+            shared = ids.index.intersection(prev_ids.index)
+            if len(shared) > 0:
+                counts = pd.crosstab(prev_ids.loc[shared], ids.loc[shared])
+                row_index, col_index = linear_sum_assignment(-counts.values)
+                for r, c in zip(row_index, col_index):
+                    if counts.values[r, c] > 0:
+                        mapping[counts.columns[c]] = counts.index[r]
+
+        for local_id in pd.unique(ids):
+            if local_id not in mapping:
+                mapping[local_id] = next_id
+                next_id += 1
+
+        global_ids = ids.map(mapping)
+        chunk_frames = frames.loc[global_ids.index]
+        stitched.append(global_ids[(chunk_frames >= start) & (chunk_frames < core_end)])
+        prev_ids = global_ids
+
+    return pd.concat(stitched)
+
+
+def track_parallel(df, nb_workers=None, chunk_size=500, overlap=50, max_distance=100, max_frame=20, joint_distance=20,
+                   class_infer=True, linear_infer=True, cost="distance", min_iou=0.1, kalman=False):
+    """
+    Same as track, but the Hungarian assignment runs on overlapping temporal chunks in a process pool.
+    The chunks are then stitched together by matching the tracks in their overlap window.
+
+    Args:
+        nb_workers: Number of worker processes (defaults to the number of CPU cores)
+        chunk_size: Number of frames per chunk
+        overlap: Number of frames shared by two consecutive chunks, should be larger than max_frame
+    """
+    if len(df) == 0:
+        return df
+
+    frames = df["frame"].astype(int)
+    chunk_ranges = split_chunks(int(frames.max()) + 1, chunk_size, overlap)
+    assign_kwargs = dict(max_distance=max_distance, max_frame=max_frame, cost=cost, min_iou=min_iou, kalman=kalman)
+    jobs = [(df[(frames >= start) & (frames < end)], start, assign_kwargs) for start, _, end in chunk_ranges]
+
+    print("Assigning labels on {} chunks....".format(len(jobs)))
+    with ProcessPoolExecutor(max_workers=nb_workers) as executor:
+        chunk_ids = list(executor.map(_assign_chunk, jobs))
+
+    df["track_id"] = stitch_chunks(chunk_ids, chunk_ranges, frames)
+
+    return refine_tracks(df, joint_distance=joint_distance, class_infer=class_infer, linear_infer=linear_infer)
@@ -0,0 +1,130 @@
+import os
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+from .polygon import Bbox
+
+
+def _kcf_worker(conn):
+    """
+    Worker process owning a subset of the KCF trackers. Frames are read from the shared memory block sent with the
+    "frame" command, so that each frame is decoded and transferred only once.
+    """
+    trackers = {}
+    shm, img = None, None
+
+    while True:
+        cmd, args = conn.recv()
+
+        if cmd == "frame":
+            if shm is not None:
+                shm.close()
+            name, shape = args
+            shm = shared_memory.SharedMemory(name=name)
+            img = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+
+        elif cmd == "init":
+            for track_id, bbox in args:
+                tracker = cv2.TrackerKCF_create()
+                tracker.init(img, bbox)
+                tracker.update(img)
+                trackers[track_id] = tracker
+            conn.send(None)
+
+        elif cmd == "track":
+            res = []
+            for track_id, tracker in list(trackers.items()):
+                success, bbox = tracker.update(img)
+                if not success:
+                    del trackers[track_id]
+                res.append((track_id, tuple(bbox) if success else None))
+            conn.send(res)
+
+        elif cmd == "terminate":
+            break
+
+    if shm is not None:
+        img = None
+        shm.close()
+
+
+class MultiKCFTracker:
+    """
+    Tracks several objects with one KCF tracker each, spread over worker processes.
+    """
+    def __init__(self, nb_workers=None):
+        self.nb_workers = nb_workers or os.cpu_count() or 1
+        self.workers = []
+        self.shm = None
+        self.frame = None
+
+    def init(self, img, bboxes):
+        """
+        Arguments:
+            img (OpenCV image)
+            bboxes (dict): track_id -> Bbox
+        """
+        self.terminate()
+
+        # spawn rather than fork: the main process runs Qt threads
+        ctx = mp.get_context("spawn")
+        for _ in range(max(1, min(self.nb_workers, len(bboxes)))):
+            conn, worker_conn = ctx.Pipe()
+            process = ctx.Process(target=_kcf_worker, args=(worker_conn,), daemon=True)
+            process.start()
+            self.workers.append((process, conn))
+
+        self.set_frame(img)
+
+        tasks = [[] for _ in self.workers]
+        for i, (track_id, bbox) in enumerate(bboxes.items()):
+            tasks[i % len(self.workers)].append((track_id, tuple(int(round(v)) for v in bbox.to_json())))
+
+        for (_, conn), task in zip(self.workers, tasks):
+            conn.send(("init", task))
+        for _, conn in self.workers:
+            conn.recv()
+
+    def set_frame(self, img):
+        if self.frame is None or self.frame.shape != img.shape:
+            self.release_frame()
+            self.shm = shared_memory.SharedMemory(create=True, size=img.nbytes)
+            self.frame = np.ndarray(img.shape, dtype=np.uint8, buffer=self.shm.buf)
+            for _, conn in self.workers:
+                conn.send(("frame", (self.shm.name, img.shape)))
+
+        self.frame[:] = img
+
+    def track(self, img):
+        """
+        Output:
+            dict: track_id -> Bbox, for the objects that are still tracked
+        """
+        self.set_frame(img)
+
+        for _, conn in self.workers:
+            conn.send(("track", None))
+
+        bboxes = {}
+        for _, conn in self.workers:
+            for track_id, bbox in conn.recv():
+                if bbox is not None:
+                    bboxes[track_id] = Bbox(*bbox)
+        return bboxes
+
+    def release_frame(self):
+        if self.shm is not None:
+            self.frame = None
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def terminate(self):
+        for process, conn in self.workers:
+            if process.is_alive():
+                conn.send(("terminate", None))
+            process.join()
+            conn.close()
+        self.workers = []
+        self.release_frame()
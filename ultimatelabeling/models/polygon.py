@@ -15,6 +15,15 @@ class Bbox:
         self.pos = np.array([x, y], dtype=float)
         self.size = np.array([w, h], dtype=float)
 
+    @staticmethod
+    def from_array(xywh):
+        """
+        Bbox viewing the float array [x, y, w, h] (no copy)
+        """
+        bbox = Bbox.__new__(Bbox)
+        bbox.pos, bbox.size = xywh[:2], xywh[2:]
+        return bbox
+
     def resize(self, scale):
         self.pos *= scale
         self.size *= scale
@@ -132,6 +141,15 @@ class Polygon:
     def __init__(self, coords=[]):
         self.coords = np.array(coords, dtype=float)
 
+    @staticmethod
+    def from_array(coords):
+        """
+        Polygon viewing the float array coords (no copy)
+        """
+        polygon = Polygon.__new__(Polygon)
+        polygon.coords = coords
+        return polygon
+
     def resize(self, scale):
         self.coords *= scale
         return self
@@ -168,6 +186,17 @@ class Keypoints:
 
         self.coords = np.array(coords, dtype=float)
 
+    @staticmethod
+    def from_array(coords):
+        """
+        Keypoints viewing the float array coords (no copy)
+        """
+        assert len(coords) % 3 == 0, "Keypoints length not a multiple of 3"
+
+        keypoints = Keypoints.__new__(Keypoints)
+        keypoints.coords = coords
+        return keypoints
+
     def get_anchors(self, factor=2):
         anchors = {}
 
@@ -1,13 +1,14 @@
 import pickle
 import os
-import glob
 import re
 from PyQt5.QtCore import QThread, QMutex
 from ultimatelabeling.styles import Theme
 from .ssh_credentials import SSHCredentials
 from .track_info import TrackInfo
-from ultimatelabeling import utils
-from ultimatelabeling.config import DATA_DIR, STATE_PATH
+from .frame_source import FrameSource
+from .frame_manifest import load_frame_manifest
+from .video_reader import VIDEO_EXTENSIONS, is_video_file
+from ultimatelabeling.config import DATA_DIR, STATE_PATH, VIDEO_BACKED_FRAMES
 
 
 class FrameMode:
@@ -61,6 +62,8 @@ class State:
 
         self.img_viewer = None
 
+        self.frame_source = FrameSource()
+
         self.listeners = set()
 
     def get_file_name(self, frame=None):
@@ -76,30 +79,46 @@ class State:
             yield self.get_file_name(frame)
 
     def find_videos(self):
-        return next(os.walk(DATA_DIR))[1]
-
-    def check_raw_videos(self):
-        files = glob.glob(os.path.join(DATA_DIR, "*.mp4"))
-        files.extend(glob.glob(os.path.join(DATA_DIR, "*.mov")))
+        _, folders, files = next(os.walk(DATA_DIR))
 
-        for file in files:
-            base = os.path.basename(file)
-            filename = os.path.splitext(base)[0]
+        if VIDEO_BACKED_FRAMES:  # video files not extracted are opened directly
+            folders += [os.path.splitext(file)[0] for file in files
+                        if is_video_file(file) and os.path.splitext(file)[0] not in folders]
+        return folders
 
-            if filename not in self.video_list:
-                print("Extracting video {}...".format(base))
-                utils.convert_video_to_frames(file, os.path.join(DATA_DIR, filename))
-        self.video_list = self.find_videos()
+    def find_video_file(self, video_name):
+        for extension in VIDEO_EXTENSIONS:
+            for video_file in [video_name + extension, video_name + extension.upper()]:
+                if os.path.exists(os.path.join(DATA_DIR, video_file)):
+                    return os.path.join(DATA_DIR, video_file)
+        return None
 
     def update_file_names(self):
         if self.current_video:
-            self.file_names = sorted(glob.glob(os.path.join(DATA_DIR, self.current_video, '*.jpg')), key = utils.natural_sort_key)
+            folder = os.path.join(DATA_DIR, self.current_video)
+            if os.path.isdir(folder):
+                manifest = load_frame_manifest(folder)
+                self.file_names = manifest["file_names"]
+                if manifest["image_size"] is not None:
+                    self.image_size = tuple(manifest["image_size"])
+            else:
+                self.file_names = self.frame_source.video_reader(self.find_video_file(self.current_video)).frame_paths()
             self.nb_frames = len(self.file_names)
 
+    def refresh_file_names(self):
+        """
+        Takes into account the frames added to the current video while it is being extracted.
+        """
+        nb_frames = self.nb_frames
+        self.update_file_names()
+
+        if self.nb_frames != nb_frames:
+            self.notify_listeners("on_nb_frames_change")
+
     def save_state(self):
         with open(STATE_PATH, 'wb') as f:
             state_dict = {k: v for k, v in self.__dict__.items() if k not in ["listeners", "track_info", "drawing",
-                                                                              "img_viewer", "speed_player"]}
+                                                                              "img_viewer", "speed_player", "frame_source"]}
             pickle.dump(state_dict, f)
 
     def load_state(self):
@@ -115,7 +134,6 @@ class State:
         self.copy_annotations_option = False
 
         self.video_list = self.find_videos()
-        self.check_raw_videos()
 
         if self.current_video not in self.video_list:
             self.current_video = self.video_list[0] if len(self.video_list) > 0 else None
@@ -170,6 +188,13 @@ class State:
         if frame == self.current_frame:
             self.current_detection = detection
 
+    def add_detections(self, detections, frame):
+        self.track_info.add_detections(detections, self.get_file_name(frame))
+
+        if frame == self.current_frame and self.current_detection is not None:
+            self.current_detection = next((d for d in detections if d.track_id == self.current_detection.track_id),
+                                          self.current_detection)
+
     def set_detections(self, detections, frame):
         self.track_info.write_detections(self.get_file_name(frame), detections)
 
@@ -249,6 +274,12 @@ class StateListener:
     def on_video_change(self):
         pass
 
+    def on_nb_frames_change(self):
+        pass
+
+    def on_video_extracted(self):
+        pass
+
     def on_theme_change(self):
         pass
 
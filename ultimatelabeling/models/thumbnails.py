@@ -0,0 +1,210 @@
+import os
+import struct
+import numpy as np
+import cv2
+from .video_reader import VideoReader, split_frame_path
+
+#
+# Thumbnails of all the frames of a video, packed into a single memory-mapped file (the atlas) in
+# output/<video>/.thumbnails.bin: a header, one "ready" byte per frame, then the RGB thumbnails (nb_frames x h x w x 3).
+# They are built in the background, coarse to fine (one frame in 64, then in 32...), so that the whole timeline has
+# approximate previews quickly. Reading a thumbnail is a memory access, the file is shared by all the consumers.
+#
+
+ATLAS_FILE = ".thumbnails.bin"
+MAGIC = b"ULTA"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIII")  # magic, version, padding, nb_frames, height, width
+THUMBNAIL_HEIGHT = 72
+
+
+class ThumbnailAtlas:
+    def __init__(self, path, nb_frames, height, width):
+        """
+        Opens the atlas at path, or creates it (empty) if it does not exist or was made for other dimensions.
+        """
+        self.path = path
+        self.nb_frames = nb_frames
+        self.height = height
+        self.width = width
+
+        data_offset = self.data_offset(nb_frames)
+        size = data_offset + nb_frames * height * width * 3
+
+        previous = None
+        if self.read_header(path) != (MAGIC, VERSION, 0, nb_frames, height, width) or os.path.getsize(path) != size:
+            previous = self.read_previous(path, height, width)  # frames added to the video: keeps the thumbnails
+
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, 0, nb_frames, height, width))
+                f.truncate(size)  # sparse file, the "ready" bytes are 0
+
+        self.memmap = np.memmap(path, dtype=np.uint8, mode="r+", shape=(size,))
+        self.ready = self.memmap[HEADER.size:HEADER.size + nb_frames]
+        self.thumbnails = self.memmap[data_offset:].reshape((nb_frames, height, width, 3))
+
+        if previous is not None:
+            ready, thumbnails = previous
+            n = min(len(ready), nb_frames)
+            self.thumbnails[:n] = thumbnails[:n]
+            self.ready[:n] = ready[:n]
+
+    @staticmethod
+    def data_offset(nb_frames):
+        return (HEADER.size + nb_frames + 63) // 64 * 64
+
+    @staticmethod
+    def read_header(path):
+        if not os.path.exists(path) or os.path.getsize(path) < HEADER.size:
+            return None
+
+        with open(path, "rb") as f:
+            return HEADER.unpack(f.read(HEADER.size))
+
+    @staticmethod
+    def read_previous(path, height, width):
+        """
+        Output:
+            (ready, thumbnails) of the atlas at path if it has thumbnails of the same size, else None
+        """
+        header = ThumbnailAtlas.read_header(path)
+        if header is None or header[:3] != (MAGIC, VERSION, 0) or header[4:] != (height, width):
+            return None
+
+        nb_frames = header[3]
+        data_offset = ThumbnailAtlas.data_offset(nb_frames)
+        if os.path.getsize(path) != data_offset + nb_frames * height * width * 3:
+            return None
+
+        memmap = np.memmap(path, dtype=np.uint8, mode="r")
+        ready = np.array(memmap[HEADER.size:HEADER.size + nb_frames])
+        thumbnails = np.array(memmap[data_offset:]).reshape((nb_frames, height, width, 3))
+        del memmap
+        return ready, thumbnails
+
+    @staticmethod
+    def for_video(output_folder, nb_frames, image_size, height=THUMBNAIL_HEIGHT):
+        """
+        Atlas of a video whose frames are image_size (h, w), with thumbnails height pixels high.
+        """
+        h, w = image_size
+        width = max(1, round(w * height / h))
+        return ThumbnailAtlas(os.path.join(output_folder, ATLAS_FILE), nb_frames, height, width)
+
+    def get(self, frame):
+        """
+        Output:
+            RGB thumbnail (view into the atlas), or None if not built yet
+        """
+        if not 0 <= frame < self.nb_frames or not self.ready[frame]:
+            return None
+        return self.thumbnails[frame]
+
+    def nearest(self, frame):
+        """
+        Output:
+            (frame, thumbnail) of the closest frame already built, or (None, None)
+        """
+        ready = np.flatnonzero(self.ready)
+        if len(ready) == 0:
+            return None, None
+
+        i = np.searchsorted(ready, frame)
+        candidates = ready[max(i - 1, 0):i + 1]
+        nearest = int(candidates[np.argmin(np.abs(candidates - frame))])
+        return nearest, self.thumbnails[nearest]
+
+    def put(self, frame, img):
+        """
+        Arguments:
+            img: BGR frame, as cv2.imread
+        """
+        thumbnail = cv2.resize(img, (self.width, self.height), interpolation=cv2.INTER_AREA)
+        self.thumbnails[frame] = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2RGB)
+        self.ready[frame] = 1  # after the data: a reader never sees a thumbnail half-written
+
+    @property
+    def nb_ready(self):
+        return int(np.count_nonzero(self.ready))
+
+    def flush(self):
+        self.memmap.flush()
+
+    def close(self):
+        self.flush()
+        del self.ready, self.thumbnails, self.memmap
+
+
+def coarse_to_fine(nb_frames, coarsest_step=64):
+    """
+    Output:
+        all the frames, every coarsest_step-th first, then the ones halving the step, ...
+    """
+    order = []
+    step = coarsest_step
+    seen = np.zeros(nb_frames, bool)
+    while step >= 1:
+        frames = np.arange(0, nb_frames, step)
+        order.extend(frames[~seen[frames]].tolist())
+        seen[frames] = True
+        step //= 2
+    return order
+
+
+def read_reduced(path, reduction):
+    """
+    Decodes an image at 1/reduction of its size (1, 2, 4 or 8): JPEG images are only partially decoded.
+    """
+    flag = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4,
+            8: cv2.IMREAD_REDUCED_COLOR_8}[reduction]
+    return cv2.imread(path, flag)
+
+
+def build_thumbnails(atlas, file_names, image_size, progress=None, stop_event=None):
+    """
+    Fills the missing thumbnails of the atlas. Frames of a video file are decoded in order (with a reader of their own,
+    not to make the viewer seek), image files coarse to fine and at a reduced size.
+    Arguments:
+        progress: callable(nb_ready, nb_frames), called after each thumbnail
+        stop_event: threading.Event interrupting the build when set
+    Output:
+        True if the atlas is complete
+    """
+    video_reader = None
+    if file_names and split_frame_path(file_names[0]) is not None:
+        video_reader = VideoReader(split_frame_path(file_names[0])[0], window_size=1)
+        order = range(len(file_names))
+    else:
+        order = coarse_to_fine(len(file_names))
+
+    reduction = 1
+    while reduction < 8 and image_size[0] / (2 * reduction) >= atlas.height:
+        reduction *= 2
+
+    nb_ready = atlas.nb_ready
+    try:
+        for frame in order:
+            if stop_event is not None and stop_event.is_set():
+                return False
+            if atlas.ready[frame]:
+                continue
+
+            if video_reader is not None:
+                img = video_reader.read(frame)
+            else:
+                img = read_reduced(file_names[frame], reduction)
+            if img is None:
+                continue
+
+            atlas.put(frame, img)
+            nb_ready += 1
+            if progress is not None:
+                progress(nb_ready, atlas.nb_frames)
+    finally:
+        atlas.flush()
+        if video_reader is not None:
+            video_reader.close()
+
+    return nb_ready == atlas.nb_frames
@@ -146,10 +146,40 @@ class TrackInfo:
         df = self.df_from_csv(txt_file)
         return [Detection.from_df(row) for _, row in df.iterrows()]
 
+    def has_detections(self, file_name):
+        """
+        True if the frame has at least one detection saved on disk (an empty file is written for visited frames).
+        """
+        txt_file = os.path.join(OUTPUT_DIR, "{}/{}.txt".format(self.video_name, file_name))
+        return os.path.exists(txt_file) and os.path.getsize(txt_file) > 0
+
     def load_detections(self, file_name):
         self.file_name = file_name
         self.detections = self.get_detections(file_name)
 
+    def reload_files(self, txt_names):
+        """
+        Takes into account output files updated on disk by someone else (e.g. a detached detection sync): reloads the
+        current frame if it is one of them, and the track ids they use.
+        Arguments:
+            txt_names: names of the updated files of the output folder ("<file_name>.txt", "info.json")
+        """
+        if "info.json" in txt_names:
+            self.load_info()
+
+        for txt_name in txt_names:
+            file_name, ext = os.path.splitext(txt_name)
+            if ext != ".txt":
+                continue
+
+            if file_name == self.file_name:
+                self.detections = self.get_detections(file_name)
+                track_ids = [d.track_id for d in self.detections]
+            else:
+                track_ids = self.df_from_csv(os.path.join(OUTPUT_DIR, self.video_name, txt_name)).track_id.tolist()
+
+            self.nb_track_ids = max(self.nb_track_ids, max(track_ids or [-1]) + 1)
+
     def write_info(self):
         json_file = os.path.join(OUTPUT_DIR, "{}/info.json".format(self.video_name))
 
@@ -195,6 +225,25 @@ class TrackInfo:
 
         self.nb_track_ids = max(self.nb_track_ids, detection.track_id + 1)
 
+    def add_detections(self, detections, file_name=None):
+        """
+        Adds (or replaces, for already labeled track_ids) several detections of the same frame, in a single write
+        """
+        track_ids = set(d.track_id for d in detections)
+
+        if file_name is None or file_name == self.file_name:
+            self.detections = [d for d in self.detections if d.track_id not in track_ids] + list(detections)
+        else:
+            txt_file = os.path.join(OUTPUT_DIR, "{}/{}.txt".format(self.video_name, file_name))
+
+            df = self.df_from_csv(txt_file)
+            df = df[~df.track_id.isin(track_ids)]
+            if len(detections) > 0:
+                df = df.append([d.to_dict() for d in detections], ignore_index=True)
+            self.df_to_csv(df, txt_file)
+
+        self.nb_track_ids = max(self.nb_track_ids, max(track_ids or [-1]) + 1)
+
     def remove_detection(self, track_id, file_name):
         """
         Removes detections with specific track_id from detections file
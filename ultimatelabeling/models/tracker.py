@@ -1,28 +1,39 @@
 import os
 import torch
+import numpy as np
 from .polygon import Polygon, Bbox
+from . import wire
 import json
 import socket
-import pickle
 import cv2
 import struct
-from ultimatelabeling.siamMask.models.custom import Custom
+import threading
+from collections import OrderedDict, deque
+from itertools import islice
+from contextlib import contextmanager
+from ultimatelabeling.siamMask.models.custom import Custom, TracedResDown
+from ultimatelabeling.siamMask.utils.tracker_config import TrackerConfig
 from ultimatelabeling.siamMask.utils.load_helper import load_pretrain
-from ultimatelabeling.siamMask.test import siamese_init, siamese_track, get_image_crop
+from ultimatelabeling.siamMask.utils.quantization import quantize_int8, load_int8
+from ultimatelabeling.siamMask.test import siamese_init, siamese_track, siamese_config, get_exemplar_crop, get_image_crop
 from ultimatelabeling.config import RESOURCES_DIR
 
 
 class Tracker:
+    IMAGE_PATH_INPUT = False  # init / track take image paths instead of OpenCV images
+
     def __init__(self):
         self.use_cuda = torch.cuda.is_available()
         self.device = torch.device('cuda' if self.use_cuda else 'cpu')
         torch.backends.cudnn.benchmark = True
 
-    def init(self, img, bbox):
+    def init(self, img, bbox, key=None):
         """
         Arguments:
             img (OpenCV image): obtained from cv2.imread(img_file)
             bbox (BBox)
+            key (hashable, optional): identifies the tracked object, e.g. (video_name, track_id), for the trackers
+                caching per-object state across initializations
         """
         raise NotImplementedError
 
@@ -33,99 +44,342 @@ class Tracker:
         """
         raise NotImplementedError
 
+    def track_sequence(self, imgs):
+        """
+        Tracks the object over consecutive images, yielding (bbox, polygon) for each of them in order.
+        Trackers able to process several frames ahead (e.g. remote ones) override this.
+        """
+        for img in imgs:
+            yield self.track(img)
+
+    @property
+    def timings(self):
+        """
+        Output:
+            dict: seconds spent in each internal stage during the last track call (empty if not instrumented)
+        """
+        return {}
+
     def terminate(self):
         pass
 
 
+def inference_mode():
+    if hasattr(torch, "inference_mode"):
+        return torch.inference_mode()
+    return torch.no_grad()
+
+
+class TemplateCache:
+    """
+    Template features of the last tracked objects (LRU), per key. An entry is only reused for the exact same exemplar
+    crop (same frame and box): re-initializing an object from a corrected box recomputes its features. The cache can be
+    shared by several trackers (e.g. one per connection of a tracking server).
+    """
+    def __init__(self, size=64):
+        self.size = size
+        self.entries = OrderedDict()  # key -> (z_crop, zf)
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, z_crop):
+        """
+        Output:
+            zf cached for this key and exemplar crop, or None
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and torch.equal(entry[0], z_crop):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            self.misses += 1
+            return None
+
+    def put(self, key, z_crop, zf):
+        with self.lock:
+            self.entries[key] = (z_crop, zf)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """
+        Removes the entry of the given object (or all of them).
+        """
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.
+
+
 class SiamMaskTracker(Tracker):
-    def __init__(self, **kwargs):
+
+    def __init__(self, cpu_optimize=None, num_threads=None, warmup=3, precision="fp32", calibration=None,
+                 int8_checkpoint=None, template_cache=None, **kwargs):
+        """
+        Arguments:
+            cpu_optimize (bool): use the TorchScript / channels_last inference path, defaults to True without GPU
+            num_threads (int): number of intra-op threads used by PyTorch on CPU
+            warmup (int): number of dummy init/track iterations run after optimizing the model
+            precision (str): "fp32", "bf16" (CPU autocast) or "int8" (static quantization of the backbone and
+                DepthCorr heads, CPU only)
+            calibration ((list of OpenCV images, Bbox)): clip used to calibrate the int8 model, only needed when the
+                quantized checkpoint does not exist yet
+            int8_checkpoint (str): quantized checkpoint loaded, or created after the calibration, by the int8 model,
+                defaults to res/SiamMask_VOT_int8.pth
+            template_cache (TemplateCache): to share the cached templates with other trackers
+        """
         super().__init__(**kwargs)
 
+        self.precision = precision
+        self.int8_checkpoint = int8_checkpoint or os.path.join(RESOURCES_DIR, "SiamMask_VOT_int8.pth")
+        if self.precision == "int8":
+            self.use_cuda = False
+            self.device = torch.device('cpu')
+
         self.cfg = json.load(open(os.path.join(RESOURCES_DIR, "config_vot.json")))
         self.tracker = Custom(anchors=self.cfg['anchors'])
-        self.tracker = load_pretrain(self.tracker, os.path.join(RESOURCES_DIR, "SiamMask_VOT.pth"), use_cuda=self.use_cuda)
+
+        if self.precision == "int8" and os.path.exists(self.int8_checkpoint):
+            self.tracker = load_int8(self.tracker, self.int8_checkpoint)
+        else:
+            self.tracker = load_pretrain(self.tracker, os.path.join(RESOURCES_DIR, "SiamMask_VOT.pth"), use_cuda=self.use_cuda)
+            if self.precision == "int8":
+                self.quantize(calibration)
+
         self.tracker.eval().to(self.device)
 
         self.state = None
 
-    def init(self, img, bbox):
-        self.state = siamese_init(img, bbox.center, bbox.size, self.tracker, self.cfg['hp'], use_cuda=self.use_cuda)
+        self.template_cache = template_cache if template_cache is not None else TemplateCache()
+
+        if cpu_optimize is None:
+            cpu_optimize = not self.use_cuda
+
+        if cpu_optimize:
+            self.optimize_for_cpu(num_threads=num_threads, warmup=warmup)
+
+    def quantize(self, calibration):
+        if calibration is None:
+            raise ValueError("A calibration clip is needed to create {}".format(self.int8_checkpoint))
+
+        frames, bbox = calibration
+
+        def calibrate(model):
+            state = siamese_init(frames[0], bbox.center, bbox.size, model, self.cfg['hp'], use_cuda=False)
+            for img in frames[1:]:
+                state = siamese_track(state, img, mask_enable=True, refine_enable=True, use_cuda=False)
+
+        self.tracker = quantize_int8(self.tracker, calibrate)
+        torch.save(self.tracker.state_dict(), self.int8_checkpoint)
+
+    @contextmanager
+    def inference_context(self):
+        with inference_mode():
+            if self.precision == "bf16":
+                with torch.autocast("cpu", dtype=torch.bfloat16):
+                    yield
+            else:
+                yield
+
+    def optimize_for_cpu(self, num_threads=None, warmup=3):
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        if self.precision != "fp32":
+            self.warmup(warmup)
+            return
+
+        exemplar_size = self.cfg['hp'].get('exemplar_size', TrackerConfig.exemplar_size)
+        instance_size = self.cfg['hp'].get('instance_size', TrackerConfig.instance_size)
+
+        self.tracker.to(memory_format=torch.channels_last)
+        self.tracker.features = TracedResDown(self.tracker.features, exemplar_size, instance_size,
+                                              memory_format=torch.channels_last)
+
+        self.warmup(warmup)
+
+    def warmup(self, nb_iterations=3):
+        img = np.zeros((480, 640, 3), dtype=np.uint8)
+        for _ in range(nb_iterations):
+            self.init(img, Bbox(280, 200, 80, 80))
+            self.track(img)
+        self.state = None
+
+    def init(self, img, bbox, key=None):
+        """
+        Arguments:
+            key (hashable, optional): identifies the tracked object, e.g. (video_name, track_id). Re-initializing the
+                same object from the same frame and box (e.g. restarting a stopped tracking) reuses its cached template
+                features, from a corrected box only the template is recomputed (anchors and window are shared).
+        """
+        with self.inference_context():
+            zf = exemplar = None
+            if key is not None:
+                p, _ = siamese_config(self.tracker, self.cfg['hp'])
+                exemplar = get_exemplar_crop(img, bbox.center, bbox.size, p)
+                zf = self.template_cache.get(key, exemplar[0])
+
+            self.state = siamese_init(img, bbox.center, bbox.size, self.tracker, self.cfg['hp'], use_cuda=self.use_cuda,
+                                      zf=zf, exemplar=exemplar)
+
+        if key is not None and zf is None:
+            self.template_cache.put(key, exemplar[0], self.tracker.zf)
+
+    def invalidate_template(self, key=None):
+        """
+        Removes the cached template of the given object (or all of them), e.g. when its appearance changed.
+        """
+        self.template_cache.invalidate(key)
+
+    @property
+    def cache_hit_rate(self):
+        return self.template_cache.hit_rate
 
     def track(self, img):
-        self.state = siamese_track(self.state, img.copy(), mask_enable=True, refine_enable=True, use_cuda=self.use_cuda)
+        with self.inference_context():
+            self.state = siamese_track(self.state, img, mask_enable=True, refine_enable=True, use_cuda=self.use_cuda)
         bbox = Bbox.from_center_size(self.state['target_pos'], self.state['target_sz'])
         polygon = Polygon(self.state['ploygon'].flatten())
 
         return bbox, polygon
 
+    @property
+    def timings(self):
+        return self.state.get('timings', {}) if self.state is not None else {}
+
 
 class SocketTracker(Tracker):
+    """
+    Client of the tracking server. Messages are length-prefixed wire.py frames tagged with a request id:
+        -> {"id", "type": "init", "image_path", "bbox"}     <- {"id", "type": "ok"}
+        -> {"id", "type": "init_keyed", "image_path", "bbox", "key"}     <- {"id", "type": "ok"} (init of an identified
+           object, see Tracker.init and TemplateCache)
+        -> {"id", "type": "track", "image_path"}            <- {"id", "type": "tracked", "bbox", "polygon"} (None when lost)
+        -> {"id", "type": "ping"}                           <- {"id", "type": "ok"} (health check, see TrackerPool)
+        -> {"id", "type": "terminate"}
+    Any response can instead be {"id", "type": "error", "error"}. The server answers requests in order, so track_sequence keeps up to
+    max_in_flight frames queued on the server to overlap the network latency with the tracking.
+    """
+    IMAGE_PATH_INPUT = True
     HOST = "128.178.17.112"
     PORT = 8787
-    OK_SIGNAL, TERMINATE_SIGNAL = b"ok", b"terminate"
+    MAX_IN_FLIGHT = 4
 
-    def __init__(self, port=PORT):
+    def __init__(self, port=PORT, host=HOST, max_in_flight=MAX_IN_FLIGHT):
+        self.host = host
         self.port = port
+        self.max_in_flight = max_in_flight
 
-    def init(self, image_path, bbox):
-        self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.client_socket.connect((self.HOST, self.port))
-        self.receive_ok_signal()
+        self.client_socket = None
+        self.next_id = 0
+        self.pending = deque()  # ids of the requests waiting for a response
 
-        self.send_bbox(bbox)
-        self.send_image_path(image_path)
+    def init(self, image_path, bbox, key=None):
+        self.terminate()
 
-        res = self.receive_ok_signal()
-        if res != self.OK_SIGNAL:
-            raise Exception(res.decode())
+        self.client_socket = socket.create_connection((self.host, self.port))
+        request_type, fields = wire.init_request(image_path, bbox, key)
+        self.send_request(request_type, **fields)
+        self.receive_response()
 
     def track(self, image_path):
-        self.send_image_path(image_path)
-        data = self.receive_detection()
+        self.send_request("track", image_path=image_path)
+        return self.receive_detection()
 
-        if "error" in data:
-            raise Exception(data["error"])
+    def track_sequence(self, image_paths):
+        image_paths = iter(image_paths)
 
-        return Bbox(*data["bbox"]), Polygon(data["polygon"])
+        for image_path in islice(image_paths, self.max_in_flight):
+            self.send_request("track", image_path=image_path)
 
-    def send_image_path(self, image_path):
-        data = image_path.encode()
-        self.client_socket.sendall(data)
+        while self.pending:
+            res = self.receive_detection()
 
-    def send_bbox(self, bbox):
-        data = pickle.dumps(bbox.to_json())
-        self.client_socket.send(data)
+            image_path = next(image_paths, None)
+            if image_path is not None:
+                self.send_request("track", image_path=image_path)
+
+            yield res
+
+    def send_request(self, request_type, **kwargs):
+        request_id = self.next_id
+        self.next_id += 1
+
+        wire.send_message(self.client_socket, {"id": request_id, "type": request_type, **kwargs})
+        self.pending.append(request_id)
+
+    def receive_response(self):
+        response = wire.recv_message(self.client_socket)
+        if response is None:
+            raise Exception("Connection closed by the tracking server")
+
+        request_id = self.pending.popleft()
+        if response.get("id") != request_id:
+            raise Exception("Unexpected response {} to request {}".format(response.get("id"), request_id))
+
+        if response["type"] == "error":
+            raise Exception(response["error"])
 
-    def receive_detection(self):
-        json_response = self.client_socket.recv(1024)
-        response = json.loads(json_response.decode())
         return response
 
-    def receive_ok_signal(self):
-        data = self.client_socket.recv(1024)
-        return data
+    def receive_detection(self):
+        response = self.receive_response()
+        if response["bbox"] is None:
+            return None, None
 
-    def send_terminate_signal(self):
-        self.client_socket.sendall(self.TERMINATE_SIGNAL)
+        return response["bbox"], response["polygon"] or Polygon.from_bbox(response["bbox"])
 
     def terminate(self):
-        self.send_terminate_signal()
+        if self.client_socket is None:
+            return
+
+        try:
+            wire.send_message(self.client_socket, {"id": self.next_id, "type": "terminate"})
+        except OSError:
+            pass
+
         self.client_socket.close()
+        self.client_socket = None
+        self.pending.clear()
 
 
 class KCFTracker(Tracker):
+    IMAGE_PATH_INPUT = True
+
     def __init__(self, state, **kwargs):
         super().__init__(**kwargs)
         self.state = state
 
-    def init(self, image_path, bbox):
-        img = cv2.imread(image_path)
+    def read_frame(self, image_path):
+        if self.state is None:
+            return cv2.imread(image_path)
+        return self.state.frame_source.read(image_path)
+
+    def init(self, image_path, bbox, key=None):
+        img = self.read_frame(image_path)
         self.tracker = cv2.TrackerKCF_create()
-        self.tracker.init(img, tuple(bbox.to_json()))
+        self.tracker.init(img, tuple(int(round(v)) for v in bbox.to_json()))  # OpenCV >= 4.5 expects an integer Rect
         self.tracker.update(img)
 
     def track(self, image_path):
-        img = cv2.imread(image_path)
+        img = self.read_frame(image_path)
         success, bbox = self.tracker.update(img)
 
         if not success:
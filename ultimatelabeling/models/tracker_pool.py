@@ -0,0 +1,96 @@
+import asyncio
+import threading
+from .async_client import AsyncConnection, client_loop
+from . import wire
+
+
+class Endpoint:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.healthy = True  # until a health check says otherwise
+        self.load = 0  # number of tracking jobs currently dispatched to it
+
+    def __repr__(self):
+        return "Endpoint({}:{}, healthy={}, load={})".format(self.host, self.port, self.healthy, self.load)
+
+
+class TrackerPool:
+    """
+    Pool of tracking servers. Each tracking job is dispatched to the least loaded healthy server, and the servers are
+    pinged periodically on the client loop once start_health_checks() is called. A server failing during a job is
+    considered down until its next successful health check.
+    """
+    def __init__(self, endpoints, health_interval=5., health_timeout=2.):
+        """
+        Arguments:
+            endpoints ([(host, port)])
+        """
+        self.endpoints = [Endpoint(host, port) for host, port in endpoints]
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+
+        self.lock = threading.Lock()
+        self.health_future = None
+
+    def acquire(self):
+        """
+        Output:
+            the Endpoint to run a new tracking job on, to give back with release()
+        """
+        with self.lock:
+            endpoints = [endpoint for endpoint in self.endpoints if endpoint.healthy]
+            if not endpoints:
+                raise Exception("No tracking server available.")
+
+            endpoint = min(endpoints, key=lambda endpoint: endpoint.load)
+            endpoint.load += 1
+            return endpoint
+
+    def release(self, endpoint, failed=False):
+        with self.lock:
+            endpoint.load -= 1
+            if failed:
+                endpoint.healthy = False
+
+    async def ping(self, endpoint):
+        try:
+            connection = await AsyncConnection.open(endpoint.host, endpoint.port, self.health_timeout)
+        except (OSError, asyncio.TimeoutError):
+            return False
+
+        try:
+            await connection.send({"id": 0, "type": "ping"})
+            response = await connection.recv()
+            return response is not None and response["type"] == "ok"
+        except (OSError, asyncio.TimeoutError, wire.WireError):
+            return False
+        finally:
+            await connection.close()
+
+    async def check_health(self):
+        """
+        Output:
+            [bool], whether each endpoint is healthy
+        """
+        results = await asyncio.gather(*[self.ping(endpoint) for endpoint in self.endpoints])
+
+        with self.lock:
+            for endpoint, healthy in zip(self.endpoints, results):
+                endpoint.healthy = healthy
+
+        return results
+
+    async def health_loop(self):
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.health_interval)
+
+    def start_health_checks(self):
+        if self.health_future is None or self.health_future.done():
+            self.health_future = client_loop().submit(self.health_loop())
+
+    def stop_health_checks(self):
+        if self.health_future is not None:
+            self.health_future.cancel()
+            self.health_future = None
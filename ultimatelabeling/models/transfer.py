@@ -0,0 +1,77 @@
+import os
+import shlex
+import tarfile
+
+#
+# Bulk file uploads over an SSH connection (paramiko.SSHClient). The files are packed into a single tar.gz stream and
+# unpacked by the server while they are received, instead of one SCP round trip per file. The server only needs tar.
+#
+
+class _ProgressReader:
+    def __init__(self, f, callback):
+        self.f = f
+        self.callback = callback
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.callback(len(data))
+        return data
+
+
+def _check_exit_status(stdout, stderr, command):
+    status = stdout.channel.recv_exit_status()
+    if status != 0:
+        raise IOError("`{}` failed ({}): {}".format(command.split()[0], status, stderr.read().decode().strip()))
+
+
+def _list_files(local_paths):
+    """
+    Output:
+        [(path, name in the archive)], folders followed by their content
+    """
+    files = []
+    for local_path in local_paths:
+        local_path = os.path.normpath(local_path)
+        root = os.path.dirname(local_path)
+        files.append((local_path, os.path.relpath(local_path, root)))
+
+        if os.path.isdir(local_path):
+            for dir_path, dir_names, file_names in os.walk(local_path):
+                for name in sorted(dir_names) + sorted(file_names):
+                    path = os.path.join(dir_path, name)
+                    files.append((path, os.path.relpath(path, root)))
+    return files
+
+
+def upload(ssh_client, local_paths, remote_dir=".", progress=None):
+    """
+    Copies local files and folders (recursively) into remote_dir.
+    Arguments:
+        progress: callable(sent_bytes, total_bytes, name), called as the files are read
+    """
+    files = _list_files(local_paths)
+    total_bytes = sum(os.path.getsize(path) for path, _ in files if os.path.isfile(path))
+    sent_bytes = 0
+
+    command = "mkdir -p {0} && tar -xzf - -C {0}".format(shlex.quote(remote_dir))
+    stdin, stdout, stderr = ssh_client.exec_command(command)
+
+    with tarfile.open(fileobj=stdin, mode="w|gz") as tar:
+        for path, name in files:
+            info = tar.gettarinfo(path, name)
+            if not info.isfile():
+                tar.addfile(info)
+                continue
+
+            def on_read(nb_bytes, name=name):
+                nonlocal sent_bytes
+                sent_bytes += nb_bytes
+                if progress is not None:
+                    progress(sent_bytes, total_bytes, name)
+
+            with open(path, "rb") as f:
+                tar.addfile(info, _ProgressReader(f, on_read))
+
+    stdin.close()  # end of the archive for the remote tar
+    _check_exit_status(stdout, stderr, command)
+
@@ -0,0 +1,195 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from PyQt5.QtCore import QObject, pyqtSignal
+from ultimatelabeling.utils import natural_sort_key
+from .video_reader import VIDEO_EXTENSIONS
+from ultimatelabeling.config import DATA_DIR, FRAME_STRIDE, FRAME_FORMAT, FRAME_QUALITY, FRAME_MAX_SIZE, \
+    NB_EXTRACTION_WORKERS
+
+#
+# Extraction of the frames of the video files placed in the data folder, in a pool of background workers. The frames
+# of a video are written in order, each one atomically, so the video can be opened while it is being extracted. A marker
+# file is kept in the folder until the extraction completes: an interrupted extraction is resumed at the next start.
+#
+
+IMAGE_EXTENSIONS = [".jpg", ".png", ".webp"]
+EXTRACTING_FILE = ".extracting"
+
+
+class ExtractionOptions:
+    def __init__(self, stride=FRAME_STRIDE, format=FRAME_FORMAT, quality=FRAME_QUALITY, max_size=FRAME_MAX_SIZE):
+        """
+        Arguments:
+            stride: keeps one frame every stride frames of the video
+            format: "jpg", "png" or "webp"
+            quality: 0-100, for jpg and webp
+            max_size: frames are downscaled so that their largest side is at most max_size pixels (None: original size)
+        """
+        if "." + format not in IMAGE_EXTENSIONS:
+            raise ValueError("Unsupported frame format: {}".format(format))
+
+        self.stride = stride
+        self.format = format
+        self.quality = quality
+        self.max_size = max_size
+
+    def imwrite_params(self):
+        if self.format == "jpg":
+            return [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        if self.format == "webp":
+            return [cv2.IMWRITE_WEBP_QUALITY, self.quality]
+        return []
+
+
+def find_frames(folder):
+    """
+    Output:
+        image files of the folder (frames being written excluded), in natural order
+    """
+    names = [name for name in os.listdir(folder)
+             if not name.startswith(".") and os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS]
+    return [os.path.join(folder, name) for name in sorted(names, key=natural_sort_key)]
+
+
+def pending_videos(data_dir=DATA_DIR):
+    """
+    Output:
+        video files of data_dir whose frames are not extracted yet, or were only partially extracted
+    """
+    files = []
+    for file in sorted(os.listdir(data_dir)):
+        name, extension = os.path.splitext(file)
+        if extension.lower() not in VIDEO_EXTENSIONS:
+            continue
+
+        folder = os.path.join(data_dir, name)
+        if not os.path.isdir(folder) or os.path.exists(os.path.join(folder, EXTRACTING_FILE)):
+            files.append(os.path.join(data_dir, file))
+    return files
+
+
+def extract_frames(video_file, output_folder, options=None, progress=None, stop_event=None):
+    """
+    Writes one frame every options.stride frames of the video to output_folder, as 00000.<format>, 00001.<format>...
+    The frames already written by an interrupted extraction are kept.
+    Arguments:
+        progress: callable(nb_frames_read, total_frames), called after each frame written
+        stop_event: threading.Event interrupting the extraction when set
+    Output:
+        number of frames in output_folder, or None if interrupted
+    """
+    if options is None:
+        options = ExtractionOptions()
+
+    capture = cv2.VideoCapture(video_file)
+    if not capture.isOpened():
+        raise IOError("Cannot open video {}".format(video_file))
+    total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    # The folder only appears in the video list once its first frame is written
+    marker_file = os.path.join(output_folder, EXTRACTING_FILE)
+    if os.path.exists(output_folder):
+        open(marker_file, "w").close()
+
+    index = 0
+    try:
+        for i in range(total_frames if total_frames > 0 else 1 << 62):
+            if stop_event is not None and stop_event.is_set():
+                return None
+
+            if i % options.stride != 0:
+                if not capture.grab():  # skipped frames are not decoded
+                    break
+                continue
+
+            file = os.path.join(output_folder, "{:05d}.{}".format(index, options.format))
+            if os.path.exists(file):
+                if not capture.grab():
+                    break
+            else:
+                success, img = capture.read()
+                if not success:
+                    break
+
+                h, w = img.shape[:2]
+                if options.max_size is not None and max(h, w) > options.max_size:
+                    scale = options.max_size / max(h, w)
+                    img = cv2.resize(img, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+
+                if not os.path.exists(output_folder):
+                    os.makedirs(output_folder)
+                    open(marker_file, "w").close()
+
+                # Written to a hidden file then renamed: a frame is never seen half-written
+                part_file = os.path.join(output_folder, ".part.{}".format(options.format))
+                if not cv2.imwrite(part_file, img, options.imwrite_params()):
+                    raise IOError("Cannot write frame {}".format(file))
+                os.replace(part_file, file)
+
+            index += 1
+            if progress is not None:
+                progress(i + 1, total_frames)
+    finally:
+        capture.release()
+
+    if os.path.exists(marker_file):
+        os.remove(marker_file)
+    return index
+
+
+class VideoIngestion(QObject):
+    """
+    Extracts the submitted videos in a pool of nb_workers background threads (OpenCV decodes without holding the GIL).
+    The signals are delivered in the thread of the QObject (the GUI thread).
+    """
+    progress_signal = pyqtSignal(str, int, int)  # video name, number of frames read, total number of frames
+    finished_signal = pyqtSignal(str)  # video name
+    err_signal = pyqtSignal(str)
+
+    PROGRESS_INTERVAL = 0.5  # seconds between two progress_signal of a video
+
+    def __init__(self, options=None, nb_workers=NB_EXTRACTION_WORKERS):
+        super().__init__()
+
+        self.options = options
+        self.executor = ThreadPoolExecutor(max_workers=nb_workers)
+        self.stop_event = threading.Event()
+
+    def submit(self, video_file):
+        """
+        Output:
+            concurrent.futures.Future of the number of frames extracted
+        """
+        return self.executor.submit(self.extract, video_file)
+
+    def extract(self, video_file):
+        video_name = os.path.splitext(os.path.basename(video_file))[0]
+        last_progress = 0
+
+        def progress(nb_read, total):
+            nonlocal last_progress
+            if time.time() - last_progress > self.PROGRESS_INTERVAL:
+                last_progress = time.time()
+                self.progress_signal.emit(video_name, nb_read, total)
+
+        print("Extracting video {}...".format(os.path.basename(video_file)))
+        try:
+            nb_frames = extract_frames(video_file, os.path.join(os.path.dirname(video_file), video_name), self.options,
+                                       progress=progress, stop_event=self.stop_event)
+        except Exception as e:
+            self.err_signal.emit("Extraction of {} failed: {}".format(video_name, e))
+            raise
+
+        if nb_frames is not None:
+            self.finished_signal.emit(video_name)
+        return nb_frames
+
+    def stop(self):
+        """
+        Interrupts the running extractions (resumed at the next start) and waits for the workers.
+        """
+        self.stop_event.set()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,200 @@
+import os
+import json
+import bisect
+import threading
+from collections import OrderedDict
+import cv2
+from ultimatelabeling.config import OUTPUT_DIR, FRAME_STRIDE
+
+#
+# Frames read directly from a video file, without extracting them. A frame of a video is addressed by a virtual path
+# inside the video file, <video file>/<frame>.jpg (frame: index among the kept frames, one every FRAME_STRIDE frames of
+# the video, so the names and annotations match those of extracted frames). The positions (PTS) and keyframes of the
+# video are indexed once and saved in output/<video>/.video_index.json. A random access seeks to the last keyframe
+# before the frame and decodes forward, sequential reads keep decoding forward without seeking.
+#
+
+VIDEO_EXTENSIONS = [".mp4", ".mov"]
+INDEX_FILE = ".video_index.json"
+
+
+def is_video_file(path):
+    return os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS
+
+
+def split_frame_path(path):
+    """
+    Output:
+        (video file, frame) if path is the virtual path of a video frame, else None
+    """
+    video_file, name = os.path.split(path)
+    if not is_video_file(video_file):
+        return None
+    return video_file, int(os.path.splitext(name)[0])
+
+
+class VideoIndex:
+    def __init__(self, nb_frames, pts, keyframes, size=None, mtime=None):
+        """
+        Arguments:
+            nb_frames: number of frames of the video
+            pts: presentation timestamp of each frame (None if unknown)
+            keyframes: sorted indices of the frames decoding can start from
+            size, mtime: of the video file, to detect it was replaced
+        """
+        self.nb_frames = nb_frames
+        self.pts = pts
+        self.keyframes = keyframes
+        self.size = size
+        self.mtime = mtime
+
+    @staticmethod
+    def build(video_file):
+        """
+        Reads the packets of the video without decoding them. Falls back to the frame count of the container, all frames
+        seekable, if the backend cannot read raw packets.
+        """
+        stat = os.stat(video_file)
+
+        capture = cv2.VideoCapture(video_file, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+        if not capture.isOpened():
+            capture = cv2.VideoCapture(video_file)
+            if not capture.isOpened():
+                raise IOError("Cannot open video {}".format(video_file))
+
+            nb_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            capture.release()
+            return VideoIndex(nb_frames, None, list(range(nb_frames)), stat.st_size, stat.st_mtime)
+
+        pts, keyframes = [], []
+        while capture.grab():
+            if capture.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                keyframes.append(len(pts))
+            pts.append(capture.get(cv2.CAP_PROP_PTS))
+        capture.release()
+
+        if 0 not in keyframes[:1]:  # decoding can always start from the beginning
+            keyframes.insert(0, 0)
+        return VideoIndex(len(pts), pts, keyframes, stat.st_size, stat.st_mtime)
+
+    @staticmethod
+    def load(index_file):
+        with open(index_file, "r") as f:
+            return VideoIndex(**json.load(f))
+
+    def save(self, index_file):
+        with open(index_file + ".part", "w") as f:
+            json.dump(self.__dict__, f)
+        os.replace(index_file + ".part", index_file)
+
+    @staticmethod
+    def open(video_file):
+        """
+        Index of the video, built on first use then loaded from output/<video>/.video_index.json.
+        """
+        video_name = os.path.splitext(os.path.basename(video_file))[0]
+        index_file = os.path.join(OUTPUT_DIR, video_name, INDEX_FILE)
+
+        stat = os.stat(video_file)
+        if os.path.exists(index_file):
+            index = VideoIndex.load(index_file)
+            if (index.size, index.mtime) == (stat.st_size, stat.st_mtime):
+                return index
+
+        index = VideoIndex.build(video_file)
+        if not os.path.exists(os.path.dirname(index_file)):
+            os.makedirs(os.path.dirname(index_file))
+        index.save(index_file)
+        return index
+
+    def keyframe_before(self, frame):
+        return self.keyframes[bisect.bisect_right(self.keyframes, frame) - 1]
+
+
+class VideoReader:
+    """
+    Random access to the frames of a video (BGR, as cv2.imread). The window_size last decoded frames are kept.
+    """
+    def __init__(self, video_file, stride=FRAME_STRIDE, window_size=16):
+        self.video_file = video_file
+        self.stride = stride
+        self.window_size = window_size
+
+        self.index = VideoIndex.open(video_file)
+        self.capture = None
+        self.position = 0  # next video frame the capture decodes
+        self.window = OrderedDict()  # video frame -> img
+        self.lock = threading.Lock()
+
+        self.nb_seeks = 0
+        self.nb_decodes = 0
+
+    @property
+    def nb_frames(self):
+        """
+        Number of kept frames (one every stride frames of the video).
+        """
+        return (self.index.nb_frames + self.stride - 1) // self.stride
+
+    def frame_paths(self):
+        return [os.path.join(self.video_file, "{:05d}.jpg".format(frame)) for frame in range(self.nb_frames)]
+
+    def read(self, frame):
+        """
+        Arguments:
+            frame: index of the kept frame
+        """
+        video_frame = frame * self.stride
+        if not 0 <= video_frame < self.index.nb_frames:
+            raise IOError("Frame {} out of {} in {}".format(frame, self.nb_frames, self.video_file))
+
+        with self.lock:
+            if video_frame in self.window:
+                self.window.move_to_end(video_frame)
+                return self.window[video_frame]
+
+            if self.capture is None:
+                self.capture = cv2.VideoCapture(self.video_file)
+                self.position = 0
+
+            keyframe = self.index.keyframe_before(video_frame)
+            if not keyframe <= self.position <= video_frame:
+                self.seek(keyframe)
+
+            while self.position <= video_frame:
+                if not self.capture.grab():
+                    raise IOError("Cannot decode frame {} of {}".format(video_frame, self.video_file))
+                self.position += 1
+
+            success, img = self.capture.retrieve()
+            if not success:
+                raise IOError("Cannot decode frame {} of {}".format(video_frame, self.video_file))
+            self.nb_decodes += 1
+
+            img.flags.writeable = False
+            self.window[video_frame] = img
+            while len(self.window) > self.window_size:
+                self.window.popitem(last=False)
+            return img
+
+    def seek(self, keyframe):
+        self.nb_seeks += 1
+        self.capture.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+        self.position = keyframe
+        if keyframe == 0 or self.index.pts is None:
+            return
+
+        # Checks the seek landed on the keyframe with its PTS, else decodes from the beginning
+        if self.capture.grab() and self.capture.get(cv2.CAP_PROP_PTS) == self.index.pts[keyframe]:
+            self.position = keyframe + 1
+        else:
+            self.capture.release()
+            self.capture = cv2.VideoCapture(self.video_file)
+            self.position = 0
+
+    def close(self):
+        with self.lock:
+            if self.capture is not None:
+                self.capture.release()
+                self.capture = None
+            self.window.clear()
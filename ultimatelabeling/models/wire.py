@@ -0,0 +1,278 @@
+import struct
+import numpy as np
+from .polygon import Bbox, Polygon, Keypoints
+from .track_info import Detection
+from ultimatelabeling import utils
+
+
+#
+# Binary wire format of the messages exchanged with the tracking and detection servers.
+#
+# A message is a header (magic, format version, message type) followed by the fields of its schema, in order:
+#   int: int64
+#   str: uint32 length + UTF-8
+#   bbox: 4 float64 (x, y, w, h)
+#   polygon: uint32 length + float64 coordinates
+#   detections: uint32 N, then (N, 2) int64 class/track ids, (N, 4) float64 bboxes, (N + 1) uint32 polygon offsets,
+#               (N + 1) uint32 keypoint offsets, polygon coordinates and keypoint coordinates (float64)
+#   optional fields are prefixed with a uint8 presence flag
+# Everything is little-endian, and arrays are 8-byte aligned. Decoded boxes, polygons and keypoints are views into the
+# received buffer (no copy).
+#
+
+MAGIC = b"ULWF"
+VERSION = 1
+HEADER = struct.Struct("<4sHH")
+
+INT, STR, BBOX, POLYGON, DETECTIONS = "int", "str", "bbox", "polygon", "detections"
+
+# Type codes are part of the format: only append new types (or bump VERSION)
+MESSAGE_TYPES = {
+    "init": 1,
+    "track": 2,
+    "detect": 3,
+    "terminate": 4,
+    "ok": 5,
+    "tracked": 6,
+    "detections": 7,
+    "error": 8,
+    "ping": 9,
+    "init_keyed": 10,
+}
+MESSAGE_NAMES = {code: name for name, code in MESSAGE_TYPES.items()}
+
+SCHEMAS = {
+    "init": [("id", INT), ("image_path", STR), ("bbox", BBOX)],
+    "track": [("id", INT), ("image_path", STR)],
+    "detect": [("id", INT), ("image_path", STR), ("detector", STR), ("crop_area", (BBOX, None))],
+    "terminate": [("id", INT)],
+    "ok": [("id", INT)],
+    "tracked": [("id", INT), ("bbox", (BBOX, None)), ("polygon", (POLYGON, None))],
+    "detections": [("id", INT), ("detections", DETECTIONS)],
+    "error": [("id", INT), ("error", STR)],
+    "ping": [("id", INT)],  # health check, answered with "ok"
+    "init_keyed": [("id", INT), ("image_path", STR), ("bbox", BBOX), ("key", STR)],  # init of an identified object
+}
+
+
+class WireError(ValueError):
+    pass
+
+
+def encode(message):
+    """
+    Arguments:
+        message (dict): "type" and the fields of its schema (Bbox, Polygon and Detection objects for the array fields)
+    Output:
+        bytes
+    """
+    message_type = message.get("type")
+    if message_type not in SCHEMAS:
+        raise WireError("Unknown message type: {}".format(message_type))
+
+    schema = SCHEMAS[message_type]
+    if set(message) != {"type"} | {name for name, _ in schema}:
+        raise WireError("Fields of {} message should be {}, got {}".format(
+            message_type, [name for name, _ in schema], sorted(set(message) - {"type"})))
+
+    writer = _Writer()
+    writer.write(HEADER.pack(MAGIC, VERSION, MESSAGE_TYPES[message_type]))
+    for name, kind in schema:
+        try:
+            _encode_field(writer, kind, message[name])
+        except (TypeError, ValueError, AttributeError, struct.error) as e:
+            raise WireError("Invalid field {} of {} message: {}".format(name, message_type, e))
+
+    return writer.getvalue()
+
+
+def decode(data):
+    """
+    Arguments:
+        data (bytes-like): a message from encode(). Read-only buffers (bytes) are copied once, so that the decoded
+            arrays remain writable (e.g. for Bbox.resize).
+    Output:
+        message (dict)
+    """
+    if not isinstance(data, bytearray):
+        data = bytearray(data)
+
+    reader = _Reader(data)
+    magic, version, code = reader.unpack(HEADER)
+    if magic != MAGIC:
+        raise WireError("Not a wire message")
+    if version != VERSION:
+        raise WireError("Unsupported wire format version {} (expected {})".format(version, VERSION))
+    if code not in MESSAGE_NAMES:
+        raise WireError("Unknown message type code: {}".format(code))
+
+    message_type = MESSAGE_NAMES[code]
+    message = {"type": message_type}
+    for name, kind in SCHEMAS[message_type]:
+        message[name] = _decode_field(reader, kind)
+
+    if reader.offset != len(data):
+        raise WireError("{} unexpected trailing bytes in {} message".format(len(data) - reader.offset, message_type))
+
+    return message
+
+
+def init_request(image_path, bbox, key=None):
+    """
+    Output:
+        (type, fields) of the init request of a tracking server, the key being sent as a string
+    """
+    if key is None:
+        return "init", dict(image_path=image_path, bbox=bbox)
+
+    key = "/".join(str(k) for k in key) if isinstance(key, tuple) else str(key)
+    return "init_keyed", dict(image_path=image_path, bbox=bbox, key=key)
+
+
+def send_message(sock, message):
+    utils.send_data(sock, encode(message))
+
+
+def recv_message(sock, timeout=None):
+    """
+    Output:
+        dict, or None if the connection was closed
+    """
+    data = utils.recv_data(sock, timeout=timeout)
+    if data is None:
+        return None
+    return decode(data)
+
+
+class _Writer:
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def write(self, data):
+        self.parts.append(data)
+        self.size += len(data) if isinstance(data, bytes) else data.nbytes
+
+    def pack(self, fmt, *values):
+        self.write(struct.pack(fmt, *values))
+
+    def write_array(self, array, dtype):
+        self.write(b"\0" * (-self.size % 8))
+        self.write(np.ascontiguousarray(array, dtype=dtype))
+
+    def getvalue(self):
+        return b"".join(self.parts)
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+
+    def unpack(self, fmt):
+        if isinstance(fmt, str):
+            fmt = struct.Struct(fmt)
+        if self.offset + fmt.size > len(self.data):
+            raise WireError("Truncated message")
+
+        values = fmt.unpack_from(self.data, self.offset)
+        self.offset += fmt.size
+        return values
+
+    def read_bytes(self, size):
+        if self.offset + size > len(self.data):
+            raise WireError("Truncated message")
+
+        data = bytes(self.data[self.offset:self.offset + size])
+        self.offset += size
+        return data
+
+    def read_array(self, dtype, count):
+        self.offset += -self.offset % 8
+        dtype = np.dtype(dtype)
+        if self.offset + count * dtype.itemsize > len(self.data):
+            raise WireError("Truncated message")
+
+        array = np.frombuffer(self.data, dtype=dtype, count=count, offset=self.offset)
+        self.offset += array.nbytes
+        return array
+
+
+def _encode_field(writer, kind, value):
+    if isinstance(kind, tuple):  # optional
+        writer.pack("<B", value is not None)
+        if value is not None:
+            _encode_field(writer, kind[0], value)
+
+    elif kind == INT:
+        writer.pack("<q", value)
+
+    elif kind == STR:
+        data = value.encode()
+        writer.pack("<I", len(data))
+        writer.write(data)
+
+    elif kind == BBOX:
+        writer.write_array(value.xywh, "<f8")
+
+    elif kind == POLYGON:
+        writer.pack("<I", len(value.coords))
+        writer.write_array(value.coords, "<f8")
+
+    elif kind == DETECTIONS:
+        nb_detections = len(value)
+        polygons = [detection.polygon.coords for detection in value]
+        keypoints = [detection.keypoints.coords for detection in value]
+
+        writer.pack("<I", nb_detections)
+        writer.write_array(np.array([[d.class_id, d.track_id] for d in value]).reshape(nb_detections, 2), "<i8")
+        writer.write_array(np.array([d.bbox.xywh for d in value]).reshape(nb_detections, 4), "<f8")
+        writer.write_array(np.cumsum([0] + [len(coords) for coords in polygons]), "<u4")
+        writer.write_array(np.cumsum([0] + [len(coords) for coords in keypoints]), "<u4")
+        writer.write_array(np.concatenate([np.zeros(0)] + polygons), "<f8")
+        writer.write_array(np.concatenate([np.zeros(0)] + keypoints), "<f8")
+
+    else:
+        raise WireError("Unknown field kind: {}".format(kind))
+
+
+def _decode_field(reader, kind):
+    if isinstance(kind, tuple):
+        present, = reader.unpack("<B")
+        return _decode_field(reader, kind[0]) if present else None
+
+    elif kind == INT:
+        return reader.unpack("<q")[0]
+
+    elif kind == STR:
+        size, = reader.unpack("<I")
+        return reader.read_bytes(size).decode()
+
+    elif kind == BBOX:
+        return Bbox.from_array(reader.read_array("<f8", 4))
+
+    elif kind == POLYGON:
+        size, = reader.unpack("<I")
+        return Polygon.from_array(reader.read_array("<f8", size))
+
+    elif kind == DETECTIONS:
+        nb_detections, = reader.unpack("<I")
+        ids = reader.read_array("<i8", 2 * nb_detections).reshape(nb_detections, 2)
+        bboxes = reader.read_array("<f8", 4 * nb_detections).reshape(nb_detections, 4)
+        polygon_offsets = reader.read_array("<u4", nb_detections + 1)
+        keypoint_offsets = reader.read_array("<u4", nb_detections + 1)
+        polygons = reader.read_array("<f8", int(polygon_offsets[-1]))
+        keypoints = reader.read_array("<f8", int(keypoint_offsets[-1]))
+
+        polygon_sizes, keypoint_sizes = np.diff(polygon_offsets.astype(np.int64)), np.diff(keypoint_offsets.astype(np.int64))
+        if np.any(polygon_sizes < 0) or np.any(keypoint_sizes < 0) or np.any(keypoint_sizes % 3):
+            raise WireError("Invalid detection offsets")
+
+        polygon_offsets, keypoint_offsets = polygon_offsets.tolist(), keypoint_offsets.tolist()
+        return [Detection(class_id, track_id,
+                          Polygon.from_array(polygons[polygon_offsets[i]:polygon_offsets[i + 1]]),
+                          Bbox.from_array(bboxes[i]),
+                          Keypoints.from_array(keypoints[keypoint_offsets[i]:keypoint_offsets[i + 1]]))
+                for i, (class_id, track_id) in enumerate(ids.tolist())]
+
+    raise WireError("Unknown field kind: {}".format(kind))
@@ -126,6 +126,39 @@ class Refine(nn.Module):
         return out
 
 
+class _ForwardAll(nn.Module):
+    def __init__(self, features):
+        super(_ForwardAll, self).__init__()
+        self.features = features
+
+    def forward(self, x):
+        output, p3 = self.features.forward_all(x)
+        return tuple(output), p3
+
+
+class TracedResDown(nn.Module):
+    """
+    ResDown backbone compiled with TorchScript for the (fixed) template and search input sizes, for CPU inference.
+    """
+    def __init__(self, features, exemplar_size=127, instance_size=255, memory_format=torch.contiguous_format):
+        super(TracedResDown, self).__init__()
+        self.memory_format = memory_format
+
+        z = torch.zeros(1, 3, exemplar_size, exemplar_size).contiguous(memory_format=memory_format)
+        x = torch.zeros(1, 3, instance_size, instance_size).contiguous(memory_format=memory_format)
+
+        features = features.eval()
+        with torch.no_grad():
+            self.template_features = torch.jit.freeze(torch.jit.trace(features, z, check_trace=False))
+            self.search_features = torch.jit.freeze(torch.jit.trace(_ForwardAll(features).eval(), x, check_trace=False))
+
+    def forward(self, x):
+        return self.template_features(x.contiguous(memory_format=self.memory_format))
+
+    def forward_all(self, x):
+        return self.search_features(x.contiguous(memory_format=self.memory_format))
+
+
 class Custom(SiamMask):
     def __init__(self, pretrain=False, **kwargs):
         super(Custom, self).__init__(**kwargs)
@@ -6,11 +6,14 @@
 from __future__ import division
 import numpy as np
 import cv2
+import json
+import time
+import logging
 from PIL import Image
 from os import makedirs
 from os.path import join, isdir
 
-from .utils.bbox_helper import get_axis_aligned_bbox, cxy_wh_2_rect
+from .utils.bbox_helper import get_axis_aligned_bbox, cxy_wh_2_rect, vot_overlap, vot_float2str
 
 import torch
 from torch.autograd import Variable
@@ -19,6 +22,8 @@ import torch.nn.functional as F
 from .utils.anchors import Anchors
 from .utils.tracker_config import TrackerConfig
 
+logger = logging.getLogger('global')
+
 thrs = np.arange(0.3, 0.5, 0.05)
 
 
@@ -37,50 +42,64 @@ def im_to_torch(img):
     return img
 
 
-def get_subwindow_tracking(im, pos, model_sz, original_sz, avg_chans, out_mode='torch'):
+class CropBuffer(object):
+    """
+    Preallocated search/exemplar crop: uint8 patch (H*W*C) and the (1, C, H, W) float tensor fed to the network
+    (pinned when CUDA is available, for asynchronous host to device copies).
+    """
+    def __init__(self, model_sz, pin_memory=None):
+        if pin_memory is None:
+            pin_memory = torch.cuda.is_available()
+
+        self.patch = np.empty((model_sz, model_sz, 3), np.uint8)
+        self.tensor = torch.empty((1, 3, model_sz, model_sz), pin_memory=pin_memory)
+        self._patch = torch.from_numpy(self.patch)
+        self._tensor_hwc = self.tensor[0].permute(1, 2, 0)
+
+    def to_torch(self):
+        self._tensor_hwc.copy_(self._patch)
+        return self.tensor
+
+
+def get_subwindow_tracking(im, pos, model_sz, original_sz, avg_chans, out_mode='torch', out=None):
+    """
+    Crops the original_sz*original_sz window centered on pos, padded with avg_chans outside of the image, and resizes
+    it to model_sz*model_sz. Only the window is copied when it crosses the image border, not the whole padded image.
+    Arguments:
+        out (CropBuffer, optional): buffer to write the crop into (a new tensor / patch is allocated otherwise)
+    """
     if isinstance(pos, float):
         pos = [pos, pos]
-    sz = original_sz
-    im_sz = im.shape
+    sz = int(original_sz)
     c = (original_sz + 1) / 2
-    context_xmin = round(pos[0] - c)
-    context_xmax = context_xmin + sz - 1
-    context_ymin = round(pos[1] - c)
-    context_ymax = context_ymin + sz - 1
-    left_pad = int(max(0., -context_xmin))
-    top_pad = int(max(0., -context_ymin))
-    right_pad = int(max(0., context_xmax - im_sz[1] + 1))
-    bottom_pad = int(max(0., context_ymax - im_sz[0] + 1))
-
-    context_xmin = context_xmin + left_pad
-    context_xmax = context_xmax + left_pad
-    context_ymin = context_ymin + top_pad
-    context_ymax = context_ymax + top_pad
-
-    # zzp: a more easy speed version
-    r, c, k = im.shape
-    if any([top_pad, bottom_pad, left_pad, right_pad]):
-        te_im = np.zeros((r + top_pad + bottom_pad, c + left_pad + right_pad, k), np.uint8)
-        te_im[top_pad:top_pad + r, left_pad:left_pad + c, :] = im
-        if top_pad:
-            te_im[0:top_pad, left_pad:left_pad + c, :] = avg_chans
-        if bottom_pad:
-            te_im[r + top_pad:, left_pad:left_pad + c, :] = avg_chans
-        if left_pad:
-            te_im[:, 0:left_pad, :] = avg_chans
-        if right_pad:
-            te_im[:, c + left_pad:, :] = avg_chans
-        im_patch_original = te_im[int(context_ymin):int(context_ymax + 1), int(context_xmin):int(context_xmax + 1), :]
+    context_xmin = int(round(pos[0] - c))
+    context_ymin = int(round(pos[1] - c))
+
+    # part of the window inside of the image
+    x1, y1 = max(context_xmin, 0), max(context_ymin, 0)
+    x2, y2 = min(context_xmin + sz, im.shape[1]), min(context_ymin + sz, im.shape[0])
+
+    if (x1, y1, x2, y2) == (context_xmin, context_ymin, context_xmin + sz, context_ymin + sz):
+        im_patch_original = im[y1:y2, x1:x2, :]
     else:
-        im_patch_original = im[int(context_ymin):int(context_ymax + 1), int(context_xmin):int(context_xmax + 1), :]
+        im_patch_original = np.empty((sz, sz, im.shape[2]), np.uint8)
+        im_patch_original[:] = avg_chans  # truncated, as the padding of a uint8 image
+        if x1 < x2 and y1 < y2:
+            im_patch_original[y1 - context_ymin:y2 - context_ymin, x1 - context_xmin:x2 - context_xmin, :] = \
+                im[y1:y2, x1:x2, :]
 
+    dst = out.patch if out is not None else None
     if not np.array_equal(model_sz, original_sz):
-        im_patch = cv2.resize(im_patch_original, (model_sz, model_sz))
+        im_patch = cv2.resize(im_patch_original, (model_sz, model_sz), dst=dst)
+    elif dst is not None:
+        np.copyto(dst, im_patch_original)
+        im_patch = dst
     else:
         im_patch = im_patch_original
-    # cv2.imshow('crop', im_patch)
-    # cv2.waitKey(0)
-    return im_to_torch(im_patch) if out_mode in 'torch' else im_patch
+
+    if out_mode not in 'torch':
+        return im_patch
+    return out.to_torch()[0] if out is not None else im_to_torch(im_patch)
 
 
 def generate_anchor(cfg, score_size):
@@ -102,37 +121,79 @@ def generate_anchor(cfg, score_size):
     return anchor
 
 
-def siamese_init(im, target_pos, target_sz, model, hp=None, use_cuda=True):
-    state = dict()
-    state['im_h'] = im.shape[0]
-    state['im_w'] = im.shape[1]
+_anchor_window_cache = {}
+
+
+def get_anchor_window(anchors_cfg, p):
+    """
+    Anchors and motion window only depend on the config, so they are computed once and shared by all trackers.
+    The returned arrays must not be modified in place.
+    """
+    key = (json.dumps(anchors_cfg, sort_keys=True), p.score_size, p.anchor_num, p.windowing)
+
+    if key not in _anchor_window_cache:
+        anchor = generate_anchor(anchors_cfg, p.score_size)
+
+        if p.windowing == 'cosine':
+            window = np.outer(np.hanning(p.score_size), np.hanning(p.score_size))
+        elif p.windowing == 'uniform':
+            window = np.ones((p.score_size, p.score_size))
+        window = np.tile(window.flatten(), p.anchor_num)
+
+        _anchor_window_cache[key] = anchor, window
+
+    return _anchor_window_cache[key]
+
+
+def get_exemplar_crop(im, target_pos, target_sz, p, avg_chans=None):
+    """
+    Output:
+        z_crop (tensor fed to the template branch), avg_chans (mean color of im, used for the padding)
+    """
+    if avg_chans is None:
+        avg_chans = np.mean(im, axis=(0, 1))
+
+    wc_z = target_sz[0] + p.context_amount * sum(target_sz)
+    hc_z = target_sz[1] + p.context_amount * sum(target_sz)
+    s_z = round(np.sqrt(wc_z * hc_z))
+    return get_subwindow_tracking(im, target_pos, p.exemplar_size, s_z, avg_chans), avg_chans
+
+
+def siamese_config(model, hp=None):
     p = TrackerConfig()
     p.update(hp, model.anchors)
 
     p.renew()
 
-    net = model
     p.scales = model.anchors['scales']
     p.ratios = model.anchors['ratios']
     p.anchor_num = len(p.ratios) * len(p.scales)
-    p.anchor = generate_anchor(model.anchors, p.score_size)
+    p.anchor, window = get_anchor_window(model.anchors, p)
+    return p, window
 
-    avg_chans = np.mean(im, axis=(0, 1))
 
-    wc_z = target_sz[0] + p.context_amount * sum(target_sz)
-    hc_z = target_sz[1] + p.context_amount * sum(target_sz)
-    s_z = round(np.sqrt(wc_z * hc_z))
-    # initialize the exemplar
-    z_crop = get_subwindow_tracking(im, target_pos, p.exemplar_size, s_z, avg_chans)
+def siamese_init(im, target_pos, target_sz, model, hp=None, use_cuda=True, zf=None, exemplar=None):
+    """
+    exemplar: (z_crop, avg_chans) from get_exemplar_crop, computed when not given
+    zf: template features of the exemplar, skips the template backbone pass when given
+    """
+    state = dict()
+    state['im_h'] = im.shape[0]
+    state['im_w'] = im.shape[1]
+    p, window = siamese_config(model, hp)
 
-    z = Variable(z_crop.unsqueeze(0))
-    net.template(z.cuda() if use_cuda else z)
+    net = model
+
+    if exemplar is None:
+        exemplar = get_exemplar_crop(im, target_pos, target_sz, p)
+    z_crop, avg_chans = exemplar
 
-    if p.windowing == 'cosine':
-        window = np.outer(np.hanning(p.score_size), np.hanning(p.score_size))
-    elif p.windowing == 'uniform':
-        window = np.ones((p.score_size, p.score_size))
-    window = np.tile(window.flatten(), p.anchor_num)
+    if zf is None:
+        # initialize the exemplar
+        z = Variable(z_crop.unsqueeze(0))
+        net.template(z.cuda() if use_cuda else z)
+    else:
+        net.zf = zf
 
     state['p'] = p
     state['net'] = net
@@ -160,6 +221,88 @@ def get_image_crop(state, im):
     return get_subwindow_tracking(im, target_pos, p.instance_size, round(s_x), avg_chans, out_mode="cv2")
 
 
+def warp_affine_maps(mapping, roi):
+    """
+    Fixed-point maps for cv2.remap sampling the same source coordinates as cv2.warpAffine(src, mapping, dsize,
+    flags=cv2.INTER_LINEAR) over the roi (x, y, w, h) of its output. OpenCV rounds the coordinates to 1/32 pixel from
+    the absolute output position, so a warpAffine into the ROI with a translated mapping can interpolate differently.
+    Arguments:
+        mapping: 2x3 scaling and translation matrix (no rotation)
+    """
+    AB_BITS, INTER_BITS = 10, 5  # as in OpenCV's WarpAffineInvoker
+    AB_SCALE, INTER_TAB_SIZE = 1 << AB_BITS, 1 << INTER_BITS
+    round_delta = AB_SCALE // INTER_TAB_SIZE // 2
+
+    M = np.asarray(mapping, dtype=float).flatten()
+    assert M[1] == 0 and M[3] == 0, "rotations are not supported"
+    D = M[0] * M[4] - M[1] * M[3]
+    D = 1. / D if D != 0 else 0
+    A11, A22 = M[4] * D, M[0] * D
+    A12, A21 = -M[1] * D, -M[3] * D
+    iM = [A11, A12, -A11 * M[2] - A12 * M[5], A21, A22, -A21 * M[2] - A22 * M[5]]
+
+    def fixed(v):
+        return np.rint(v * AB_SCALE).astype(np.int64)  # saturate_cast<int> rounds half to even, as np.rint
+
+    # without rotation, x only depends on the column and y on the row
+    xs = np.arange(roi[0], roi[0] + roi[2], dtype=float)
+    ys = np.arange(roi[1], roi[1] + roi[3], dtype=float)
+    X = (fixed(iM[2]) + round_delta + fixed(iM[0] * xs)) >> (AB_BITS - INTER_BITS)  # row offset + column delta
+    Y = (fixed(iM[4] * ys + iM[5]) + round_delta) >> (AB_BITS - INTER_BITS)
+
+    map_xy = np.empty((roi[3], roi[2], 2), dtype=np.int16)
+    map_xy[..., 0] = np.clip(X >> INTER_BITS, -32768, 32767)
+    map_xy[..., 1] = np.clip(Y >> INTER_BITS, -32768, 32767)[:, None]
+    map_alpha = ((Y & (INTER_TAB_SIZE - 1)) * INTER_TAB_SIZE)[:, None].astype(np.uint16) + \
+                (X & (INTER_TAB_SIZE - 1)).astype(np.uint16)
+    return map_xy, map_alpha
+
+
+def crop_back_roi(mask, sub_box, im_w, im_h, padding=-1):
+    """
+    Projects the mask (predicted inside sub_box) back into the image, only over the region it covers. The values are
+    the same as the ones of the full image projection (see warp_affine_maps), which is padding outside of the roi.
+    Output:
+        mask_in_roi, roi (x, y, w, h) of mask_in_roi in the image
+    """
+    out_sz = mask.shape[1], mask.shape[0]
+    s = out_sz[0] / sub_box[2]
+    back_box = [-sub_box[0] * s, -sub_box[1] * s, im_w * s, im_h * s]
+
+    a = (im_w - 1) / back_box[2]
+    b = (im_h - 1) / back_box[3]
+    c = -a * back_box[0]
+    d = -b * back_box[1]
+
+    # footprint of the mask (including the bilinear interpolation border), with a 1 pixel margin, clipped to the image
+    x1 = int(min(max(np.floor(c - a) - 1, 0), im_w))
+    y1 = int(min(max(np.floor(d - b) - 1, 0), im_h))
+    x2 = int(min(max(np.ceil(c + a * out_sz[0]) + 2, x1), im_w))
+    y2 = int(min(max(np.ceil(d + b * out_sz[1]) + 2, y1), im_h))
+    roi = (x1, y1, x2 - x1, y2 - y1)
+
+    if roi[2] == 0 or roi[3] == 0:
+        return np.zeros((roi[3], roi[2]), dtype=mask.dtype), roi
+
+    mapping = np.array([[a, 0, c],
+                        [0, b, d]]).astype(float)
+    map_xy, map_alpha = warp_affine_maps(mapping, roi)
+    crop = cv2.remap(mask, map_xy, map_alpha, cv2.INTER_LINEAR,
+                     borderMode=cv2.BORDER_CONSTANT,
+                     borderValue=padding)
+    return crop, roi
+
+
+def get_full_mask(state, padding=-1):
+    """
+    Full image mask of the last siamese_track call (with mask_enable)
+    """
+    mask = np.full((state['im_h'], state['im_w']), padding, dtype=np.float32)
+    x, y, w, h = state['roi']
+    mask[y:y + h, x:x + w] = state['mask_roi']
+    return mask
+
+
 def siamese_track(state, im, mask_enable=False, refine_enable=False, use_cuda=True):
     p = state['p']
     net = state['net']
@@ -167,6 +310,8 @@ def siamese_track(state, im, mask_enable=False, refine_enable=False, use_cuda=Tr
     window = state['window']
     target_pos = state['target_pos']
     target_sz = state['target_sz']
+    timings = dict()  # seconds spent in each stage of this frame
+    tic = time.perf_counter()
 
     wc_x = target_sz[1] + p.context_amount * sum(target_sz)
     hc_x = target_sz[0] + p.context_amount * sum(target_sz)
@@ -177,17 +322,24 @@ def siamese_track(state, im, mask_enable=False, refine_enable=False, use_cuda=Tr
     s_x = s_x + 2 * pad
     crop_box = [target_pos[0] - round(s_x) / 2, target_pos[1] - round(s_x) / 2, round(s_x), round(s_x)]
 
+    if 'x_crop' not in state:
+        state['x_crop'] = CropBuffer(p.instance_size, pin_memory=use_cuda)
+
     # extract scaled crops for search region x at previous target position
-    x_crop = Variable(get_subwindow_tracking(im, target_pos, p.instance_size, round(s_x), avg_chans).unsqueeze(0))
+    x_crop = get_subwindow_tracking(im, target_pos, p.instance_size, round(s_x), avg_chans,
+                                    out=state['x_crop']).unsqueeze(0)
+    timings['crop'], tic = time.perf_counter() - tic, time.perf_counter()
 
     if mask_enable:
-        score, delta, mask = net.track_mask(x_crop.cuda() if use_cuda else x_crop)
+        score, delta, mask = net.track_mask(x_crop.cuda(non_blocking=True) if use_cuda else x_crop)
     else:
-        score, delta = net.track(x_crop.cuda() if use_cuda else x_crop)
+        score, delta = net.track(x_crop.cuda(non_blocking=True) if use_cuda else x_crop)
 
-    delta = delta.permute(1, 2, 3, 0).contiguous().view(4, -1).data.cpu().numpy()
-    score = F.softmax(score.permute(1, 2, 3, 0).contiguous().view(2, -1).permute(1, 0), dim=1).data[:,
+    # outputs may be in reduced precision (e.g. bf16 autocast)
+    delta = delta.float().permute(1, 2, 3, 0).contiguous().view(4, -1).data.cpu().numpy()
+    score = F.softmax(score.float().permute(1, 2, 3, 0).contiguous().view(2, -1).permute(1, 0), dim=1).data[:,
             1].cpu().numpy()
+    timings['network'], tic = time.perf_counter() - tic, time.perf_counter()
 
     delta[0, :] = delta[0, :] * p.anchor[:, 2] + p.anchor[:, 0]
     delta[1, :] = delta[1, :] * p.anchor[:, 3] + p.anchor[:, 1]
@@ -230,6 +382,7 @@ def siamese_track(state, im, mask_enable=False, refine_enable=False, use_cuda=Tr
 
     target_pos = np.array([res_x, res_y])
     target_sz = np.array([res_w, res_h])
+    timings['postprocess'], tic = time.perf_counter() - tic, time.perf_counter()
 
     # for Mask Branch
     if mask_enable:
@@ -238,41 +391,25 @@ def siamese_track(state, im, mask_enable=False, refine_enable=False, use_cuda=Tr
 
         if refine_enable:
             if use_cuda:
-                mask = net.track_refine((delta_y, delta_x)).cuda().sigmoid().squeeze().view(
+                mask = net.track_refine((delta_y, delta_x)).cuda().float().sigmoid().squeeze().view(
                     p.out_size, p.out_size).cpu().data.numpy()
             else:
-                mask = net.track_refine((delta_y, delta_x)).sigmoid().squeeze().view(
+                mask = net.track_refine((delta_y, delta_x)).float().sigmoid().squeeze().view(
                     p.out_size, p.out_size).cpu().data.numpy()
         else:
-            mask = mask[0, :, delta_y, delta_x].sigmoid(). \
+            mask = mask[0, :, delta_y, delta_x].float().sigmoid(). \
                 squeeze().view(p.out_size, p.out_size).cpu().data.numpy()
-
-        def crop_back(image, bbox, out_sz, padding=-1):
-            a = (out_sz[0] - 1) / bbox[2]
-            b = (out_sz[1] - 1) / bbox[3]
-            c = -a * bbox[0]
-            d = -b * bbox[1]
-            mapping = np.array([[a, 0, c],
-                                [0, b, d]]).astype(np.float)
-            crop = cv2.warpAffine(image, mapping, (out_sz[0], out_sz[1]),
-                                  flags=cv2.INTER_LINEAR,
-                                  borderMode=cv2.BORDER_CONSTANT,
-                                  borderValue=padding)
-            return crop
+        timings['refine'], tic = time.perf_counter() - tic, time.perf_counter()
 
         s = crop_box[2] / p.instance_size
         sub_box = [crop_box[0] + (delta_x - p.base_size / 2) * p.total_stride * s,
                    crop_box[1] + (delta_y - p.base_size / 2) * p.total_stride * s,
                    s * p.exemplar_size, s * p.exemplar_size]
-        s = p.out_size / sub_box[2]
-        back_box = [-sub_box[0] * s, -sub_box[1] * s, state['im_w'] * s, state['im_h'] * s]
-        mask_in_img = crop_back(mask, back_box, (state['im_w'], state['im_h']))
+        mask_in_roi, roi = crop_back_roi(mask, sub_box, state['im_w'], state['im_h'])
 
-        target_mask = (mask_in_img > p.seg_thr).astype(np.uint8)
-        if cv2.__version__[-5] == '4':
-            contours, _ = cv2.findContours(target_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-        else:
-            _, contours, _ = cv2.findContours(target_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        target_mask = (mask_in_roi > p.seg_thr).astype(np.uint8)
+        # OpenCV 3 returns (image, contours, hierarchy), OpenCV 4 returns (contours, hierarchy)
+        contours = cv2.findContours(target_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE, offset=roi[:2])[-2]
         cnt_area = [cv2.contourArea(cnt) for cnt in contours]
         if len(contours) != 0 and np.max(cnt_area) > 100:
             contour = contours[np.argmax(cnt_area)]  # use max area polygon
@@ -288,6 +425,7 @@ def siamese_track(state, im, mask_enable=False, refine_enable=False, use_cuda=Tr
                                     [location[0] + location[2], location[1]],
                                     [location[0] + location[2], location[1] + location[3]],
                                     [location[0], location[1] + location[3]]])
+        timings['mask'] = time.perf_counter() - tic
 
     target_pos[0] = max(0, min(state['im_w'], target_pos[0]))
     target_pos[1] = max(0, min(state['im_h'], target_pos[1]))
@@ -297,12 +435,22 @@ def siamese_track(state, im, mask_enable=False, refine_enable=False, use_cuda=Tr
     state['target_pos'] = target_pos
     state['target_sz'] = target_sz
     state['score'] = score
-    state['mask'] = mask_in_img if mask_enable else []
+    state['mask_roi'] = mask_in_roi if mask_enable else []
+    state['roi'] = roi if mask_enable else None
     state['ploygon'] = rbox_in_img if mask_enable else []
+    state['timings'] = timings
     return state
 
 
-def track_vot(model, video, hp=None, mask_enable=False, refine_enable=False):
+def track_vot(model, video, hp=None, mask_enable=False, refine_enable=False, dataset='VOT2018', result_dir=None,
+              visualization=False, v_id=0, use_cuda=True):
+    """
+    Arguments:
+        video (dict): name, image_files and gt (N*8 polygons for VOT, N*4 rects otherwise)
+        result_dir (str, optional): the regions are written to <result_dir>/<dataset layout>/<video>.txt when given
+    Output:
+        lost_times, fps
+    """
     regions = []  # result and states[1 init / 2 lost / 0 skip]
     image_files, gt = video['image_files'], video['gt']
 
@@ -315,19 +463,19 @@ def track_vot(model, video, hp=None, mask_enable=False, refine_enable=False):
             cx, cy, w, h = get_axis_aligned_bbox(gt[f])
             target_pos = np.array([cx, cy])
             target_sz = np.array([w, h])
-            state = siamese_init(im, target_pos, target_sz, model, hp)  # init tracker
+            state = siamese_init(im, target_pos, target_sz, model, hp, use_cuda=use_cuda)  # init tracker
             location = cxy_wh_2_rect(state['target_pos'], state['target_sz'])
-            regions.append(1 if 'VOT' in args.dataset else gt[f])
+            regions.append(1 if 'VOT' in dataset else gt[f])
         elif f > start_frame:  # tracking
-            state = siamese_track(state, im, mask_enable, refine_enable)  # track
+            state = siamese_track(state, im, mask_enable, refine_enable, use_cuda=use_cuda)  # track
             if mask_enable:
                 location = state['ploygon'].flatten()
-                mask = state['mask']
+                mask = get_full_mask(state)
             else:
                 location = cxy_wh_2_rect(state['target_pos'], state['target_sz'])
                 mask = []
 
-            if 'VOT' in args.dataset:
+            if 'VOT' in dataset:
                 gt_polygon = ((gt[f][0], gt[f][1]), (gt[f][2], gt[f][3]),
                               (gt[f][4], gt[f][5]), (gt[f][6], gt[f][7]))
                 if mask_enable:
@@ -352,19 +500,20 @@ def track_vot(model, video, hp=None, mask_enable=False, refine_enable=False):
             regions.append(0)
         toc += cv2.getTickCount() - tic
 
-        if args.visualization and f >= start_frame:  # visualization (skip lost frame)
+        if visualization and f >= start_frame:  # visualization (skip lost frame)
             im_show = im.copy()
             if f == 0: cv2.destroyAllWindows()
             if gt.shape[0] > f:
                 if len(gt[f]) == 8:
-                    cv2.polylines(im_show, [np.array(gt[f], np.int).reshape((-1, 1, 2))], True, (0, 255, 0), 3)
+                    cv2.polylines(im_show, [np.array(gt[f], int).reshape((-1, 1, 2))], True, (0, 255, 0), 3)
                 else:
-                    cv2.rectangle(im_show, (gt[f, 0], gt[f, 1]), (gt[f, 0] + gt[f, 2], gt[f, 1] + gt[f, 3]), (0, 255, 0), 3)
+                    x, y, w, h = [int(v) for v in gt[f]]
+                    cv2.rectangle(im_show, (x, y), (x + w, y + h), (0, 255, 0), 3)
             if len(location) == 8:
                 if mask_enable:
                     mask = mask > state['p'].seg_thr
                     im_show[:, :, 2] = mask * 255 + (1 - mask) * im_show[:, :, 2]
-                location_int = np.int0(location)
+                location_int = np.int32(location)
                 cv2.polylines(im_show, [location_int.reshape((-1, 1, 2))], True, (0, 255, 255), 3)
             else:
                 location = [int(l) for l in location]
@@ -378,20 +527,16 @@ def track_vot(model, video, hp=None, mask_enable=False, refine_enable=False):
     toc /= cv2.getTickFrequency()
 
     # save result
-    name = args.arch.split('.')[0] + '_' + ('mask_' if mask_enable else '') + ('refine_' if refine_enable else '') +\
-           args.resume.split('/')[-1].split('.')[0]
-
-    if 'VOT' in args.dataset:
-        video_path = join('test', args.dataset, name,
-                          'baseline', video['name'])
+    if result_dir is not None and 'VOT' in dataset:
+        video_path = join(result_dir, dataset, 'baseline', video['name'])
         if not isdir(video_path): makedirs(video_path)
         result_path = join(video_path, '{:s}_001.txt'.format(video['name']))
         with open(result_path, "w") as fin:
             for x in regions:
                 fin.write("{:d}\n".format(x)) if isinstance(x, int) else \
                         fin.write(','.join([vot_float2str("%.4f", i) for i in x]) + '\n')
-    else:  # OTB
-        video_path = join('test', args.dataset, name)
+    elif result_dir is not None:  # OTB
+        video_path = join(result_dir, dataset)
         if not isdir(video_path): makedirs(video_path)
         result_path = join(video_path, '{:s}.txt'.format(video['name']))
         with open(result_path, "w") as fin:
@@ -442,7 +587,15 @@ def MultiBatchIouMeter(thrs, outputs, targets, start=None, end=None):
     return res
 
 
-def track_vos(model, video, hp=None, mask_enable=False, refine_enable=False, mot_enable=False):
+def track_vos(model, video, hp=None, mask_enable=False, refine_enable=False, mot_enable=False, dataset='DAVIS2017',
+              result_dir=None, visualization=False, v_id=0, use_cuda=True):
+    """
+    Arguments:
+        video (dict): name, image_files, anno_files (and optionally anno_init_files, start_frame, end_frame)
+        result_dir (str, optional): the predicted masks are written to <result_dir>/<dataset>/SiamMask/<video> when given
+    Output:
+        multi_mean_iou (objects * thrs), fps
+    """
     image_files = video['image_files']
 
     annos = [np.array(Image.open(x)) for x in video['anno_files']]
@@ -481,10 +634,10 @@ def track_vos(model, video, hp=None, mask_enable=False, refine_enable=False, mot
                 cx, cy = x + w/2, y + h/2
                 target_pos = np.array([cx, cy])
                 target_sz = np.array([w, h])
-                state = siamese_init(im, target_pos, target_sz, model, hp)  # init tracker
+                state = siamese_init(im, target_pos, target_sz, model, hp, use_cuda=use_cuda)  # init tracker
             elif end_frame >= f > start_frame:  # tracking
-                state = siamese_track(state, im, mask_enable, refine_enable)  # track
-                mask = state['mask']
+                state = siamese_track(state, im, mask_enable, refine_enable, use_cuda=use_cuda)  # track
+                mask = get_full_mask(state)
             toc += cv2.getTickCount() - tic
             if end_frame >= f >= start_frame:
                 pred_masks[obj_id, f, :, :] = mask
@@ -501,8 +654,8 @@ def track_vos(model, video, hp=None, mask_enable=False, refine_enable=False, mot
     else:
         multi_mean_iou = []
 
-    if args.save_mask:
-        video_path = join('test', args.dataset, 'SiamMask', video['name'])
+    if result_dir is not None:
+        video_path = join(result_dir, dataset, 'SiamMask', video['name'])
         if not isdir(video_path): makedirs(video_path)
         pred_mask_final = np.array(pred_masks)
         pred_mask_final = (np.argmax(pred_mask_final, axis=0).astype('uint8') + 1) * (
@@ -510,7 +663,7 @@ def track_vos(model, video, hp=None, mask_enable=False, refine_enable=False, mot
         for i in range(pred_mask_final.shape[0]):
             cv2.imwrite(join(video_path, image_files[i].split('/')[-1].split('.')[0] + '.png'), pred_mask_final[i].astype(np.uint8))
 
-    if args.visualization:
+    if visualization:
         pred_mask_final = np.array(pred_masks)
         pred_mask_final = (np.argmax(pred_mask_final, axis=0).astype('uint8') + 1) * (
                 np.max(pred_mask_final, axis=0) > state['p'].seg_thr).astype('uint8')
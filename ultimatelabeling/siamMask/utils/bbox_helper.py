@@ -4,6 +4,7 @@
 # Written by Qiang Wang (wangqiang2015 at ia.ac.cn)
 # --------------------------------------------------------
 import numpy as np
+import cv2
 from collections import namedtuple
 
 Corner = namedtuple('Corner', 'x1 y1 x2 y2')
@@ -74,3 +75,27 @@ def get_axis_aligned_bbox(region):
     return cx, cy, w, h
 
 
+def vot_overlap(polygon1, polygon2, bounds=None):
+    """
+    IoU of two convex polygons ((x1, y1), (x2, y2), ...), both clipped to bounds (width, height) when given.
+    Pure OpenCV replacement of pyvotkit's vot_overlap.
+    """
+    def clip(polygon):
+        polygon = np.array(polygon, dtype=np.float32).reshape(-1, 2)
+        if bounds is None:
+            return polygon
+        image = np.array([[0, 0], [bounds[0], 0], [bounds[0], bounds[1]], [0, bounds[1]]], dtype=np.float32)
+        area, intersection = cv2.intersectConvexConvex(polygon, image)
+        return intersection.reshape(-1, 2) if area > 0 else None
+
+    polygon1, polygon2 = clip(polygon1), clip(polygon2)
+    if polygon1 is None or polygon2 is None:
+        return 0.
+
+    intersection, _ = cv2.intersectConvexConvex(polygon1, polygon2)
+    union = cv2.contourArea(polygon1) + cv2.contourArea(polygon2) - intersection
+    return intersection / union if union > 0 else 0.
+
+
+def vot_float2str(template, value):
+    return template % value
@@ -0,0 +1,90 @@
+import torch
+import torch.nn as nn
+import torch.quantization as tq
+import logging
+from ..models.resnet import Bottleneck
+from ..models.rpn import DepthCorr
+logger = logging.getLogger('global')
+
+try:
+    from torch.ao.nn.intrinsic import ConvReLU2d
+except ImportError:
+    from torch.nn.intrinsic import ConvReLU2d
+
+
+def fuse_conv_bn(model):
+    """
+    Folds the BatchNorm layers (and following ReLU when possible) of the backbone and DepthCorr heads into their convs.
+    """
+    backbone = model.features.features
+    tq.fuse_modules(backbone, [["conv1", "bn1"]], inplace=True)
+
+    for module in backbone.modules():
+        if isinstance(module, Bottleneck):
+            tq.fuse_modules(module, [["conv1", "bn1"], ["conv2", "bn2"], ["conv3", "bn3"]], inplace=True)
+            if module.downsample is not None:
+                tq.fuse_modules(module.downsample, [["0", "1"]], inplace=True)
+
+    tq.fuse_modules(model.features.downsample.downsample, [["0", "1"]], inplace=True)
+
+    for module in model.modules():
+        if isinstance(module, DepthCorr):
+            tq.fuse_modules(module.conv_kernel, [["0", "1", "2"]], inplace=True)
+            tq.fuse_modules(module.conv_search, [["0", "1", "2"]], inplace=True)
+            tq.fuse_modules(module.head, [["0", "1", "2"]], inplace=True)
+
+
+def wrap_convs(module, qconfig):
+    """
+    Surrounds every conv with quantize/dequantize stubs, so that the remaining (functional) ops keep running in fp32.
+    """
+    for name, child in module.named_children():
+        if isinstance(child, (nn.Conv2d, ConvReLU2d)):
+            wrapper = tq.QuantWrapper(child)
+            wrapper.qconfig = qconfig
+            setattr(module, name, wrapper)
+        else:
+            wrap_convs(child, qconfig)
+
+
+def prepare_int8(model, backend="fbgemm"):
+    """
+    Prepares the backbone and DepthCorr heads of a (fp32, eval) SiamMask model for post-training static quantization.
+    The refine module is kept in fp32.
+    """
+    torch.backends.quantized.engine = backend
+    qconfig = tq.get_default_qconfig(backend)
+
+    model.eval()
+    fuse_conv_bn(model)
+    wrap_convs(model.features, qconfig)
+    for module in model.modules():
+        if isinstance(module, DepthCorr):
+            wrap_convs(module, qconfig)
+
+    tq.prepare(model, inplace=True)
+    return model
+
+
+def quantize_int8(model, calibrate, backend="fbgemm"):
+    """
+    Arguments:
+        model: fp32 SiamMask model
+        calibrate: function running the model on representative inputs, called with the prepared model
+    """
+    prepare_int8(model, backend)
+
+    with torch.no_grad():
+        calibrate(model)
+
+    tq.convert(model, inplace=True)
+    return model
+
+
+def load_int8(model, checkpoint_path, backend="fbgemm"):
+    logger.info('load quantized model from {}'.format(checkpoint_path))
+
+    prepare_int8(model, backend)
+    tq.convert(model, inplace=True)
+    model.load_state_dict(torch.load(checkpoint_path, map_location="cpu"))
+    return model
@@ -2,11 +2,11 @@ import cv2
 from .models.polygon import Bbox
 import numpy as np
 import os
-from tqdm import tqdm
 import struct
 import matplotlib.cm
 import re
-import subprocess
+import socket
+import time
 
 
 COCO_PERSON_SKELETON = [
@@ -120,54 +120,64 @@ def subdivide_bbox(bbox):
     return [Bbox(x, y, w_, h_), Bbox(x + w_, y, w_, h_), Bbox(x, y + h_, w_, h_), Bbox(x + w_, y + h_, w_, h_)]
 
 
-def convert_video_to_frames(video_file, output_folder):
-    subprocess.check_call(['/bin/bash', 'extract_all.sh', video_file, output_folder])
-
-def convert_video_to_frames_opencv(video_file, output_folder):
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
-
-    MAX_FRAMES = 1000
-
-    vidcap = cv2.VideoCapture(video_file)
-    nb_frames = int(vidcap.get(cv2.CAP_PROP_FRAME_COUNT))
-
-    success, image = vidcap.read()
-    if not success:
-        return
-
-    nb_frames = min(nb_frames, MAX_FRAMES)
-    for i in tqdm(range(nb_frames)):
-        cv2.imwrite(os.path.join(output_folder, "{:05d}.jpg".format(i)), image)
-        success, image = vidcap.read()
-
-        if not success:
-            return
-
-
 def send_data(socket, data):
     data = struct.pack('>I', len(data)) + data
     socket.sendall(data)
 
 
-def recv_data(sock):
+def recv_data(sock, timeout=None):
+    """
+    Receives a message sent with send_data.
+    Output:
+        bytearray, or None if the connection was closed
+    """
     # Read message length and unpack it into an integer
-    raw_msglen = recvall(sock, 4)
+    raw_msglen = recvall(sock, 4, timeout=timeout)
     if not raw_msglen:
         return None
     msglen = struct.unpack('>I', raw_msglen)[0]
     # Read the message data
-    return recvall(sock, msglen)
-
+    return recvall(sock, msglen, timeout=timeout)
+
+
+def recvall(sock, n, timeout=None):
+    """
+    Receives exactly n bytes, directly into a buffer allocated once.
+    Arguments:
+        timeout (float): maximum time to receive the n bytes, on top of the timeout of the socket (per read)
+    Output:
+        bytearray, or None if EOF is hit first
+    On timeout, socket.timeout is raised. If part of the data was already read, the stream is out of sync and the
+    connection should be closed.
+    """
+    data = bytearray(n)
+    view = memoryview(data)
+    nb_received = 0
+
+    previous_timeout = sock.gettimeout()
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    try:
+        while nb_received < n:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout("timed out after receiving {} of {} bytes".format(nb_received, n))
+                sock.settimeout(remaining if previous_timeout is None else min(remaining, previous_timeout))
+
+            try:
+                nb_bytes = sock.recv_into(view[nb_received:])
+            except socket.timeout:
+                raise socket.timeout("timed out after receiving {} of {} bytes".format(nb_received, n))
+
+            if nb_bytes == 0:
+                return None
+            nb_received += nb_bytes
+    finally:
+        view.release()
+        if deadline is not None:
+            sock.settimeout(previous_timeout)
 
-def recvall(sock, n):
-    # Helper function to recv n bytes or return None if EOF is hit
-    data = b''
-    while len(data) < n:
-        packet = sock.recv(n - len(data))
-        if not packet:
-            return None
-        data += packet
     return data
 
 
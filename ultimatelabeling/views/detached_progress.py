@@ -0,0 +1,98 @@
+import datetime
+from PyQt5.QtWidgets import QWidget, QProgressBar, QLabel, QVBoxLayout
+from PyQt5.QtCore import QThread, pyqtSignal
+from ultimatelabeling.models.detached_progress import parse_status, ProgressEstimator
+
+
+class DetachedProgress(QWidget):
+    """
+    Live progress of the detached detection, streamed from the server (see SSHLogin.watch_detached_info).
+    """
+    err_signal = pyqtSignal(str)
+
+    def __init__(self, ssh_login):
+        super().__init__()
+
+        self.estimator = ProgressEstimator()
+
+        self.label = QLabel("No detached detection followed.")
+        self.progress = QProgressBar(self)
+        self.progress.setMaximum(100)
+
+        self.thread = DetachedProgressThread(ssh_login)
+        self.thread.status_signal.connect(self.on_status)
+        self.thread.err_signal.connect(self.err_signal.emit)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.label)
+        layout.addWidget(self.progress)
+        self.setLayout(layout)
+
+    def start(self):
+        if self.thread.isRunning():
+            return
+
+        self.estimator = ProgressEstimator()
+        self.label.setText("Waiting for the detached detection...")
+        self.thread.stopped = False
+        self.thread.start()
+
+    def stop(self):
+        self.thread.stop()
+
+    def on_status(self, status):
+        if "stale" in status:
+            self.label.setText("Detached detection stopped updating {} ago.".format(
+                datetime.timedelta(seconds=round(status["age"]))))
+            return
+
+        if "error" in status:
+            self.label.setText("Detached detection failed.")
+            self.err_signal.emit("An error occurred in the detached session: {}".format(status["error"]))
+            return
+
+        self.estimator.update(status)
+        current_frame, total_frames = status["current_frame"], status["total_frame"]
+        self.progress.setValue(int(current_frame / max(total_frames, 1) * 100))
+
+        text = "{}: frame {}/{}".format(status["video_name"], current_frame, total_frames)
+        fps, eta = self.estimator.fps, self.estimator.eta(total_frames)
+        if fps is not None:
+            text += ", {:.1f} frames/s".format(fps)
+        if eta is not None:
+            text += ", ETA {}".format(datetime.timedelta(seconds=round(eta)))
+        self.label.setText(text)
+
+
+class DetachedProgressThread(QThread):
+    status_signal = pyqtSignal(object)
+    err_signal = pyqtSignal(str)
+
+    def __init__(self, ssh_login):
+        super().__init__()
+        self.ssh_login = ssh_login
+        self.stream = None
+        self.stopped = False
+
+    def run(self):
+        try:
+            self.stream = self.ssh_login.watch_detached_info()
+            if self.stopped:  # stop() was called while the command was starting
+                self.stream.channel.close()
+
+            for line in self.stream:
+                status = parse_status(line)
+                if status is not None:
+                    self.status_signal.emit(status)
+        except Exception as e:
+            self.err_signal.emit(str(e))
+        finally:
+            self.stream = None
+
+    def stop(self):
+        self.stopped = True
+        stream = self.stream
+        if stream is not None:
+            stream.channel.close()  # ends the iteration in run()
+        self.wait()
@@ -1,10 +1,14 @@
 import os
-import datetime
-from PyQt5.QtWidgets import QGroupBox, QHBoxLayout, QPushButton, QMessageBox, QCheckBox, QComboBox, QFormLayout, QLabel, QVBoxLayout
-from PyQt5.QtCore import QThread, pyqtSignal
-from ultimatelabeling.models import FrameMode, TrackInfo
+import asyncio
+import functools
+from PyQt5.QtWidgets import QGroupBox, QHBoxLayout, QPushButton, QMessageBox, QCheckBox, QComboBox, QFormLayout, QLabel, QVBoxLayout, QSpinBox
+from ultimatelabeling.models import FrameMode
 from ultimatelabeling.models.detector import SocketDetector
+from ultimatelabeling.models.async_client import AsyncJob, AsyncDetector
 from ultimatelabeling.models.polygon import Bbox
+from ultimatelabeling.models.detection_checkpoint import DetectionCheckpoint
+from ultimatelabeling.models.detached_progress import STALE_AFTER
+from ultimatelabeling.views.detached_progress import DetachedProgress
 from ultimatelabeling.config import DATA_DIR
 
 
@@ -15,7 +19,8 @@ class DetectionManager(QGroupBox):
         self.state = state
         self.ssh_login = ssh_login
 
-        self.detector = SocketDetector()
+        # Connections to the detection server, kept open between runs (on the shared client event loop)
+        self.detector = AsyncDetector(SocketDetector.HOST, SocketDetector.PORT)
         options_layout = QFormLayout()
 
         crop_layout = QHBoxLayout()
@@ -31,10 +36,14 @@ class DetectionManager(QGroupBox):
         self.detached_checkbox = QCheckBox("Detached mode (for videos)", self)
         options_layout.addRow(self.detached_checkbox)
 
-        self.fetch_info_button = QPushButton("Fetch detached info")
-        self.fetch_info_button.clicked.connect(self.fetch_detached_info)
+        self.fetch_info_button = QPushButton("Follow detached detection")
+        self.fetch_info_button.clicked.connect(self.follow_detached_detection)
         options_layout.addRow(self.fetch_info_button)
 
+        self.detached_progress = DetachedProgress(self.ssh_login)
+        self.detached_progress.err_signal.connect(self.display_err_message)
+        options_layout.addRow(self.detached_progress)
+
         self.load_detached_detections_button = QPushButton("Load detached detections")
         self.load_detached_detections_button.clicked.connect(self.load_detached_detections)
         options_layout.addRow(self.load_detached_detections_button)
@@ -43,11 +52,18 @@ class DetectionManager(QGroupBox):
         self.detector_dropdown.addItems(["YOLO", "OpenPifPaf"])
         options_layout.addRow(QLabel("Detection net:"), self.detector_dropdown)
 
-        self.frame_detection_thread = DetectionThread(self.state, self.detector, self, detect_video=False)
+        self.frame_step_spinbox = QSpinBox()
+        self.frame_step_spinbox.setRange(1, 1000)
+        options_layout.addRow(QLabel("Run on every N frames:"), self.frame_step_spinbox)
+
+        self.force_checkbox = QCheckBox("Re-run on frames already detected", self)
+        options_layout.addRow(self.force_checkbox)
+
+        self.frame_detection_thread = DetectionJob(self.state, self.detector, self, detect_video=False)
         self.frame_detection_thread.err_signal.connect(self.display_err_message)
         self.frame_detection_thread.finished.connect(self.on_detection_finished)
 
-        self.detection_thread = DetectionThread(self.state, self.detector, self, detect_video=True)
+        self.detection_thread = DetectionJob(self.state, self.detector, self, detect_video=True)
         self.detection_thread.err_signal.connect(self.display_err_message)
         self.detection_thread.finished.connect(self.on_detection_finished)
 
@@ -101,43 +117,35 @@ class DetectionManager(QGroupBox):
         self.detection_button.setEnabled(True)
         self.frame_detection_button.setEnabled(True)
 
-    def fetch_detached_info(self):
+        if self.detached_checkbox.isChecked() and self.state.detection_detached_video_name is not None:
+            self.detached_progress.start()
+
+    def follow_detached_detection(self):
         if not self.state.detection_server_running:
             QMessageBox.warning(self, "", "Detection server is not connected.")
             return
 
-        info = self.ssh_login.fetch_detached_info()
-        if info is None:
-            QMessageBox.warning(self, "", "Information file not found on the server.")
-            return
-
-        if "error" in info:
-            QMessageBox.warning(self, "", "An error occurred in the detached session: {}".format(info["error"]))
-            return
-
-        message = "Video: {}\nFrame: {}/{}\nStart time: {}\nLast update: {}".format(info["video_name"], info["current_frame"], info["total_frame"], info["start_time"], info["last_update"])
-        QMessageBox.information(self, "", message)
+        self.detached_progress.start()
 
     def _is_detached_running(self):
         info = self.ssh_login.fetch_detached_info()
 
-        if not info:
+        if not info or "error" in info:
             return False
 
-        last_update = datetime.datetime.strptime(info["last_update"], "%Y-%m-%d %H:%M:%S.%f")
-        now = datetime.datetime.now()
-
-        return (now - last_update).total_seconds() < 60
+        return info["age"] < STALE_AFTER
 
     def load_detached_detections(self):
         if not self.state.detection_server_running:
             QMessageBox.warning(self, "", "Detection server is not connected.")
             return
 
-        self.ssh_login.load_detached_detections(self.state.current_video)  # TODO: WARNING this will overwrite current annotations
+        # TODO: WARNING this will overwrite the current annotations of the frames detected since the last sync
+        updated = self.ssh_login.load_detached_detections(self.state.current_video)
+        if not updated:
+            return
 
-        self.state.track_info = TrackInfo(self.state.current_video)
-        self.state.track_info.load_detections(self.state.get_file_name())
+        self.state.track_info.reload_files(updated)
 
         self.state.notify_listeners("on_detection_change")
 
@@ -158,9 +166,11 @@ class DetectionManager(QGroupBox):
         self.state.notify_listeners("on_current_frame_change")
 
 
-class DetectionThread(QThread):
-    err_signal = pyqtSignal(str)
-
+class DetectionJob(AsyncJob):
+    """
+    Runs the detector on the current frame, or on the frames of the current video, on the shared client event loop.
+    The settings are read when the job starts and the detections are written in the GUI thread as they arrive.
+    """
     def __init__(self, state, detector, parent, detect_video=True):
         super().__init__()
         self.state = state
@@ -168,48 +178,66 @@ class DetectionThread(QThread):
         self.detect_video = detect_video
         self.parent = parent
 
-    def run(self):
-        self.detector.init()
+        self.result_signal.connect(self.on_result)
+        self.finished.connect(self.on_finished)
 
-        crop_area = None
+    def start(self):
+        self.crop_area = None
         if self.parent.crop_checkbox.isChecked():
-            crop_area = Bbox(*self.state.stored_area)
+            self.crop_area = Bbox(*self.state.stored_area)
 
-        detached = self.parent.detached_checkbox.isChecked()
+        self.detached = self.detect_video and self.parent.detached_checkbox.isChecked()
+        self.detector_name = str(self.parent.detector_dropdown.currentText())
+        self.checkpoint = None
 
-        detector = str(self.parent.detector_dropdown.currentText())
+        if not self.detect_video:
+            self.image_paths = {self.state.current_frame: self.state.file_names[self.state.current_frame]}
 
-        if self.detect_video:
-            seq_path = os.path.join(DATA_DIR, self.state.current_video)
+        elif not self.detached:
+            self.state.frame_mode = FrameMode.CONTROLLED
 
-            if not detached:
+            frame_step = self.parent.frame_step_spinbox.value()
+            frames = range(0, self.state.nb_frames, frame_step)
 
-                self.state.frame_mode = FrameMode.CONTROLLED
+            # Resumes an interrupted run: skips the frames already detected with these settings, or annotated
+            self.checkpoint = DetectionCheckpoint(self.state.current_video, self.detector_name, self.crop_area)
+            if self.parent.force_checkbox.isChecked():
+                self.checkpoint.reset()
+            else:
+                frames = [frame for frame in frames if frame not in self.checkpoint and
+                          not self.state.track_info.has_detections(self.state.get_file_name(frame))]
+            self.image_paths = {frame: self.state.file_names[frame] for frame in frames}
+            print("Detecting {} frames of {}".format(len(self.image_paths), self.state.current_video))
 
-                try:
-                    for frame, detections in enumerate(self.detector.detect_sequence(seq_path, self.state.nb_frames, crop_area=crop_area, detector=detector)):
-                        self.state.set_detections(detections, frame)
+        super().start()
 
-                        if self.state.frame_mode == FrameMode.CONTROLLED or self.state.current_frame == frame:
-                            self.state.set_current_frame(frame)
-                except Exception as e:
-                    self.err_signal.emit(str(e))
-                    self.detector.terminate()
+    async def generate(self):
+        if self.detached:
+            seq_path = os.path.join(DATA_DIR, self.state.current_video)
+            start = functools.partial(self.parent.ssh_login.start_detached_detection, seq_path,
+                                      crop_area=self.crop_area, detector=self.detector_name)
+            await asyncio.get_running_loop().run_in_executor(None, start)  # blocking SSH command
+            return
 
-                self.state.frame_mode = FrameMode.MANUAL
+        async for frame, detections in self.detector.detect_frames(self.image_paths, crop_area=self.crop_area,
+                                                                   detector=self.detector_name):
+            yield frame, detections
 
-            else:
+    def on_result(self, result):
+        frame, detections = result
+        self.state.set_detections(detections, frame)
 
-                self.parent.ssh_login.start_detached_detection(seq_path, crop_area=crop_area, detector=detector)
+        if not self.detect_video:
+            self.state.set_current_frame(frame)
+            return
 
-        else:
-            image_path = self.state.file_names[self.state.current_frame]
+        self.checkpoint.add(frame)
 
-            try:
-                detections = self.detector.detect(image_path, crop_area=crop_area, detector=detector)
-                self.state.set_detections(detections, self.state.current_frame)
-                self.state.set_current_frame(self.state.current_frame)
+        # Results come back out of order: only move forward to follow the detection
+        if (self.state.frame_mode == FrameMode.CONTROLLED and frame > self.state.current_frame) or self.state.current_frame == frame:
+            self.state.set_current_frame(frame)
 
-                self.detector.terminate()
-            except Exception as e:
-                self.err_signal.emit(str(e))
+    def on_finished(self):
+        if self.detect_video and not self.detached:
+            self.checkpoint.flush()
+            self.state.frame_mode = FrameMode.MANUAL
@@ -1,6 +1,6 @@
-from PyQt5.QtWidgets import QGroupBox, QHBoxLayout, QPushButton
+from PyQt5.QtWidgets import QGroupBox, QHBoxLayout, QPushButton, QCheckBox, QComboBox
 from PyQt5.QtCore import QThread
-from ultimatelabeling.models.hungarian_tracker import track
+from ultimatelabeling.models.hungarian_tracker import track, track_parallel, COST_FUNCTIONS
 
 
 class HungarianManager(QGroupBox):
@@ -14,13 +14,26 @@ class HungarianManager(QGroupBox):
         self.hungarian_button = QPushButton("Run Hung. algorithm")
         self.hungarian_button.clicked.connect(self.on_hungarian_clicked)
 
+        self.parallel_checkbox = QCheckBox("Multi-core", self)
+
+        self.cost_dropdown = QComboBox()
+        self.cost_dropdown.addItems(list(COST_FUNCTIONS))
+
+        self.kalman_checkbox = QCheckBox("Kalman", self)
+
         layout = QHBoxLayout()
         layout.addWidget(self.hungarian_button)
+        layout.addWidget(self.cost_dropdown)
+        layout.addWidget(self.kalman_checkbox)
+        layout.addWidget(self.parallel_checkbox)
         self.setLayout(layout)
 
 
     def on_hungarian_clicked(self):
         self.hungarian_button.setEnabled(False)
+        self.hungarian_thread.parallel = self.parallel_checkbox.isChecked()
+        self.hungarian_thread.cost = str(self.cost_dropdown.currentText())
+        self.hungarian_thread.kalman = self.kalman_checkbox.isChecked()
         self.hungarian_thread.finished.connect(self.on_hungarian_finished)
         self.hungarian_thread.start()
 
@@ -34,8 +47,14 @@ class HungarianThread(QThread):
     def __init__(self, state):
         super().__init__()
         self.state = state
+        self.parallel = False
+        self.cost = "distance"
+        self.kalman = False
 
     def run(self):
         detections_df = self.state.track_info.to_df(self.state.get_file_names())
-        detections_df = track(detections_df)
-        self.state.track_info.from_df_all(detections_df, self.state.get_file_names())
\ No newline at end of file
+        if self.parallel:
+            detections_df = track_parallel(detections_df, cost=self.cost, kalman=self.kalman)
+        else:
+            detections_df = track(detections_df, cost=self.cost, kalman=self.kalman)
+        self.state.track_info.from_df_all(detections_df, self.state.get_file_names())
@@ -252,8 +252,8 @@ class ImageWidget(QWidget, StateListener, KeyboardListener):
             self.current_video = self.state.current_video
 
             image_file = self.state.file_names[self.state.current_frame]
-            img = cv2.imread(image_file)
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            with self.state.frame_source.frame(image_file) as img:
+                img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
 
             h, w, _ = img.shape
             self.img_scale = float(self.width()) / float(w)
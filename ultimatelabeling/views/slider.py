@@ -1,12 +1,20 @@
 import os
-from PyQt5.QtWidgets import QSlider, QWidget, QHBoxLayout, QLabel, QVBoxLayout
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QKeyEvent
+import threading
+import numpy as np
+from PyQt5.QtWidgets import QSlider, QWidget, QHBoxLayout, QLabel, QVBoxLayout, QStyle, QStyleOptionSlider
+from PyQt5.QtCore import Qt, QThread, QTimer, QPoint, pyqtSignal
+from PyQt5.QtGui import QKeyEvent, QImage, QPixmap
 from ultimatelabeling.models import StateListener, KeyboardListener, FrameMode
-from ultimatelabeling.config import RESOURCES_DIR
+from ultimatelabeling.models.thumbnails import ThumbnailAtlas, build_thumbnails
+from ultimatelabeling.models.frame_source import FramePrefetcher
+from ultimatelabeling.models.video_ingestion import EXTRACTING_FILE
+from ultimatelabeling.config import RESOURCES_DIR, DATA_DIR, OUTPUT_DIR
 
 
 class VideoSlider(QWidget, StateListener, KeyboardListener):
+    SCRUB_PAUSE = 150  # ms without dragging the slider before loading the full frame
+    SETTLE_DELAY = 60  # ms, for the other changes (clicks on the groove, wheel, keys): coalesces auto-repeats
+
     def __init__(self, state, keyboard_notifier):
         super().__init__()
 
@@ -15,13 +23,27 @@ class VideoSlider(QWidget, StateListener, KeyboardListener):
 
         self.keyboard_notifier = keyboard_notifier
 
-        self.slider = QSlider(Qt.Horizontal)
+        self.slider = ThumbnailSlider(Qt.Horizontal)
         self.slider.setFocusPolicy(Qt.StrongFocus)
         self.slider.setTickPosition(QSlider.TicksBothSides)
         self.slider.setTickInterval(5)
         self.slider.setSingleStep(1)
         self.slider.setStyleSheet(open(os.path.join(RESOURCES_DIR, 'slider.style')).read())
-        self.slider.valueChanged.connect(lambda: self.state.set_current_frame(self.slider.value(), frame_mode=FrameMode.SLIDER))
+        self.slider.valueChanged.connect(self.on_slider_value_changed)
+        self.slider.sliderReleased.connect(self.load_slider_frame)
+        self.slider.hovered.connect(self.show_preview)
+        self.slider.left.connect(self.hide_preview)
+
+        # While scrubbing, the slider shows thumbnails and the frames are decoded in the background (latest request
+        # wins). The current frame (annotations save/load, full redraw) is only changed once the slider settles.
+        self.prefetcher = FramePrefetcher(self.state.frame_source)
+        self.scrub_timer = QTimer(self)
+        self.scrub_timer.setSingleShot(True)
+        self.scrub_timer.timeout.connect(self.load_slider_frame)
+
+        self.preview = QLabel(self, Qt.ToolTip)
+        self.atlas = None
+        self.thumbnail_thread = ThumbnailThread()
 
         self.label = QLabel()
         self.label.setFixedWidth(150)
@@ -62,6 +84,89 @@ class VideoSlider(QWidget, StateListener, KeyboardListener):
     def on_video_change(self):
         self.on_current_frame_change()
         self.slider.setMaximum(self.state.nb_frames - 1)
+        self.start_thumbnails()
+
+    def on_nb_frames_change(self):
+        self.slider.setMaximum(self.state.nb_frames - 1)
+        self.update_label()
+        self.start_thumbnails()
+
+    def on_video_extracted(self):
+        self.start_thumbnails()
+
+    def start_thumbnails(self):
+        """
+        (Re)starts building the thumbnail atlas of the current video in the background, once its frames are all there.
+        """
+        self.close_thumbnails()
+
+        video = self.state.current_video
+        if not video or self.state.nb_frames == 0 or os.path.exists(os.path.join(DATA_DIR, video, EXTRACTING_FILE)):
+            return
+
+        try:
+            image_size = self.state.frame_source.read(self.state.file_names[0]).shape[:2]
+        except IOError:
+            return
+        self.atlas = ThumbnailAtlas.for_video(os.path.join(OUTPUT_DIR, video), self.state.nb_frames, image_size)
+
+        if self.atlas.nb_ready < self.atlas.nb_frames:
+            self.thumbnail_thread.start_build(self.atlas, self.state.file_names, image_size)
+
+    def close_thumbnails(self):
+        self.thumbnail_thread.stop()
+        if self.atlas is not None:
+            self.atlas.close()  # before it is reopened (and possibly rewritten) for the new frames
+            self.atlas = None
+
+    def stop_workers(self):
+        self.close_thumbnails()
+        self.prefetcher.stop()
+
+    def on_slider_value_changed(self):
+        frame = self.slider.value()
+        if frame >= len(self.state.file_names):  # slider range not updated yet (e.g. video changing)
+            return
+
+        self.label.setText("Frame {}/{}".format(frame + 1, self.state.nb_frames))
+        self.prefetcher.request(self.state.file_names[frame])
+
+        if self.slider.isSliderDown():
+            self.show_preview(frame, self.slider.handle_position())
+            self.scrub_timer.start(self.SCRUB_PAUSE)
+        else:
+            self.scrub_timer.start(self.SETTLE_DELAY)
+
+    def load_slider_frame(self):
+        self.scrub_timer.stop()
+        if not self.slider.isSliderDown():
+            self.hide_preview()
+
+        if self.slider.value() != self.state.current_frame:
+            self.state.set_current_frame(self.slider.value(), frame_mode=FrameMode.SLIDER)
+
+    def show_preview(self, frame, x):
+        """
+        Shows the thumbnail of the frame (or of the nearest one built) above the slider at x.
+        """
+        if self.atlas is None:
+            return
+
+        thumbnail = self.atlas.get(frame)
+        if thumbnail is None:
+            _, thumbnail = self.atlas.nearest(frame)
+            if thumbnail is None:
+                return
+
+        thumbnail = np.ascontiguousarray(thumbnail)
+        h, w, _ = thumbnail.shape
+        self.preview.setPixmap(QPixmap.fromImage(QImage(thumbnail.data, w, h, 3 * w, QImage.Format_RGB888).copy()))
+        self.preview.resize(w, h)
+        self.preview.move(self.slider.mapToGlobal(QPoint(x - w // 2, -h - 4)))
+        self.preview.show()
+
+    def hide_preview(self):
+        self.preview.hide()
 
     def on_key_left(self):
         current_detection = None
@@ -86,3 +191,66 @@ class VideoSlider(QWidget, StateListener, KeyboardListener):
             track_ids = [d.track_id for d in self.state.track_info.detections]
             if current_detection.track_id not in track_ids:
                 self.state.set_current_detection(current_detection)
+
+
+class ThumbnailSlider(QSlider):
+    """
+    Slider emitting the frame under the mouse while it hovers.
+    """
+    hovered = pyqtSignal(int, int)  # frame, x
+    left = pyqtSignal()
+
+    def __init__(self, orientation):
+        super().__init__(orientation)
+        self.setMouseTracking(True)
+
+    def groove(self):
+        option = QStyleOptionSlider()
+        self.initStyleOption(option)
+        groove = self.style().subControlRect(QStyle.CC_Slider, option, QStyle.SC_SliderGroove, self)
+        handle = self.style().subControlRect(QStyle.CC_Slider, option, QStyle.SC_SliderHandle, self)
+        return groove.x() + handle.width() // 2, groove.width() - handle.width()
+
+    def value_at(self, x):
+        start, span = self.groove()
+        return QStyle.sliderValueFromPosition(self.minimum(), self.maximum(), x - start, max(span, 1))
+
+    def handle_position(self):
+        start, span = self.groove()
+        return start + QStyle.sliderPositionFromValue(self.minimum(), self.maximum(), self.value(), max(span, 1))
+
+    def mouseMoveEvent(self, event):
+        super().mouseMoveEvent(event)
+        if not self.isSliderDown():
+            self.hovered.emit(self.value_at(event.x()), event.x())
+
+    def leaveEvent(self, event):
+        super().leaveEvent(event)
+        self.left.emit()
+
+
+class ThumbnailThread(QThread):
+    progress_signal = pyqtSignal(int, int)  # number of thumbnails built, number of frames
+
+    def __init__(self):
+        super().__init__()
+        self.stop_event = threading.Event()
+        self.args = None
+
+    def start_build(self, atlas, file_names, image_size):
+        self.args = atlas, list(file_names), image_size
+        self.stop_event.clear()
+        self.start(QThread.LowPriority)
+
+    def run(self):
+        atlas, file_names, image_size = self.args
+        try:
+            build_thumbnails(atlas, file_names, image_size, progress=self.progress_signal.emit,
+                             stop_event=self.stop_event)
+        except IOError as e:
+            print("Thumbnails not built: {}".format(e))
+
+    def stop(self):
+        self.stop_event.set()
+        self.wait()
+        self.args = None  # does not keep the atlas mapped
@@ -1,14 +1,17 @@
 import os
 import paramiko
-from scp import SCPClient, SCPException
 import time
 import json
 import socket
+import tarfile
 
 from PyQt5.QtWidgets import QGroupBox, QLabel, QLineEdit, QFormLayout, QPushButton, QMessageBox
 from PyQt5.QtCore import QThread, pyqtSignal
 from ultimatelabeling.models import StateListener, SSHCredentials
-from ultimatelabeling.config import OUTPUT_DIR, SERVER_DIR
+from ultimatelabeling.models.detection_sync import sync_command, load_manifest, unpack_changes
+from ultimatelabeling.models.transfer import upload
+from ultimatelabeling.models.detached_progress import watch_command, parse_status
+from ultimatelabeling.config import OUTPUT_DIR, SERVER_DIR, TRACKING_SERVER_PORTS
 
 
 class SSHLogin(QGroupBox, StateListener):
@@ -98,29 +101,23 @@ class SSHLogin(QGroupBox, StateListener):
             print("Tracking server started...")
 
     def start_tracking_servers(self):
-        # Killing possible previous socket server
-        stdin, stdout, stderr = self.ssh_client.exec_command("tmux kill-session -t tracking_1")
-        stdin, stdout, stderr = self.ssh_client.exec_command("tmux kill-session -t tracking_2")
-        # stdin, stdout, stderr = self.ssh_client.exec_command("tmux kill-session -t tracking_3")
+        errors = ""
+        for i, port in enumerate(TRACKING_SERVER_PORTS):
+            # Killing possible previous socket server
+            stdin, stdout, stderr = self.ssh_client.exec_command("tmux kill-session -t tracking_{}".format(i + 1))
 
-        stdin, stdout, stderr = self.ssh_client.exec_command('cd UltimateLabeling_server && source siamMask/env/bin/activate && tmux new -d -s tracking_1 '
-                                                             '"CUDA_VISIBLE_DEVICES=0 python -m tracker -p 8787"')
+            stdin, stdout, stderr = self.ssh_client.exec_command('cd UltimateLabeling_server && source siamMask/env/bin/activate && tmux new -d -s tracking_{} '
+                                                                 '"CUDA_VISIBLE_DEVICES=0 python -m tracker -p {}"'.format(i + 1, port))
 
-        stdin, stdout, stderr = self.ssh_client.exec_command('cd UltimateLabeling_server && source siamMask/env/bin/activate && tmux new -d -s tracking_2 '
-                                                             '"CUDA_VISIBLE_DEVICES=0 python -m tracker -p 8788"')
+            print(stdout.read().decode())
+            errors += stderr.read().decode()
 
-        # stdin, stdout, stderr = self.ssh_client.exec_command('cd UltimateLabeling_server && source siamMask/env/bin/activate && tmux new -d -s tracking_3 '
-        #                                                      '"CUDA_VISIBLE_DEVICES=0 python -m tracker -p 8789"')
-
-        print(stdout.read().decode())
-        print(stderr.read().decode())
-
-        errors = stderr.read().decode()
+        print(errors)
         if errors:
             QMessageBox.warning(self, "", errors)
         else:
             self.state.tracking_server_running = True
-            print("Tracking server started...")
+            print("Tracking servers started...")
 
     def start_detection_server(self):
         stdin, stdout, stderr = self.ssh_client.exec_command("tmux kill-session -t detection")  # Killing possible previous socket server
@@ -157,30 +154,55 @@ class SSHLogin(QGroupBox, StateListener):
             print("Detached detection server started...")
 
     def fetch_detached_info(self):
-        local_info_file = os.path.join(OUTPUT_DIR, "running_info.json")
-        server_info_file = os.path.join(SERVER_DIR, local_info_file)
-
-        try:
-            with SCPClient(self.ssh_client.get_transport()) as scp:
-                scp.get(server_info_file, local_info_file)
-        except SCPException:
-            return
-
-        with open(local_info_file, "r") as f:
-            data = json.load(f)
-
-        return data
+        """
+        Output:
+            current status of the detached detection (running_info.json, with its "age" in seconds on the server), or
+            None if there is none
+        """
+        stdin, stdout, stderr = self.ssh_client.exec_command(watch_command(self.server_info_file(), once=True))
+        line = stdout.readline()
+        if not line:
+            print("Couldn't fetch the detached info:", stderr.read().decode())
+            return None
+
+        return parse_status(line)
+
+    def watch_detached_info(self):
+        """
+        Output:
+            stream of the status lines of the detached detection, pushed by the server as it is updated (see
+            detached_progress.watch_status). Closing its channel stops it.
+        """
+        stdin, stdout, stderr = self.ssh_client.exec_command(watch_command(self.server_info_file()))
+        return stdout
+
+    def server_info_file(self):
+        return os.path.join(SERVER_DIR, OUTPUT_DIR, "running_info.json")
 
     def load_detached_detections(self, video_name):
-        local_detections_folder = os.path.join(OUTPUT_DIR)
+        """
+        Fetches the detection files of the video that changed on the server since the last sync, in one compressed
+        stream (see detection_sync).
+        Output:
+            names of the updated files, or None on error
+        """
+        local_detections_folder = os.path.join(OUTPUT_DIR, video_name)
         server_detections_folder = os.path.join(SERVER_DIR, "output", video_name)
 
+        stdin, stdout, stderr = self.ssh_client.exec_command(sync_command(server_detections_folder))
+        stdin.write(json.dumps(load_manifest(local_detections_folder)))
+        stdin.channel.shutdown_write()
+
         try:
-            with SCPClient(self.ssh_client.get_transport()) as scp:
-                scp.get(server_detections_folder, local_detections_folder, recursive=True)
-        except SCPException:
+            updated = unpack_changes(stdout, local_detections_folder)
+        except (tarfile.TarError, ValueError, EOFError) as e:
+            QMessageBox.warning(self, "", "Couldn't sync the outputs of the server.\n{}".format(stderr.read().decode() or e))
+            return None
+
+        if not load_manifest(local_detections_folder):
             QMessageBox.warning(self, "", "Outputs not found on the server.")
-            return
+
+        return updated
 
     def check_is_running(self):
         stdin, stdout, stderr = self.ssh_client.exec_command("tmux ls")
@@ -196,6 +218,8 @@ class SSHLogin(QGroupBox, StateListener):
             print("closing servers")
             stdin, stdout, stderr = self.ssh_client.exec_command("tmux kill-session -t tracking")  # Killing possible previous socket server
             print(stdout, "+", stderr)
+            for i in range(len(TRACKING_SERVER_PORTS)):
+                stdin, stdout, stderr = self.ssh_client.exec_command("tmux kill-session -t tracking_{}".format(i + 1))
             stdin, stdout, stderr = self.ssh_client.exec_command("tmux kill-session -t detection")  # Killing possible previous socket server
             print(stdout, "+", stderr)
             print("servers closed")
@@ -209,18 +233,19 @@ class SCPThread(QThread):
         super().__init__()
 
         self.ssh_client = ssh_client
-        self.total_files = 20
-        self.nb_sent = 0
+        self.current_file = None
 
-    def progress(self, filename, size, sent):
-        if size == sent:
-            self.nb_sent += 1
-            self.countChanged.emit(self.nb_sent / self.total_files * 100)
-            self.messageAdded.emit("Sent {}".format(filename.decode()))
+    def progress(self, sent_bytes, total_bytes, name):
+        if name != self.current_file:
+            if self.current_file is not None:
+                self.messageAdded.emit("Sent {}".format(self.current_file))
+            self.current_file = name
+        self.countChanged.emit(int(sent_bytes / max(total_bytes, 1) * 100))
 
     def run(self):
-        with SCPClient(self.ssh_client.get_transport(), progress=self.progress) as scp:
-            scp.put('server_files', recursive=True)
+        upload(self.ssh_client, ['server_files'], progress=self.progress)
+        if self.current_file is not None:
+            self.messageAdded.emit("Sent {}".format(self.current_file))
 
         self.countChanged.emit(0)
         self.messageAdded.emit("Installing requirements...")
@@ -1,10 +1,15 @@
-from PyQt5.QtWidgets import QPushButton, QGroupBox, QVBoxLayout, QHBoxLayout, QStyle, QPlainTextEdit, QMessageBox
+import asyncio
+from PyQt5.QtWidgets import QPushButton, QGroupBox, QVBoxLayout, QHBoxLayout, QStyle, QPlainTextEdit, QMessageBox, \
+    QLineEdit
 from PyQt5.QtCore import QThread, pyqtSignal
 from ultimatelabeling.models.tracker import SocketTracker, KCFTracker
+from ultimatelabeling.models.multi_tracker import MultiKCFTracker
+from ultimatelabeling.models.async_client import AsyncJob, AsyncTracker
+from ultimatelabeling.models.tracker_pool import TrackerPool
+from ultimatelabeling.models.polygon import Polygon
 from ultimatelabeling.models import Detection, FrameMode
 from ultimatelabeling.models import KeyboardListener
-
-PORTS = [0, 8787, 8788]
+from ultimatelabeling.config import TRACKING_SERVER_PORTS, NB_SIAMMASK_SLOTS
 
 
 class TrackingThread(QThread):
@@ -40,12 +45,12 @@ class TrackingThread(QThread):
             return
 
         frame = init_frame + 1
+        results = self.tracker.track_sequence(self.state.file_names[frame:])
 
         while frame < self.state.nb_frames and self.runs:
 
-            image_path = self.state.file_names[frame]
             try:
-                bbox, polygon = self.tracker.track(image_path)
+                bbox, polygon = next(results)
             except Exception as e:
                 self.err_signal.emit(str(e))
                 return
@@ -69,16 +74,152 @@ class TrackingThread(QThread):
         self.runs = False
 
 
+class RemoteTrackingJob(AsyncJob):
+    """
+    Same as TrackingThread with a tracking server, but running on the shared client event loop instead of a thread of
+    its own. The detections are written in the GUI thread, and stop() interrupts the tracking immediately.
+    Each run is dispatched to a server of the pool.
+    """
+    def __init__(self, state_ref, pool):
+        super().__init__()
+
+        self.state = state_ref
+        self.pool = pool
+        self.result_signal.connect(self.on_result)
+
+        self.selected = False
+        self.class_id = self.track_id = None
+
+    def start(self):
+        self.init_frame = self.state.current_frame
+        if self.init_frame == self.state.nb_frames:
+            return
+
+        self.class_id = self.state.current_detection.class_id
+        self.track_id = self.state.current_detection.track_id
+        self.init_bbox = self.state.current_detection.bbox
+
+        self.state.frame_mode = FrameMode.CONTROLLED
+        self.selected = True
+
+        super().start()
+
+    async def generate(self):
+        # Acquired in the coroutine, so that the release below always runs (even if the job is stopped right away)
+        endpoint = self.pool.acquire()
+        tracker = AsyncTracker(endpoint.host, endpoint.port)
+        failed = False
+        try:
+            await tracker.init(self.state.file_names[self.init_frame], self.init_bbox,
+                               key=(self.state.current_video, self.track_id))
+
+            frame = self.init_frame + 1
+            async for bbox, polygon in tracker.track_sequence(self.state.file_names[frame:]):
+                if bbox is None:
+                    break
+
+                yield frame, bbox, polygon
+                frame += 1
+        except (OSError, asyncio.TimeoutError):
+            failed = True
+            raise
+        finally:
+            await tracker.close()
+            self.pool.release(endpoint, failed=failed)
+
+    def on_result(self, result):
+        frame, bbox, polygon = result
+
+        detection = Detection(class_id=self.class_id, track_id=self.track_id, polygon=polygon, bbox=bbox)
+
+        self.state.add_detection(detection, frame)
+
+        if (self.state.frame_mode == FrameMode.CONTROLLED and self.selected) or self.state.current_frame == frame:
+            self.state.set_current_frame(frame)
+            self.state.current_detection = detection
+
+
+class MultiTrackingThread(QThread):
+    """
+    Tracks several detections of the current frame forward with KCF (one worker process per group of objects): those
+    of track_ids, or all of them. Each frame is decoded once and its detections are written in a single update.
+    """
+    err_signal = pyqtSignal(str)
+
+    def __init__(self, state_ref, nb_workers=None):
+        super().__init__()
+
+        self.state = state_ref
+        self.runs = False
+        self.tracker = MultiKCFTracker(nb_workers=nb_workers)
+        self.track_ids = None  # None: all the detections of the current frame
+
+        self.selected = False
+
+    def run(self):
+        self.runs = True
+
+        init_frame = self.state.current_frame
+        if init_frame == self.state.nb_frames:
+            return
+
+        detections = {d.track_id: d for d in self.state.track_info.detections
+                      if self.track_ids is None or d.track_id in self.track_ids}
+        if len(detections) == 0:
+            self.err_signal.emit("No detection to track in the current frame.")
+            return
+
+        if self.track_ids is not None and len(detections) < len(self.track_ids):
+            missing = sorted(set(self.track_ids) - set(detections))
+            print("Track ids {} not in the current frame, not tracked".format(missing))
+
+        self.state.frame_mode = FrameMode.CONTROLLED
+        self.selected = True
+
+        try:
+            self.tracker.init(self.state.frame_source.read(self.state.file_names[init_frame]),
+                              {track_id: d.bbox for track_id, d in detections.items()})
+
+            frame = init_frame + 1
+            while frame < self.state.nb_frames and self.runs:
+                bboxes = self.tracker.track(self.state.frame_source.read(self.state.file_names[frame]))
+
+                if len(bboxes) == 0:
+                    break
+
+                tracked = [Detection(class_id=detections[track_id].class_id, track_id=track_id,
+                                     polygon=Polygon.from_bbox(bbox), bbox=bbox)
+                           for track_id, bbox in bboxes.items()]
+                self.state.add_detections(tracked, frame)
+
+                controlled = self.state.frame_mode == FrameMode.CONTROLLED and self.selected
+                if controlled or self.state.current_frame == frame:
+                    self.state.set_current_frame(frame)
+
+                frame += 1
+        except Exception as e:
+            self.err_signal.emit(str(e))
+        finally:
+            self.tracker.terminate()
+
+    def stop(self):
+        self.runs = False
+
+
 class TrackingButtons(QGroupBox):
-    def __init__(self, state, parent, i, name):
+    def __init__(self, state, parent, i, name, pool=None):
         super().__init__(name)
 
         self.state = state
         self.parent = parent
         self.i = i
+        self.name = name
+        self.pool = pool
 
         if name == "SiamMask":
-            self.thread = TrackingThread(self.state, tracker=SocketTracker, port=PORTS[i])
+            self.thread = RemoteTrackingJob(self.state, pool)
+        elif name == "Multi KCF":
+            self.thread = MultiTrackingThread(self.state)
         else:
             self.thread = TrackingThread(self.state, tracker=KCFTracker, state=self.state)
 
@@ -101,6 +242,19 @@ class TrackingButtons(QGroupBox):
         layout.addWidget(self.start_button)
         layout.addWidget(self.stop_button)
         layout.addWidget(self.sync_button)
+
+        if name == "Multi KCF":
+            self.track_ids_edit = QLineEdit()
+            self.track_ids_edit.setPlaceholderText("All detections")
+            self.track_ids_edit.setToolTip("Track ids to follow, separated by commas (empty: all the detections of the "
+                                           "current frame)")
+
+            self.add_track_button = QPushButton("Add selected")
+            self.add_track_button.clicked.connect(self.on_add_track)
+
+            layout.addWidget(self.track_ids_edit)
+            layout.addWidget(self.add_track_button)
+
         self.setLayout(layout)
 
         self.stop_button.hide()
@@ -108,13 +262,51 @@ class TrackingButtons(QGroupBox):
     def display_err_message(self, err_message):
         QMessageBox.warning(self, "", "Error: {}".format(err_message))
 
+    def selected_track_ids(self):
+        """
+        Output:
+            set of the track ids typed in the Multi KCF selection, None if empty (all the detections)
+        """
+        text = self.track_ids_edit.text().replace(",", " ").split()
+        if len(text) == 0:
+            return None
+        return {int(track_id) for track_id in text}
+
+    def on_add_track(self):
+        if self.state.current_detection is None:
+            QMessageBox.warning(self, "", "No detection selected.")
+            return
+
+        try:
+            track_ids = self.selected_track_ids() or set()
+        except ValueError:
+            track_ids = set()
+
+        track_ids.add(self.state.current_detection.track_id)
+        self.track_ids_edit.setText(", ".join(str(track_id) for track_id in sorted(track_ids)))
+
     def on_start_tracking(self):
-        if not self.state.tracking_server_running and self.i >= 1:
+        if not self.state.tracking_server_running and self.name == "SiamMask":
             QMessageBox.warning(self, "", "Tracking server is not connected.")
             return
 
+        if self.name == "Multi KCF" and not self.thread.isRunning():
+            try:
+                self.thread.track_ids = self.selected_track_ids()
+            except ValueError:
+                QMessageBox.warning(self, "", "Track ids should be integers separated by commas.")
+                return
+
         if not self.thread.isRunning():
-            self.thread.start()
+            if self.pool is not None:
+                self.pool.start_health_checks()
+
+            try:
+                self.thread.start()
+            except Exception as e:
+                self.display_err_message(str(e))
+                return
+
             self.parent.select(self.i)
 
             self.start_button.hide()
@@ -143,11 +335,13 @@ class TrackingManager(QGroupBox, KeyboardListener):
         super().__init__("Tracking")
         self.state = state
 
-        self.trackers = [
-            TrackingButtons(self.state, self, 0, "KCF"),
-            TrackingButtons(self.state, self, 1, "SiamMask"),
-            TrackingButtons(self.state, self, 2, "SiamMask")
-        ]
+        # SiamMask jobs are spread over the tracking servers, whichever slot starts them
+        self.pool = TrackerPool([(SocketTracker.HOST, port) for port in TRACKING_SERVER_PORTS])
+
+        self.trackers = [TrackingButtons(self.state, self, 0, "KCF")]
+        for _ in range(NB_SIAMMASK_SLOTS):
+            self.trackers.append(TrackingButtons(self.state, self, len(self.trackers), "SiamMask", self.pool))
+        self.trackers.append(TrackingButtons(self.state, self, len(self.trackers), "Multi KCF"))
 
         layout = QHBoxLayout()
 
@@ -1,4 +1,5 @@
-from PyQt5.QtWidgets import QListWidget
+from PyQt5.QtWidgets import QListWidget, QListWidgetItem, QMessageBox
+from PyQt5.QtCore import Qt
 from ultimatelabeling.models import StateListener, FrameMode
 
 
@@ -10,17 +11,56 @@ class VideoListWidget(QListWidget, StateListener):
         self.state.add_listener(self)
 
         for video_name in self.state.video_list:
-            self.addItem(video_name)
+            self.add_video(video_name)
 
         self.itemDoubleClicked.connect(self.on_list_clicked)
 
         self.setFixedWidth(150)
 
+    def add_video(self, video_name):
+        item = QListWidgetItem(video_name)
+        item.setData(Qt.UserRole, video_name)
+        self.addItem(item)
+        return item
+
+    def find_video(self, video_name):
+        for i in range(self.count()):
+            if self.item(i).data(Qt.UserRole) == video_name:
+                return self.item(i)
+        return None
+
     def on_list_clicked(self, item):
         self.state.frame_mode = FrameMode.MANUAL
-        self.state.set_current_video(item.text())
+        self.state.set_current_video(item.data(Qt.UserRole))
 
     def on_video_change(self):
         index = self.state.video_list.index(self.state.current_video)
         # self.item(index).setSelected(True)
 
+    def on_extraction_progress(self, video_name, nb_read, total):
+        """
+        Videos being extracted (see VideoIngestion) are listed with their progress as soon as their first frame is
+        written, and can already be opened.
+        """
+        item = self.find_video(video_name)
+        if item is None:
+            self.state.video_list = self.state.find_videos()
+            item = self.add_video(video_name)
+        item.setText("{} ({}%)".format(video_name, nb_read * 100 // max(total, 1)))
+
+        if video_name == self.state.current_video:
+            self.state.refresh_file_names()
+
+    def on_extraction_finished(self, video_name):
+        item = self.find_video(video_name)
+        if item is None:
+            self.state.video_list = self.state.find_videos()
+            item = self.add_video(video_name)
+        item.setText(video_name)
+
+        if video_name == self.state.current_video:
+            self.state.refresh_file_names()
+            self.state.notify_listeners("on_video_extracted")  # even if the last progress already listed all the frames
+
+    def on_extraction_error(self, err_message):
+        QMessageBox.warning(self, "", "Error: {}".format(err_message))